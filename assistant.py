@@ -6,21 +6,37 @@ import time
 from datetime import datetime
 import pytz
 import openai
-from groq import Groq
 from dotenv import load_dotenv
 import threading
-from memory.vector_store import VectorMemory
+import tracemalloc
+from collections import deque
+from memory.backends import create_vector_memory
 from memory.config_store import ConfigStore
 from memory.checkpoint_manager import CheckpointManager
+from memory.answer_cache import SemanticAnswerCache
+from memory.workspace_index import WorkspaceIndexer
+from memory.transfer import export_history, import_history
+from memory.sync import SyncNode, SyncServer, open_transport
+from memory.memory_report import memory_report
+from prompts.prompt_manager import PromptManager
+from pipeline import Stage, TurnPipeline
+from system_metrics import get_system_metrics
+from llm.backends import create_llm_client
+from llm.router import get_router
+from llm.hedging import ChatStream, GenerationCancelled, get_requester
+from llm.rate_limiter import CHARS_PER_TOKEN, PRIORITY_INTERACTIVE, estimate_tokens, get_rate_limiter
 import shutil  # Para obter o tamanho do terminal
 
 # Configurações globais
 base_dir = os.path.dirname(os.path.abspath(__file__))
-WORKSPACE_DIR = os.path.join(base_dir, 'workspace')
-DB_PATH = os.path.join(base_dir, 'chat_history.db')
-CONFIG_DIR = os.path.join(base_dir, 'config')
-CHECKPOINT_DIR = os.path.join(base_dir, 'checkpoints')
-CHROMA_DIR = os.path.join(base_dir, 'chroma_db')
+# Dados persistentes; NEXUS_DATA_DIR isola instâncias (ex: teste de carga)
+data_dir = os.getenv('NEXUS_DATA_DIR', base_dir)
+WORKSPACE_DIR = os.path.join(data_dir, 'workspace')
+DB_PATH = os.path.join(data_dir, 'chat_history.db')
+CONFIG_DIR = os.path.join(data_dir, 'config')
+CHECKPOINT_DIR = os.path.join(data_dir, 'checkpoints')
+CHROMA_DIR = os.path.join(data_dir, 'chroma_db')
+WORKSPACE_INDEX_DIR = os.path.join(data_dir, 'workspace_index')
 
 # Garante que os diretórios existem
 os.makedirs(WORKSPACE_DIR, exist_ok=True)
@@ -51,28 +67,86 @@ config_store = None
 checkpoint_manager = None
 groq_client = None
 personality = None
+prompt_manager = None
+answer_cache = None
+workspace_index = None
+sync_node = None
+sync_server = None
+turn_pipeline = TurnPipeline()
 
 class MessageCache:
-    def __init__(self, max_size=10):
-        self.messages = []
+    def __init__(self, max_size=10, max_bytes=256 * 1024):
+        """
+        Cache das mensagens recentes em um buffer circular
+
+        O cache respeita dois limites: quantidade de mensagens e bytes (UTF-8)
+        de conteúdo; as mais antigas saem primeiro, sem copiar o buffer. A
+        mensagem mais recente é sempre mantida, mesmo acima do orçamento.
+        """
         self.max_size = max_size
-        self.vector_memory = VectorMemory(CHROMA_DIR)
+        self.max_bytes = max_bytes
+        self._pending_loader = None
+        self.messages = []
+        self.vector_memory = create_vector_memory(CHROMA_DIR)
+
+    @property
+    def messages(self):
+        """Mensagens do cache (carregadas sob demanda após uma restauração)"""
+        if self._pending_loader is not None:
+            self.load_pending()
+        return self._messages
+
+    @messages.setter
+    def messages(self, value):
+        self._pending_loader = None
+        self._set_messages(value)
+
+    def _set_messages(self, value):
+        self._messages = deque()
+        self.size_bytes = 0
+        for role, content in value:
+            self._append(role, content)
+
+    @staticmethod
+    def _message_bytes(content):
+        return len(content.encode('utf-8'))
+
+    def _append(self, role, content):
+        """Insere no fim do buffer e descarta as mais antigas acima dos limites"""
+        self._messages.append((role, content))
+        self.size_bytes += self._message_bytes(content)
+        while len(self._messages) > 1 and (
+            len(self._messages) > self.max_size or self.size_bytes > self.max_bytes
+        ):
+            _, old_content = self._messages.popleft()
+            self.size_bytes -= self._message_bytes(old_content)
+
+    def load_lazily(self, loader):
+        """Adia o carregamento das mensagens até o primeiro acesso"""
+        self._pending_loader = loader
+
+    def load_pending(self):
+        """Carrega mensagens pendentes, se houver"""
+        loader, self._pending_loader = self._pending_loader, None
+        if loader is not None:
+            self._set_messages(loader())
+
+    def reload_vector_memory(self):
+        """Reabre a memória vetorial após troca do diretório ativo"""
+        self.vector_memory = create_vector_memory(CHROMA_DIR)
 
     def add(self, role, content):
         """Adiciona mensagem ao cache e ao ChromaDB"""
-        # Adiciona ao cache local
-        self.messages.append((role, content))
-        
-        # Se excedeu o limite, remove as mensagens mais antigas do cache
-        if len(self.messages) > self.max_size:
-            self.messages = self.messages[-self.max_size:]
+        # Adiciona ao cache local (as mais antigas saem ao exceder os limites)
+        self.load_pending()
+        self._append(role, content)
         
         # Sempre adiciona ao ChromaDB para persistência
         self.vector_memory.add_message(role, content)
 
     def get_all(self):
         """Retorna todas as mensagens do cache"""
-        return self.messages
+        return list(self.messages)
 
     def search_context(self, query):
         """Busca contexto relevante primeiro no ChromaDB, depois no cache local"""
@@ -84,7 +158,7 @@ class MessageCache:
         # Se não encontrou nada no ChromaDB, usa o cache local
         if self.messages:
             context = []
-            for role, content in self.messages[-3:]:  # Últimas 3 mensagens
+            for role, content in list(self.messages)[-3:]:  # Últimas 3 mensagens
                 prefix = "Usuário: " if role == "user" else "Assistente: "
                 context.append(f"{prefix}{content}")
             return context
@@ -114,6 +188,11 @@ def get_br_time():
 
 def clear_screen():
     """Limpa a tela do terminal"""
+    if not sys.stdout.isatty():
+        # Saída redirecionada (ex: cliente do daemon): o terminal remoto interpreta
+        sys.stdout.write("\033[2J\033[H")
+        sys.stdout.flush()
+        return
     os.system('cls' if os.name == 'nt' else 'clear')
 
 def print_with_typing(text: str, delay: float = 0.01):
@@ -133,12 +212,42 @@ def print_with_typing(text: str, delay: float = 0.01):
 
 def initialize_systems():
     """Inicializa todos os sistemas necessários"""
-    global message_cache, config_store, checkpoint_manager
+    global message_cache, config_store, checkpoint_manager, prompt_manager, answer_cache
+    global workspace_index
     
-    # Inicializa sistemas
-    message_cache = MessageCache()
-    config_store = ConfigStore(CONFIG_DIR)
+    # Rastreamento detalhado de alocações para o !mem (tem custo, opcional)
+    if os.getenv("MEM_TRACE", "0") == "1":
+        tracemalloc.start()
+    
+    # Inicializa sistemas (o diretório vetorial passa a ser gerenciado
+    # pelos checkpoints antes de ser aberto)
     checkpoint_manager = CheckpointManager(CHECKPOINT_DIR)
+    checkpoint_manager.attach_live_directory(
+        CHROMA_DIR, on_switch=lambda: message_cache.reload_vector_memory()
+    )
+    message_cache = MessageCache(
+        max_size=int(os.getenv("MESSAGE_CACHE_SIZE", "10")),
+        max_bytes=int(os.getenv("MESSAGE_CACHE_MAX_BYTES", str(256 * 1024)))
+    )
+    config_store = ConfigStore(CONFIG_DIR)
+    prompt_manager = PromptManager()
+    
+    # Cache semântico de respostas (opcional)
+    if os.getenv("ANSWER_CACHE", "0") == "1":
+        answer_cache = SemanticAnswerCache(
+            message_cache.vector_memory.embedding_function,
+            threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.92")),
+            max_entries=int(os.getenv("ANSWER_CACHE_SIZE", "256")),
+            ttl=float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+        )
+    
+    # Índice incremental dos arquivos do workspace, atualizado em segundo plano
+    if os.getenv("WORKSPACE_INDEX", "1") == "1":
+        workspace_index = WorkspaceIndexer(
+            WORKSPACE_DIR, WORKSPACE_INDEX_DIR,
+            chunk_lines=int(os.getenv("WORKSPACE_CHUNK_LINES", "40"))
+        )
+        workspace_index.start(interval=float(os.getenv("WORKSPACE_INDEX_INTERVAL", "10")))
 
 def add_message_to_history(role, content):
     """Adiciona mensagem ao histórico"""
@@ -149,6 +258,9 @@ def add_message_to_history(role, content):
     conn.commit()
     conn.close()
     
+    # Após uma restauração, a escrita vai para a cópia do snapshot
+    checkpoint_manager.ensure_writable()
+    
     # Adiciona ao cache de memória também
     message_cache.add(role, content)
 
@@ -273,17 +385,118 @@ def create_file(filename, content):
         with open(filepath, 'w', encoding='utf-8') as f:
             f.write(content)
         
+        # Disponível como contexto já na próxima pergunta
+        if workspace_index:
+            workspace_index.index_file(filepath)
+        
         print_with_typing("✅ Arquivo criado com sucesso!", delay=0.02)
         return True, f"Arquivo '{safe_filename}' criado com sucesso em {WORKSPACE_DIR}"
     except Exception as e:
         print_with_typing("❌ Erro ao criar arquivo!", delay=0.02)
         return False, f"Erro ao criar arquivo: {str(e)}"
 
+def build_chat_messages(user_input, context, recent_messages, snippets=None, system_status=None):
+    """Monta as mensagens enviadas ao LLM"""
+    # Prompt de sistema em prompts/nexus_chat.json (recarregado ao editar)
+    chat_prompt = prompt_manager.get_prompt("nexus_chat")
+    messages = [
+        {"role": "system", "content": chat_prompt["system"]},
+    ]
+    
+    # Contexto relevante do histórico
+    if context:
+        context_prompt = prompt_manager.get_prompt(
+            "nexus_chat", context="\n".join(context)
+        )["template"]
+        messages.append({"role": "system", "content": context_prompt})
+    else:
+        messages.append({"role": "system", "content": "Não foi encontrado histórico de conversas anteriores no momento."})
+    
+    # Trechos relevantes dos arquivos do workspace
+    if snippets:
+        workspace_prompt = prompt_manager.get_prompt(
+            "workspace_context", snippets="\n\n".join(snippets)
+        )["template"]
+        messages.append({"role": "system", "content": workspace_prompt})
+    
+    # Estado atual do host (SYSTEM_CONTEXT=1)
+    if system_status:
+        status_prompt = prompt_manager.get_prompt(
+            "system_context", status=system_status
+        )["template"]
+        messages.append({"role": "system", "content": status_prompt})
+    
+    # Histórico recente do cache
+    for msg in recent_messages:
+        messages.append({"role": msg[0], "content": msg[1]})
+    
+    # Mensagem atual
+    messages.append({"role": "user", "content": user_input})
+    return messages
+
+def generate_response(messages, prompt_chars=None, context_chars=0, cancel=None):
+    """
+    Gera a resposta do LLM, com o modelo escolhido pelo roteador (cancelável por cancel)
+
+    prompt_chars é o tamanho da pergunta (padrão: a última mensagem); o
+    contexto recuperado entra só em context_chars, e o prompt de sistema e
+    os templates não contam para a escolha do modelo.
+    """
+    tokens = estimate_tokens(messages, 1000)
+    prompt_tokens = estimate_tokens(messages, 0)
+    
+    def open_stream(model, attempt_cancel):
+        # Turnos do chat passam na frente dos helpers na fila do limitador;
+        # ao fim do stream a parte não usada da reserva volta ao saldo
+        limiter = get_rate_limiter(model)
+        return limiter.call(
+            lambda: ChatStream(
+                groq_client, model, messages,
+                on_done=lambda chars: limiter.settle(tokens, prompt_tokens + chars // CHARS_PER_TOKEN),
+                temperature=0.7,
+                max_tokens=1000,
+                top_p=1,
+                timeout=float(os.getenv('GROQ_TIMEOUT', '30'))
+            ),
+            tokens, PRIORITY_INTERACTIVE, timeout=get_requester().deadline, cancel=attempt_cancel
+        )
+    
+    def request(model):
+        # Prazo total e duplicação da requisição lenta (GROQ_DEADLINE / GROQ_HEDGE)
+        return get_requester().call(
+            open_stream, model, hedge_model=os.getenv('GROQ_HEDGE_MODEL'), cancel=cancel
+        )
+    
+    return get_router().call(
+        request,
+        prompt_chars=len(messages[-1]["content"]) if prompt_chars is None else prompt_chars,
+        caller="chat",
+        context_chars=context_chars
+    )
+
+def persist_response(user_input, response):
+    """Grava a resposta no histórico e no cache de respostas"""
+    add_message_to_history("assistant", response)
+    if answer_cache:
+        answer_cache.store(user_input, response, config_store.revision)
+
+def interrupted_response(partial):
+    """Resposta de uma geração cancelada; o parcial vai ao histórico se SAVE_PARTIAL_RESPONSES=1"""
+    notice = "\033[93m⏹ Resposta interrompida\033[0m"
+    if not partial:
+        return notice
+    if os.getenv("SAVE_PARTIAL_RESPONSES", "0") == "1":
+        add_message_to_history("assistant", f"{partial} [resposta interrompida]")
+    return f"\033[92m{partial}\033[0m\n{notice}"
+
 def handle_user_input(user_input):
     """Processa entrada do usuário com sistema de memória em camadas"""
     global groq_client, personality
     
     try:
+        # Escritas em segundo plano do turno anterior precisam terminar antes
+        turn_pipeline.drain()
+        
         # Comandos especiais de checkpoint
         if user_input.startswith("!checkpoint "):
             message = user_input[11:].strip()
@@ -302,6 +515,48 @@ def handle_user_input(user_input):
             list_system_checkpoints()
             return "Lista de checkpoints exibida acima!"
             
+        elif user_input == "!mem":
+            print(memory_report({
+                f"MessageCache ({len(message_cache.messages)} mensagens, "
+                f"{message_cache.size_bytes} bytes de conteúdo)": message_cache.messages,
+                "ConfigStore": config_store,
+                "Registro de checkpoints": checkpoint_manager.checkpoints,
+            }))
+            return "Relatório de memória exibido acima!"
+            
+        # Estado do host lido de /proc e statvfs (sem criar processos)
+        elif user_input == "!sys":
+            print(get_system_metrics().report())
+            return "Estado do sistema exibido acima!"
+            
+        elif user_input == "!top":
+            print(get_system_metrics().processes_report())
+            return "Processos exibidos acima!"
+            
+        # Exportação/importação do histórico (.jsonl, .jsonl.gz ou .jsonl.zst)
+        elif user_input.startswith("!export "):
+            args = user_input[8:].split()
+            if not args:
+                return "Uso: !export <arquivo> [--embeddings]"
+            success, message = export_history(
+                DB_PATH, args[0], message_cache.vector_memory,
+                include_embeddings="--embeddings" in args[1:]
+            )
+            return message
+            
+        elif user_input.startswith("!import "):
+            path = user_input[8:].strip()
+            # Os vetores importados não podem ir para um snapshot emprestado
+            checkpoint_manager.ensure_writable()
+            success, message = import_history(DB_PATH, path, message_cache.vector_memory)
+            if success and answer_cache:
+                answer_cache.clear()
+            return message
+            
+        # Sincronização incremental com outro host (checkpoints e histórico)
+        elif user_input.startswith("!sync"):
+            return sync_command(user_input[5:].split())
+            
         # Processa comando de criação de arquivo
         if user_input.lower().startswith("crie um arquivo "):
             # Remove o comando inicial
@@ -317,57 +572,62 @@ def handle_user_input(user_input):
                 success, message = create_file(filename, content)
                 return message, None if success else None
         
-        # Cria checkpoint automático antes de cada resposta da IA
-        checkpoint_id = create_system_checkpoint(
-            f"Checkpoint automático antes da resposta: {user_input[:50]}..."
-        )
+        # Pergunta quase idêntica já respondida: dispensa a chamada ao LLM
+        if answer_cache:
+            cached = answer_cache.lookup(user_input, config_store.revision)
+            if cached:
+                add_message_to_history("user", user_input)
+                add_message_to_history("assistant", cached)
+                return f"\033[92m{cached}\033[0m", None
         
-        # Adiciona mensagem do usuário ao histórico
-        add_message_to_history("user", user_input)
+        # Últimas mensagens antes desta, lidas antes das escritas do turno
+        recent_messages = message_cache.get_all()[-5:]
         
-        # Busca contexto relevante
-        context = message_cache.search_context(user_input)
+        # Etapas do turno: checkpoint e persistência correm em paralelo com
+        # a busca de contexto e a chamada ao LLM
+        stages = [
+            # Cria checkpoint automático antes de cada resposta da IA
+            Stage("checkpoint", lambda r: create_system_checkpoint(
+                f"Checkpoint automático antes da resposta: {user_input[:50]}..."
+            )),
+            # Adiciona mensagem do usuário ao histórico (após o checkpoint)
+            Stage("persist_user", lambda r: add_message_to_history("user", user_input),
+                  deps=["checkpoint"]),
+            # Busca contexto relevante
+            Stage("context", lambda r: message_cache.search_context(user_input)),
+            # Busca trechos relevantes do workspace
+            Stage("workspace", lambda r: workspace_index.search(user_input) if workspace_index else []),
+            # Resumo do estado do host, em microssegundos (opcional)
+            Stage("system", lambda r: get_system_metrics().summary()
+                  if os.getenv("SYSTEM_CONTEXT", "0") == "1" else None),
+        ]
         
-        # Gera resposta com IA
-        if groq_client:
-            messages = [
-                {"role": "system", "content": "Você é um assistente virtual chamado Nexus. Mantenha suas respostas naturais e diretas. Se o usuário perguntar sobre conversas anteriores e não houver contexto fornecido, seja honesto e diga que não tem acesso ao histórico anterior neste momento."},
-            ]
-            
-            # Busca contexto relevante no histórico
-            context = message_cache.search_context(user_input)
-            if context:
-                context_str = "\n".join(context)
-                context_prompt = f"Histórico relevante da conversa:\n{context_str}\n\nUse estas informações para responder ao usuário de forma precisa sobre o que foi discutido anteriormente."
-                messages.append({"role": "system", "content": context_prompt})
-            else:
-                messages.append({"role": "system", "content": "Não foi encontrado histórico de conversas anteriores no momento."})
-            
-            # Adiciona histórico recente do cache
-            recent_messages = message_cache.get_all()[-5:]  # Últimas 5 mensagens
-            for msg in recent_messages:
-                messages.append({"role": msg[0], "content": msg[1]})
-            
-            # Adiciona mensagem atual
-            messages.append({"role": "user", "content": user_input})
-            
-            completion = groq_client.chat.completions.create(
-                model="mixtral-8x7b-32768",
-                messages=messages,
-                temperature=0.7,
-                max_tokens=1000,
-                top_p=1,
-                stream=False
-            )
-            
-            response = completion.choices[0].message.content
-            add_message_to_history("assistant", response)
-            
-            # Retorna a resposta com a cor verde
-            response = f"\033[92m{response}\033[0m"
-            return response, checkpoint_id
-        else:
+        if not groq_client:
+            turn_pipeline.run(stages)
             return "Desculpe, o suporte a IA não está disponível no momento.", None
+        
+        # Ctrl-C durante a resposta cancela só a requisição em andamento
+        cancel = threading.Event()
+        stages += [
+            Stage("response", lambda r: generate_response(
+                build_chat_messages(user_input, r["context"], recent_messages, r["workspace"],
+                                    r["system"]),
+                prompt_chars=len(user_input),
+                context_chars=sum(len(c) for c in r["context"] + r["workspace"]),
+                cancel=cancel
+            ), deps=["context", "workspace", "system"]),
+            # Escritas pós-resposta terminam em segundo plano
+            Stage("persist_assistant", lambda r: persist_response(user_input, r["response"]),
+                  deps=["response", "persist_user"], background=True),
+        ]
+        try:
+            results = turn_pipeline.run(stages, cancel=cancel)
+        except GenerationCancelled as e:
+            return interrupted_response(e.partial), None
+        
+        # Retorna a resposta com a cor verde
+        response = f"\033[92m{results['response']}\033[0m"
+        return response, results["checkpoint"]
             
     except Exception as e:
         print(f"\033[91mErro ao processar mensagem: {str(e)}\033[0m")
@@ -393,9 +653,13 @@ def restore_system_checkpoint(checkpoint_id):
             return False
             
         # Restaura
-        success = checkpoint_manager.restore_checkpoint(checkpoint_id)
+        success = checkpoint_manager.restore_checkpoint(
+            checkpoint_id, config_store, message_cache
+        )
         
         if success:
+            if answer_cache:
+                answer_cache.clear()
             print("\n\033[92m✓ Sistema restaurado com sucesso!\033[0m")
             verify_system_status()  # Mostra estado atual
         else:
@@ -455,84 +719,136 @@ def print_user_message(message, timestamp=None):
     # Imprime linha em branco com fundo
     print(f"\033[48;5;234m{' ' * width}\033[0m")
 
-def main():
-    """Função principal do assistente"""
-    global groq_client, personality
+def startup():
+    """Carrega o .env e inicializa os sistemas (memória, configs, índices)"""
+    # Configura o caminho do .env
+    ENV_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env')
+    print(f"🔍 Procurando .env em: {ENV_PATH}")
+    
+    # Carrega variáveis de ambiente e mostra debug
+    load_dotenv(dotenv_path=ENV_PATH, verbose=True)
+    print(f"📁 Diretório atual: {os.getcwd()}")
+    print(f"🔑 GROQ_API_KEY: {'***' + os.getenv('GROQ_API_KEY')[-4:] if os.getenv('GROQ_API_KEY') else 'não encontrado'}")
+    
+    # Inicializa sistemas (após o .env, que configura backends e caches)
+    initialize_systems()
+    
+    # Cria pasta workspace se não existir
+    os.makedirs(WORKSPACE_DIR, exist_ok=True)
+
+def init_llm():
+    """Inicializa o cliente do LLM"""
+    global groq_client
     
     try:
-        # Inicializa sistemas
-        initialize_systems()
-        
-        # Configura o caminho do .env
-        ENV_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env')
-        print(f"🔍 Procurando .env em: {ENV_PATH}")
-        
-        # Carrega variáveis de ambiente e mostra debug
-        load_dotenv(dotenv_path=ENV_PATH, verbose=True)
-        print(f"📁 Diretório atual: {os.getcwd()}")
-        print(f"🔑 GROQ_API_KEY: {'***' + os.getenv('GROQ_API_KEY')[-4:] if os.getenv('GROQ_API_KEY') else 'não encontrado'}")
-        
-        # Interface inicial
-        clear_screen()
-        print_with_typing("👋 Olá! Eu sou o Nexus, seu assistente virtual com IA!")
-        print_with_typing("Estou aqui para ajudar você com qualquer tarefa de programação ou sistema.")
-        print_with_typing("Usando Groq com modelo Mixtral-8x7b")
-        print_with_typing("Pode me dizer naturalmente o que precisa, ou digite 'ajuda' para ver comandos específicos.")
-        print()
-        
-        # Cria pasta workspace se não existir
-        os.makedirs(WORKSPACE_DIR, exist_ok=True)
-        
-        try:
+        if os.getenv('LLM_BACKEND', 'groq') == 'fake':
+            groq_client = create_llm_client()
+            print_with_typing("🧪 Usando o backend de LLM falso local (LLM_BACKEND=fake)")
+        else:
             print_with_typing("🔄 Inicializando Groq...")
-            groq_client = Groq(api_key=os.getenv('GROQ_API_KEY'))
-            print_with_typing("✨ Groq inicializado com modelo mixtral-8x7b-32768")
-        except Exception as e:
-            print(f"\033[91mErro ao inicializar IA:\033[0m {str(e)}")
-            print("Continuando sem suporte a IA...")
-        
-        while True:
-            try:
-                print()  # Linha extra antes do input para manter espaçamento
-                print("Você: ", end="", flush=True)  # Input sem formatação
-                user_input = input().strip()
-                
-                if not user_input:
-                    continue
-                
-                # Move o cursor duas linhas para cima para sobrescrever a linha vazia e o input
-                print("\033[2A", end="")
-                
-                # Imprime a mensagem e o timestamp juntos
-                print_user_message(user_input, get_br_time())
-                
-                if user_input.lower() == 'sair':
-                    print("\n\033[92mNexus:\033[0m Até logo! Foi um prazer ajudar!")
-                    break
-                
-                result = handle_user_input(user_input)
-                if isinstance(result, tuple):
-                    response, checkpoint_id = result
-                else:
-                    response, checkpoint_id = result, None
-                    
-                if response:
-                    print()  # Uma linha entre usuário e IA
-                    print(f"\033[92mNexus:\033[0m {response}")
-                    # Horário e código de restauração em verde e itálico
-                    print(f"\033[92m\033[3m{get_br_time()}")
-                    if checkpoint_id:
-                        print(f"\033[92m\033[3m✓ !restore {checkpoint_id}\033[0m")
-                        print()  # Linha extra após o restore
-                
-            except EOFError:
-                print("\n\033[92mNexus:\033[0m Até logo! Foi um prazer ajudar!")
-                break
-            except KeyboardInterrupt:
+            groq_client = create_llm_client()
+            router = get_router()
+            print_with_typing(f"✨ Groq inicializado (rápidos: {', '.join(router.fast_models)}; "
+                              f"grandes: {', '.join(router.large_models)})")
+    except Exception as e:
+        print(f"\033[91mErro ao inicializar IA:\033[0m {str(e)}")
+        print("Continuando sem suporte a IA...")
+
+def greet():
+    """Mostra a tela inicial"""
+    clear_screen()
+    print_with_typing("👋 Olá! Eu sou o Nexus, seu assistente virtual com IA!")
+    print_with_typing("Estou aqui para ajudar você com qualquer tarefa de programação ou sistema.")
+    print_with_typing("Usando Groq, com o modelo escolhido conforme o tamanho de cada pedido")
+    print_with_typing("Pode me dizer naturalmente o que precisa, ou digite 'ajuda' para ver comandos específicos.")
+    print()
+
+def chat_loop():
+    """Lê e responde mensagens até o usuário sair"""
+    while True:
+        try:
+            print()  # Linha extra antes do input para manter espaçamento
+            print("Você: ", end="", flush=True)  # Input sem formatação
+            user_input = input().strip()
+            
+            if not user_input:
+                continue
+            
+            # Move o cursor duas linhas para cima para sobrescrever a linha vazia e o input
+            print("\033[2A", end="")
+            
+            # Imprime a mensagem e o timestamp juntos
+            print_user_message(user_input, get_br_time())
+            
+            if user_input.lower() == 'sair':
                 print("\n\033[92mNexus:\033[0m Até logo! Foi um prazer ajudar!")
                 break
-            except Exception as e:
-                print(f"\033[91mErro:\033[0m {str(e)}")
+            
+            result = handle_user_input(user_input)
+            if isinstance(result, tuple):
+                response, checkpoint_id = result
+            else:
+                response, checkpoint_id = result, None
+                
+            if response:
+                print()  # Uma linha entre usuário e IA
+                print(f"\033[92mNexus:\033[0m {response}")
+                # Horário e código de restauração em verde e itálico
+                print(f"\033[92m\033[3m{get_br_time()}")
+                if checkpoint_id:
+                    print(f"\033[92m\033[3m✓ !restore {checkpoint_id}\033[0m")
+                    print()  # Linha extra após o restore
+            
+        except EOFError:
+            print("\n\033[92mNexus:\033[0m Até logo! Foi um prazer ajudar!")
+            break
+        except KeyboardInterrupt:
+            print("\n\033[92mNexus:\033[0m Até logo! Foi um prazer ajudar!")
+            break
+        except Exception as e:
+            print(f"\033[91mErro:\033[0m {str(e)}")
+
+def sync_command(args):
+    """
+    !sync serve [socket]: atende outros hosts em um socket Unix
+    !sync <diretório|unix:/caminho.sock>: traz o que falta do outro host
+    """
+    global sync_node, sync_server
+    if not args:
+        return "Uso: !sync <diretório de checkpoints|unix:/caminho.sock> ou !sync serve [socket]"
+    if sync_node is None:
+        sync_node = SyncNode(checkpoint_manager, DB_PATH)
+    if args[0] == "serve":
+        if sync_server:
+            return f"Sincronização já atendida em unix:{sync_server.path}"
+        path = args[1] if len(args) > 1 else os.path.join(data_dir, 'sync.sock')
+        sync_server = SyncServer(sync_node, path).start()
+        return f"Atendendo sincronização em unix:{path}"
+    try:
+        transport = open_transport(args[0])
+    except (OSError, ValueError) as e:
+        return f"Erro na sincronização: {str(e)}"
+    success, message = sync_node.pull(transport)
+    if hasattr(transport, "close"):
+        transport.close()
+    return message
+
+def shutdown():
+    """Conclui as escritas em segundo plano antes de sair"""
+    turn_pipeline.drain()
+    if workspace_index:
+        workspace_index.stop()
+    if sync_server:
+        sync_server.stop()
+
+def main():
+    """Função principal do assistente"""
+    try:
+        startup()
+        greet()
+        init_llm()
+        chat_loop()
+        shutdown()
     
     except Exception as e:
         print(f"Erro fatal: {e}")
@@ -1,5 +1,49 @@
 #!/bin/bash
 
+# Memória e processos são lidos de /proc só com builtins do bash (sem free/ps)
+mostrar_memoria() {
+    local nome valor unidade total=0 disponivel=0 swap_total=0 swap_livre=0
+    while read -r nome valor unidade; do
+        case "$nome" in
+            MemTotal:) total=$valor ;;
+            MemAvailable:) disponivel=$valor ;;
+            SwapTotal:) swap_total=$valor ;;
+            SwapFree:) swap_livre=$valor ;;
+        esac
+    done < /proc/meminfo
+    echo "Memória: $(( (total - disponivel) / 1024 )) MB usados de $(( total / 1024 )) MB ($(( disponivel / 1024 )) MB disponíveis)"
+    echo "Swap: $(( (swap_total - swap_livre) / 1024 )) MB usados de $(( swap_total / 1024 )) MB"
+}
+
+mostrar_processos() {
+    local dir nome valor resto processo rss i linha
+    local -a maiores=() linhas=()
+    for dir in /proc/[0-9]*; do
+        processo="" rss=""
+        [ -r "$dir/status" ] || continue
+        while read -r nome valor resto; do
+            case "$nome" in
+                Name:) processo="$valor${resto:+ $resto}" ;;
+                VmRSS:) rss=$valor; break ;;
+            esac
+        done 2>/dev/null < "$dir/status"
+        [ -n "$rss" ] || continue
+        # Mantém os 5 processos com mais memória residente, em ordem
+        for ((i = 0; i < 5; i++)); do
+            if [ -z "${maiores[i]}" ] || (( rss > maiores[i] )); then
+                printf -v linha "%7s  %8s MB  %s" "${dir#/proc/}" "$(( rss / 1024 ))" "$processo"
+                maiores=("${maiores[@]:0:i}" "$rss" "${maiores[@]:i:4-i}")
+                linhas=("${linhas[@]:0:i}" "$linha" "${linhas[@]:i:4-i}")
+                break
+            fi
+        done
+    done
+    printf "%7s  %11s  %s\n" "PID" "RSS" "Processo"
+    for linha in "${linhas[@]}"; do
+        echo "$linha"
+    done
+}
+
 echo "Bem-vindo ao chat da IA na VPS!"
 echo "Digite sua mensagem (ou 'sair' para encerrar):"
 echo "----------------------------------------"
@@ -26,15 +70,16 @@ while true; do
             ;;
         *"memoria"* | *"memória"*)
             echo "IA: Aqui está o status da memória:"
-            free -h
+            mostrar_memoria
             ;;
         *"disco"*)
             echo "IA: Aqui está o uso do disco:"
+            # O bash não tem builtin para statvfs; df roda só quando perguntado
             df -h /
             ;;
         *"processos"*)
             echo "IA: Aqui estão os principais processos:"
-            ps aux | head -5
+            mostrar_processos
             ;;
         *"ajuda"* | *"help"*)
             echo "IA: Posso ajudar com:"
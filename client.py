@@ -0,0 +1,123 @@
+"""
+Cliente leve do Nexus: conecta ao daemon por socket Unix
+
+Importa apenas a biblioteca padrão mínima, então abre em dezenas de
+milissegundos. Se o daemon não estiver rodando, inicia o daemon.py em
+segundo plano e aguarda o socket (só a primeira execução paga a carga).
+O daemon atende uma sessão por vez: se outra estiver aberta, avisa e sai.
+
+Uso: python client.py
+"""
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+SOCKET_PATH = os.getenv("NEXUS_SOCKET", os.path.join(base_dir, "assistant.sock"))
+# Tempo máximo de espera pela carga inicial do daemon
+START_TIMEOUT = float(os.getenv("NEXUS_START_TIMEOUT", "120"))
+# Espera pela resposta de um daemon já ativo antes de considerá-lo ocupado
+BUSY_TIMEOUT = float(os.getenv("NEXUS_BUSY_TIMEOUT", "5"))
+BUSY_MESSAGE = "O daemon está ocupado com outra sessão (ou ainda carregando); tente novamente em instantes"
+
+
+def _connect():
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    # Com a fila do listen cheia o connect bloqueia
+    sock.settimeout(BUSY_TIMEOUT)
+    try:
+        sock.connect(SOCKET_PATH)
+        return sock
+    except (FileNotFoundError, ConnectionRefusedError):
+        sock.close()
+        return None
+    except socket.timeout:
+        sock.close()
+        raise RuntimeError(BUSY_MESSAGE)
+
+
+def _start_daemon():
+    """Inicia o daemon desacoplado do terminal, com a saída em daemon.log"""
+    with open(os.path.join(base_dir, "daemon.log"), "a") as log:
+        return subprocess.Popen(
+            [sys.executable, os.path.join(base_dir, "daemon.py")],
+            cwd=base_dir, stdin=subprocess.DEVNULL, stdout=log, stderr=log,
+            start_new_session=True
+        )
+
+
+def connect():
+    """
+    Conecta ao daemon, iniciando-o se necessário
+
+    Returns:
+        tuple: (socket, tempo máximo de espera pela primeira resposta)
+    """
+    sock = _connect()
+    if sock:
+        return sock, BUSY_TIMEOUT
+
+    print("🔄 Iniciando o Nexus em segundo plano...", flush=True)
+    process = _start_daemon()
+    deadline = time.monotonic() + START_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("O daemon encerrou durante a inicialização (veja daemon.log)")
+        sock = _connect()
+        if sock:
+            # O daemon recém-iniciado só responde depois da carga
+            return sock, max(deadline - time.monotonic(), BUSY_TIMEOUT)
+        time.sleep(0.05)
+    raise RuntimeError(f"O daemon não respondeu em {START_TIMEOUT:.0f}s (veja daemon.log)")
+
+
+def send(sock, frame):
+    sock.sendall((json.dumps(frame, ensure_ascii=False) + "\n").encode("utf-8"))
+
+
+def main():
+    try:
+        sock, first_timeout = connect()
+    except RuntimeError as e:
+        print(f"\033[91mErro:\033[0m {e}")
+        sys.exit(1)
+
+    reader = sock.makefile("r", encoding="utf-8")
+    # Sem resposta a tempo, o daemon está atendendo outra sessão
+    sock.settimeout(first_timeout)
+    try:
+        while True:
+            try:
+                try:
+                    line = reader.readline()
+                except socket.timeout:
+                    print(f"⏳ {BUSY_MESSAGE}")
+                    break
+                sock.settimeout(None)
+                if not line:
+                    break
+                frame = json.loads(line)
+                if "out" in frame:
+                    sys.stdout.write(frame["out"])
+                    sys.stdout.flush()
+                elif frame.get("prompt"):
+                    try:
+                        send(sock, {"input": input()})
+                    except EOFError:
+                        send(sock, {"eof": True})
+                elif frame.get("exit"):
+                    break
+            except KeyboardInterrupt:
+                # Repassa ao daemon, que encerra a sessão como o chat local faria
+                send(sock, {"interrupt": True})
+    except (BrokenPipeError, ConnectionResetError):
+        print("\n\033[91mConexão com o daemon perdida\033[0m")
+    finally:
+        sock.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+Daemon do Nexus: mantém o assistente carregado em segundo plano
+
+Imports, memória vetorial, modelo de embeddings e índices são carregados uma
+única vez; o client.py conecta por um socket Unix e a sessão começa na hora.
+O protocolo é JSON por linha:
+
+    daemon -> cliente: {"out": texto}, {"prompt": true}, {"exit": true}
+    cliente -> daemon: {"input": texto}, {"eof": true}, {"interrupt": true}
+
+Atende uma sessão por vez (o estado do chat é único); um segundo cliente
+fica na fila e avisa que o daemon está ocupado. Sem clientes por
+NEXUS_IDLE_TIMEOUT segundos, conclui as escritas pendentes e encerra.
+
+Uso: python daemon.py (normalmente iniciado pelo próprio client.py)
+"""
+import builtins
+import contextlib
+import io
+import json
+import os
+import queue
+import signal
+import socket
+import sys
+import threading
+import time
+from datetime import datetime
+
+import assistant
+from memory.embeddings import get_embedding_provider
+
+SOCKET_PATH = os.getenv("NEXUS_SOCKET", os.path.join(assistant.base_dir, "assistant.sock"))
+IDLE_TIMEOUT = float(os.getenv("NEXUS_IDLE_TIMEOUT", "900"))
+
+
+def _log(message: str):
+    with open("daemon.log", "a") as f:
+        f.write(f"{datetime.now()}: {message}\n")
+
+
+class _SessionOutput(io.TextIOBase):
+    """stdout da sessão: cada escrita vira um frame {"out": ...} para o cliente"""
+
+    def __init__(self, session):
+        self.session = session
+
+    def write(self, text):
+        if text:
+            self.session.send({"out": text})
+        return len(text)
+
+    def isatty(self):
+        return False
+
+
+class Session:
+    def __init__(self, conn: socket.socket):
+        self.conn = conn
+        self.reader = conn.makefile("r", encoding="utf-8")
+        self.output = _SessionOutput(self)
+        self._lock = threading.Lock()
+        self._frames = queue.Queue()
+        self._waiting_input = threading.Event()
+        self.active = True
+        threading.Thread(target=self._read_frames, daemon=True).start()
+
+    def _read_frames(self):
+        """Lê os frames do cliente; um Ctrl-C fora do prompt interrompe o turno em andamento"""
+        try:
+            for line in self.reader:
+                frame = json.loads(line)
+                if frame.get("interrupt") and not self._waiting_input.is_set():
+                    if not self.active:
+                        continue
+                    # SIGINT na thread principal: interrompe esperas bloqueantes
+                    # e chega ao chat_loop como o Ctrl-C de um terminal local
+                    signal.pthread_kill(threading.main_thread().ident, signal.SIGINT)
+                    continue
+                self._frames.put(frame)
+        except (OSError, ValueError):
+            pass
+        self._frames.put({"eof": True})
+
+    def close(self):
+        # shutdown acorda a thread de leitura antes de fechar o arquivo que ela usa
+        with contextlib.suppress(OSError):
+            self.conn.shutdown(socket.SHUT_RDWR)
+        self.reader.close()
+
+    def send(self, frame: dict):
+        data = (json.dumps(frame, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            self.conn.sendall(data)
+
+    def input(self, prompt=""):
+        """Substitui o input() do assistente durante a sessão"""
+        if prompt:
+            self.output.write(str(prompt))
+        self._waiting_input.set()
+        try:
+            self.send({"prompt": True})
+            frame = self._frames.get()
+        finally:
+            self._waiting_input.clear()
+        if frame.get("interrupt"):
+            raise KeyboardInterrupt
+        if frame.get("eof"):
+            raise EOFError
+        return frame.get("input", "")
+
+
+def run_session(conn: socket.socket):
+    """Executa o chat do assistente com entrada e saída ligadas ao cliente"""
+    session = Session(conn)
+    original_input = builtins.input
+    builtins.input = session.input
+    try:
+        with contextlib.redirect_stdout(session.output):
+            assistant.greet()
+            assistant.chat_loop()
+        session.send({"exit": True})
+    except (BrokenPipeError, ConnectionResetError):
+        _log("Cliente desconectou durante a sessão")
+    except KeyboardInterrupt:
+        # Ctrl-C fora do tratamento do chat_loop (ex: durante o greet):
+        # encerra só esta sessão, o daemon continua atendendo
+        _log("Sessão interrompida pelo cliente")
+        with contextlib.suppress(OSError):
+            session.send({"exit": True})
+    finally:
+        session.active = False
+        builtins.input = original_input
+        session.close()
+
+
+def _warm_embeddings():
+    """Carrega o modelo de embeddings agora, e não no primeiro turno da sessão"""
+    try:
+        get_embedding_provider()([""])
+    except Exception as e:
+        _log(f"Erro ao carregar o modelo de embeddings: {str(e)}")
+
+
+def _listen() -> socket.socket:
+    # Um socket sobrando de um daemon encerrado à força impede o bind
+    if os.path.exists(SOCKET_PATH):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(SOCKET_PATH)
+            probe.close()
+            raise RuntimeError(f"Já existe um daemon ativo em {SOCKET_PATH}")
+        except (ConnectionRefusedError, FileNotFoundError):
+            os.unlink(SOCKET_PATH)
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    old_umask = os.umask(0o177)  # socket acessível só pelo dono
+    try:
+        server.bind(SOCKET_PATH)
+    finally:
+        os.umask(old_umask)
+    server.listen(1)
+    server.settimeout(min(IDLE_TIMEOUT, 30))
+    return server
+
+
+def serve():
+    """Carrega o assistente e atende clientes até o tempo ocioso esgotar"""
+    server = _listen()
+    try:
+        start = time.perf_counter()
+        assistant.startup()
+        assistant.init_llm()
+        _warm_embeddings()
+        _log(f"Daemon pronto em {SOCKET_PATH} ({time.perf_counter() - start:.1f}s de carga)")
+
+        last_activity = time.monotonic()
+        while True:
+            try:
+                conn, _ = server.accept()
+            except socket.timeout:
+                if time.monotonic() - last_activity >= IDLE_TIMEOUT:
+                    _log(f"Ocioso por {IDLE_TIMEOUT:.0f}s, encerrando")
+                    break
+                continue
+            conn.settimeout(None)
+            with conn:
+                try:
+                    run_session(conn)
+                except Exception as e:
+                    _log(f"Erro na sessão: {str(e)}")
+            last_activity = time.monotonic()
+    finally:
+        server.close()
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(SOCKET_PATH)
+        assistant.shutdown()
+
+
+if __name__ == "__main__":
+    try:
+        serve()
+    except Exception as e:
+        _log(f"Erro fatal: {str(e)}")
+        print(f"Erro fatal: {e}", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,35 @@
+import os
+from typing import Optional
+
+
+def create_llm_client(backend: Optional[str] = None, **kwargs):
+    """
+    Cria o cliente de LLM configurado
+
+    Todos os backends expõem client.chat.completions.create no formato da
+    API de chat da OpenAI/Groq, então ChatStream, roteador, limitador e
+    hedging funcionam com qualquer um. Os backends são importados sob
+    demanda.
+
+    Args:
+        backend: "groq" ou "fake"; se omitido usa LLM_BACKEND
+        **kwargs: Repassados ao construtor do backend
+
+    Returns:
+        Cliente compatível com groq.Groq
+    """
+    backend = backend or os.getenv("LLM_BACKEND", "groq")
+
+    if backend == "groq":
+        import groq
+        api_key = kwargs.pop("api_key", None) or os.getenv("GROQ_API_KEY")
+        if not api_key:
+            raise ValueError("GROQ_API_KEY não encontrada no .env")
+        # 429 é tratado pelo limitador, não pelos retries do SDK
+        return groq.Groq(api_key=api_key, max_retries=0, **kwargs)
+
+    if backend == "fake":
+        from llm.fake_backend import FakeLLMClient
+        return FakeLLMClient(**kwargs)
+
+    raise ValueError(f"Backend de LLM desconhecido: {backend}")
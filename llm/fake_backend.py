@@ -0,0 +1,205 @@
+"""
+Backend de LLM falso e determinístico, no formato chat.completions
+
+Roda no próprio processo, sem rede nem chave de API: imita o cliente da Groq
+(client.chat.completions.create, com e sem stream) com tempo até o primeiro
+token, tokens por segundo e taxa de erro configuráveis. Com a mesma semente
+e a mesma sequência de requisições, as respostas e os erros se repetem.
+
+Selecionado com LLM_BACKEND=fake. Configuração:
+    FAKE_LLM_TTFT: segundos até o primeiro token (padrão 0.2)
+    FAKE_LLM_TOKENS_PER_SEC: velocidade do stream (padrão 50; 0 = sem atraso)
+    FAKE_LLM_ERROR_RATE: fração das requisições que falham (padrão 0)
+    FAKE_LLM_ERROR_STATUS: status HTTP do erro injetado (padrão 500; 429 testa o limitador)
+    FAKE_LLM_MODE: "echo" (repete a última mensagem do usuário) ou "canned"
+    FAKE_LLM_REPLY: texto devolvido no modo canned
+    FAKE_LLM_SEED: semente dos sorteios (padrão 0)
+"""
+import os
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+from typing import Iterator, List, Optional
+
+from llm.rate_limiter import CHARS_PER_TOKEN
+
+DEFAULT_REPLY = "Esta é uma resposta do backend de teste, gerada localmente sem acesso à rede."
+_TOKEN_PATTERN = re.compile(r"\S+\s*|\s+")
+
+
+class FakeAPIError(Exception):
+    """Erro injetado, com status_code e response como os erros do SDK"""
+
+    def __init__(self, message: str, status_code: int = 500, retry_after: float = 1.0):
+        super().__init__(message)
+        self.status_code = status_code
+        self.response = SimpleNamespace(
+            status_code=status_code, headers={"retry-after": str(retry_after)}
+        )
+
+
+class FakeConfig:
+    def __init__(self, ttft: float = 0.2, tokens_per_sec: float = 50.0,
+                 error_rate: float = 0.0, error_status: int = 500,
+                 mode: str = "echo", reply: str = DEFAULT_REPLY, seed: int = 0):
+        """
+        Comportamento do backend falso
+
+        Args:
+            ttft: Atraso até o primeiro token, em segundos
+            tokens_per_sec: Tokens por segundo no stream (0 = sem atraso)
+            error_rate: Fração das requisições que levantam FakeAPIError
+            error_status: status_code do erro injetado
+            mode: "echo" ou "canned"
+            reply: Texto devolvido no modo canned
+            seed: Semente dos sorteios de erro
+        """
+        if mode not in ("echo", "canned"):
+            raise ValueError(f"Modo do backend falso desconhecido: {mode}")
+        self.ttft = ttft
+        self.tokens_per_sec = tokens_per_sec
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.mode = mode
+        self.reply = reply
+        self.seed = seed
+
+    @classmethod
+    def from_env(cls) -> "FakeConfig":
+        return cls(
+            ttft=float(os.getenv("FAKE_LLM_TTFT", "0.2")),
+            tokens_per_sec=float(os.getenv("FAKE_LLM_TOKENS_PER_SEC", "50")),
+            error_rate=float(os.getenv("FAKE_LLM_ERROR_RATE", "0")),
+            error_status=int(os.getenv("FAKE_LLM_ERROR_STATUS", "500")),
+            mode=os.getenv("FAKE_LLM_MODE", "echo"),
+            reply=os.getenv("FAKE_LLM_REPLY", DEFAULT_REPLY),
+            seed=int(os.getenv("FAKE_LLM_SEED", "0")),
+        )
+
+
+def _tokenize(text: str) -> List[str]:
+    return _TOKEN_PATTERN.findall(text)
+
+
+class _FakeResponse:
+    """Imita a resposta HTTP: close() interrompe o stream (usado no hedging)"""
+
+    def __init__(self):
+        self.closed = threading.Event()
+
+    def close(self):
+        self.closed.set()
+
+
+class FakeStream:
+    """Stream de chunks chat.completion.chunk com os atrasos configurados"""
+
+    def __init__(self, completion_id: str, model: str, tokens: List[str],
+                 finish_reason: str, config: FakeConfig, timeout: Optional[float]):
+        self.id = completion_id
+        self.model = model
+        self.response = _FakeResponse()
+        self._tokens = tokens
+        self._finish_reason = finish_reason
+        self._config = config
+        self._timeout = timeout
+
+    def _chunk(self, content: Optional[str], finish_reason: Optional[str] = None):
+        return SimpleNamespace(
+            id=self.id, object="chat.completion.chunk", created=int(time.time()),
+            model=self.model,
+            choices=[SimpleNamespace(
+                index=0, finish_reason=finish_reason,
+                delta=SimpleNamespace(role="assistant", content=content)
+            )]
+        )
+
+    def _wait(self, delay: float) -> bool:
+        """Espera delay segundos; False se o stream foi fechado"""
+        if delay > 0:
+            return not self.response.closed.wait(delay)
+        return not self.response.closed.is_set()
+
+    def __iter__(self) -> Iterator[SimpleNamespace]:
+        ttft = self._config.ttft
+        if self._timeout is not None and ttft > self._timeout:
+            self._wait(self._timeout)
+            raise TimeoutError(f"Backend falso: sem resposta em {self._timeout:.1f}s")
+        if not self._wait(ttft):
+            return
+        delay = 1 / self._config.tokens_per_sec if self._config.tokens_per_sec > 0 else 0
+        for i, token in enumerate(self._tokens):
+            if i and not self._wait(delay):
+                return
+            yield self._chunk(token)
+        yield self._chunk(None, self._finish_reason)
+
+    def close(self):
+        self.response.close()
+
+
+class _Completions:
+    def __init__(self, client: "FakeLLMClient"):
+        self._client = client
+
+    def create(self, model: str, messages: List[dict], stream: bool = False,
+               max_tokens: Optional[int] = None, timeout: Optional[float] = None, **params):
+        """Mesma assinatura de client.chat.completions.create (parâmetros extras são ignorados)"""
+        return self._client._create(model, messages, stream, max_tokens, timeout)
+
+
+class FakeLLMClient:
+    def __init__(self, config: Optional[FakeConfig] = None):
+        """Cliente em processo compatível com o cliente da Groq"""
+        self.config = config or FakeConfig.from_env()
+        self.chat = SimpleNamespace(completions=_Completions(self))
+        self.stats = {"requests": 0, "errors": 0, "completion_tokens": 0}
+        self._random = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+
+    def _reply(self, messages: List[dict]) -> str:
+        if self.config.mode == "canned":
+            return self.config.reply
+        last = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "")
+        return f"Eco: {last}"
+
+    def _create(self, model: str, messages: List[dict], stream: bool,
+                max_tokens: Optional[int], timeout: Optional[float]):
+        with self._lock:
+            self.stats["requests"] += 1
+            number = self.stats["requests"]
+            failed = self._random.random() < self.config.error_rate
+            if failed:
+                self.stats["errors"] += 1
+        if failed:
+            raise FakeAPIError(f"Erro injetado pelo backend falso (requisição {number})",
+                               status_code=self.config.error_status)
+
+        tokens = _tokenize(self._reply(messages))
+        finish_reason = "stop"
+        if max_tokens is not None and len(tokens) > max_tokens:
+            tokens, finish_reason = tokens[:max_tokens], "length"
+        with self._lock:
+            self.stats["completion_tokens"] += len(tokens)
+
+        completion_id = f"fake-{number}"
+        if stream:
+            return FakeStream(completion_id, model, tokens, finish_reason, self.config, timeout)
+
+        # Sem stream: espera o tempo total da geração e devolve tudo de uma vez
+        for chunk in FakeStream(completion_id, model, tokens, finish_reason, self.config, timeout):
+            pass
+        prompt_tokens = sum(len(m.get("content") or "") for m in messages) // CHARS_PER_TOKEN
+        return SimpleNamespace(
+            id=completion_id, object="chat.completion", created=int(time.time()), model=model,
+            choices=[SimpleNamespace(
+                index=0, finish_reason=finish_reason,
+                message=SimpleNamespace(role="assistant", content="".join(tokens))
+            )],
+            usage=SimpleNamespace(
+                prompt_tokens=prompt_tokens, completion_tokens=len(tokens),
+                total_tokens=prompt_tokens + len(tokens)
+            )
+        )
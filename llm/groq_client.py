@@ -1,19 +1,24 @@
 import os
 from typing import List, Dict, Optional
 from dotenv import load_dotenv
-import groq
+from llm.backends import create_llm_client
+from llm.router import get_router
+from llm.hedging import ChatStream, get_requester
+from llm.rate_limiter import CHARS_PER_TOKEN, PRIORITY_BATCH, estimate_tokens, get_rate_limiter
 
 class GroqClient:
     def __init__(self):
         """Inicializa o cliente Groq"""
         load_dotenv()
         
-        self.api_key = os.getenv("GROQ_API_KEY")
-        if not self.api_key:
-            raise ValueError("GROQ_API_KEY não encontrada no .env")
-            
         self.model = os.getenv("GROQ_MODEL", "mixtral-8x7b-32768")
-        self.client = groq.Client(api_key=self.api_key)
+        self.timeout = float(os.getenv("GROQ_TIMEOUT", "30"))
+        # Groq ou backend falso local (LLM_BACKEND)
+        self.client = create_llm_client()
+        # Escolhe o modelo por requisição (GROQ_FAST_MODELS / GROQ_LARGE_MODELS)
+        self.router = get_router()
+        # Prazo por requisição e duplicação opcional (GROQ_DEADLINE / GROQ_HEDGE)
+        self.requester = get_requester()
         
         print(f"✨ Groq inicializado com modelo {self.model}")
         
@@ -22,7 +27,9 @@ class GroqClient:
         prompt: str,
         system: Optional[str] = None,
         max_tokens: int = 1024,
-        temperature: float = 0.7
+        temperature: float = 0.7,
+        caller: Optional[str] = None,
+        priority: int = PRIORITY_BATCH
     ) -> str:
         """Gera uma resposta usando o Groq"""
         try:
@@ -31,16 +38,35 @@ class GroqClient:
                 messages.append({"role": "system", "content": system})
             messages.append({"role": "user", "content": prompt})
             
-            completion = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                max_tokens=max_tokens,
-                temperature=temperature,
-                top_p=0.9,
-                stream=False
-            )
+            tokens = estimate_tokens(messages, max_tokens)
+            prompt_tokens = estimate_tokens(messages, 0)
+            
+            def open_stream(model: str, attempt_cancel) -> ChatStream:
+                # Respeita RPM/TPM do modelo (GROQ_RPM / GROQ_TPM), acertando
+                # a reserva com o tamanho real da resposta
+                limiter = get_rate_limiter(model)
+                return limiter.call(
+                    lambda: ChatStream(
+                        self.client, model, messages,
+                        on_done=lambda chars: limiter.settle(tokens, prompt_tokens + chars // CHARS_PER_TOKEN),
+                        max_tokens=max_tokens,
+                        temperature=temperature,
+                        top_p=0.9,
+                        timeout=self.timeout
+                    ),
+                    tokens, priority, timeout=self.requester.deadline, cancel=attempt_cancel
+                )
             
-            return completion.choices[0].message.content
+            def request(model: str) -> str:
+                return self.requester.call(
+                    open_stream, model, hedge_model=os.getenv("GROQ_HEDGE_MODEL")
+                )
+            
+            return self.router.call(
+                request,
+                prompt_chars=len(prompt),
+                caller=caller
+            )
             
         except Exception as e:
             print(f"❌ Erro ao gerar resposta via Groq: {str(e)}")
@@ -49,19 +75,19 @@ class GroqClient:
     def generate_code(self, instruction: str, max_tokens: int = 1024) -> str:
         """Gera código baseado na instrução fornecida"""
         system = "You are an expert programmer. Write clean, efficient, and well-documented code."
-        return self._generate_response(instruction, system, max_tokens)
+        return self._generate_response(instruction, system, max_tokens, caller="generate_code")
         
     def explain_code(self, code: str, max_tokens: int = 1024) -> str:
         """Explica o código fornecido"""
         system = "You are a programming teacher. Explain code clearly and thoroughly."
         prompt = f"Explain this code:\n```\n{code}\n```"
-        return self._generate_response(prompt, system, max_tokens)
+        return self._generate_response(prompt, system, max_tokens, caller="explain_code")
         
     def improve_code(self, code: str, max_tokens: int = 1024) -> str:
         """Sugere melhorias para o código"""
         system = "You are a code reviewer. Suggest improvements focusing on efficiency, readability, and best practices."
         prompt = f"Suggest improvements for:\n```\n{code}\n```"
-        return self._generate_response(prompt, system, max_tokens)
+        return self._generate_response(prompt, system, max_tokens, caller="improve_code")
         
     def debug_code(self, code: str, error: Optional[str] = None, max_tokens: int = 1024) -> str:
         """Debug o código fornecido"""
@@ -69,7 +95,7 @@ class GroqClient:
         prompt = f"Debug this code:\n```\n{code}\n```"
         if error:
             prompt += f"\nError message:\n{error}"
-        return self._generate_response(prompt, system, max_tokens)
+        return self._generate_response(prompt, system, max_tokens, caller="debug_code")
 
 if __name__ == "__main__":
     # Teste rápido
@@ -0,0 +1,273 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Iterable, List, Optional
+
+
+class ChatStream:
+    """Stream de texto de um chat.completions compatível com a API da OpenAI"""
+
+    def __init__(self, client, model: str, messages: List[dict],
+                 on_done: Optional[Callable[[int], None]] = None, **params):
+        """
+        Args:
+            on_done: Chamado uma vez, ao fim ou fechamento do stream, com o
+                número de caracteres recebidos (ex: acertar o limitador)
+        """
+        self._on_done = on_done
+        self._done_lock = threading.Lock()
+        self._chars = 0
+        self._stream = client.chat.completions.create(
+            model=model, messages=messages, stream=True, **params
+        )
+
+    def __iter__(self):
+        try:
+            for chunk in self._stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    self._chars += len(chunk.choices[0].delta.content)
+                    yield chunk.choices[0].delta.content
+        finally:
+            self._finish()
+
+    def _finish(self):
+        # Fim da leitura e close() podem ocorrer em threads diferentes
+        with self._done_lock:
+            on_done, self._on_done = self._on_done, None
+        if on_done:
+            on_done(self._chars)
+
+    def close(self):
+        """Fecha a conexão HTTP, interrompendo a leitura em outra thread"""
+        response = getattr(self._stream, "response", None)
+        if response is not None:
+            response.close()
+        self._finish()
+
+
+class GenerationCancelled(Exception):
+    """Geração interrompida pelo usuário; partial guarda o texto já recebido"""
+
+    def __init__(self, partial: str = ""):
+        super().__init__("Geração cancelada pelo usuário")
+        self.partial = partial
+
+
+class _Attempt:
+    """Uma requisição em andamento, executada em thread própria"""
+
+    def __init__(self, model: str, open_stream: Callable[[str, threading.Event], Iterable[str]],
+                 on_first_token: Callable[["_Attempt"], None]):
+        self.model = model
+        self.started_at = time.monotonic()
+        self.first_token_at: Optional[float] = None
+        self.chunks: List[str] = []
+        self.error: Optional[BaseException] = None
+        self.done = threading.Event()
+        self.cancelled = False
+        # Repassado a open_stream: interrompe a espera no limitador
+        self.cancel_event = threading.Event()
+        self._stream = None
+        self._open_stream = open_stream
+        self._on_first_token = on_first_token
+        self._thread = threading.Thread(target=self._run, name=f"llm-{model}", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            self._stream = self._open_stream(self.model, self.cancel_event)
+            if self.cancelled:
+                return
+            for chunk in self._stream:
+                if self.cancelled:
+                    break
+                if self.first_token_at is None:
+                    self.first_token_at = time.monotonic()
+                    self._on_first_token(self)
+                self.chunks.append(chunk)
+        except BaseException as e:
+            self.error = e
+        finally:
+            if self.cancelled:
+                self._close()
+            self.done.set()
+
+    def _close(self):
+        close = getattr(self._stream, "close", None)
+        if close:
+            try:
+                close()
+            except Exception:
+                pass
+
+    def cancel(self):
+        """Cancela a requisição e fecha o stream (e a conexão HTTP)"""
+        self.cancelled = True
+        self.cancel_event.set()
+        self._close()
+
+
+class HedgedRequester:
+    def __init__(self, deadline: float = 60.0, hedging: bool = False,
+                 hedge_percentile: float = 0.95, initial_hedge_delay: float = 2.0,
+                 min_hedge_delay: float = 0.3, min_samples: int = 10, window: int = 100):
+        """
+        Requisições ao LLM com prazo máximo e duplicação opcional (hedging)
+
+        Se o primeiro token não chegar dentro do percentil configurado dos
+        tempos observados, uma requisição duplicada é disparada (talvez em
+        outro modelo); a primeira a produzir um token vence e a outra é
+        cancelada.
+
+        Args:
+            deadline: Tempo máximo total de cada requisição, em segundos
+            hedging: Se dispara a requisição duplicada
+            hedge_percentile: Percentil do tempo até o primeiro token que
+                define quando duplicar
+            initial_hedge_delay: Atraso usado enquanto há poucas amostras
+            min_hedge_delay: Atraso mínimo antes de duplicar
+            min_samples: Amostras necessárias para usar o percentil
+            window: Quantidade de tempos até o primeiro token guardados
+        """
+        self.deadline = deadline
+        self.hedging = hedging
+        self.hedge_percentile = hedge_percentile
+        self.initial_hedge_delay = initial_hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.min_samples = min_samples
+
+        self._ttft: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.stats = {
+            "requests": 0, "hedged": 0, "hedge_wins": 0,
+            "cancelled": 0, "deadline_exceeded": 0
+        }
+
+    @classmethod
+    def from_env(cls) -> "HedgedRequester":
+        """Cria a partir de GROQ_DEADLINE, GROQ_HEDGE e GROQ_HEDGE_PERCENTILE"""
+        return cls(
+            deadline=float(os.getenv("GROQ_DEADLINE", "60")),
+            hedging=os.getenv("GROQ_HEDGE", "0") == "1",
+            hedge_percentile=float(os.getenv("GROQ_HEDGE_PERCENTILE", "0.95")),
+        )
+
+    def hedge_delay(self) -> float:
+        """Tempo de espera pelo primeiro token antes de duplicar"""
+        with self._lock:
+            samples = sorted(self._ttft)
+        if len(samples) < self.min_samples:
+            return self.initial_hedge_delay
+        index = min(len(samples) - 1, int(len(samples) * self.hedge_percentile))
+        return max(self.min_hedge_delay, samples[index])
+
+    def _count(self, key: str, amount: int = 1):
+        with self._lock:
+            self.stats[key] += amount
+
+    def call(self, open_stream: Callable[[str, threading.Event], Iterable[str]], model: str,
+             hedge_model: Optional[str] = None,
+             cancel: Optional[threading.Event] = None) -> str:
+        """
+        Executa a requisição respeitando o prazo e duplicando se necessário
+
+        Args:
+            open_stream: Abre o stream de texto para o modelo informado; recebe
+                também o evento de cancelamento da tentativa (para o limitador)
+            model: Modelo principal
+            hedge_model: Modelo da requisição duplicada (padrão: o mesmo)
+            cancel: Quando sinalizado, fecha os streams e levanta
+                GenerationCancelled com o texto parcial
+
+        Returns:
+            str: Texto completo da resposta vencedora
+        """
+        self._count("requests")
+        deadline = time.monotonic() + self.deadline
+        first_token = threading.Event()
+        winner: List[_Attempt] = []
+        winner_lock = threading.Lock()
+
+        def on_first_token(attempt: _Attempt):
+            with winner_lock:
+                if not winner:
+                    winner.append(attempt)
+                    first_token.set()
+
+        attempts = [_Attempt(model, open_stream, on_first_token)]
+
+        def check_cancel():
+            if cancel is None or not cancel.is_set():
+                return
+            for attempt in attempts:
+                attempt.cancel()
+            self._count("cancelled", len(attempts))
+            raise GenerationCancelled("".join(winner[0].chunks) if winner else "")
+
+        def wait_first(timeout: float) -> bool:
+            # Retorna ao chegar o primeiro token ou quando todas as tentativas acabam
+            end = time.monotonic() + timeout
+            while time.monotonic() < end:
+                check_cancel()
+                if first_token.wait(min(0.05, max(0.0, end - time.monotonic()))):
+                    return True
+                if all(a.done.is_set() for a in attempts):
+                    return first_token.is_set()
+            return first_token.is_set()
+
+        if self.hedging:
+            delay = min(self.hedge_delay(), max(0.0, deadline - time.monotonic()))
+            if not wait_first(delay) and not attempts[0].done.is_set():
+                self._count("hedged")
+                attempts.append(_Attempt(hedge_model or model, open_stream, on_first_token))
+
+        if not wait_first(max(0.0, deadline - time.monotonic())):
+            check_cancel()
+            if all(a.done.is_set() for a in attempts):
+                failed = [a for a in attempts if a.error is not None]
+                if failed:
+                    raise failed[-1].error
+                return ""
+            for attempt in attempts:
+                attempt.cancel()
+            self._count("cancelled", len(attempts))
+            self._count("deadline_exceeded")
+            raise TimeoutError(f"Sem resposta de {model} em {self.deadline:.0f}s")
+
+        chosen = winner[0]
+        with self._lock:
+            self._ttft.append(chosen.first_token_at - chosen.started_at)
+        if chosen is not attempts[0]:
+            self._count("hedge_wins")
+        for attempt in attempts:
+            if attempt is not chosen:
+                attempt.cancel()
+                self._count("cancelled")
+
+        while not chosen.done.wait(min(0.05, max(0.0, deadline - time.monotonic()))):
+            if cancel is not None and cancel.is_set():
+                chosen.cancel()
+                self._count("cancelled")
+                raise GenerationCancelled("".join(chosen.chunks))
+            if time.monotonic() >= deadline:
+                chosen.cancel()
+                self._count("cancelled")
+                self._count("deadline_exceeded")
+                raise TimeoutError(f"Resposta de {chosen.model} excedeu {self.deadline:.0f}s")
+        if chosen.error is not None:
+            raise chosen.error
+        return "".join(chosen.chunks)
+
+
+_default_requester = None
+_default_lock = threading.Lock()
+
+
+def get_requester() -> HedgedRequester:
+    """Instância compartilhada pelo processo (estatísticas em comum)"""
+    global _default_requester
+    with _default_lock:
+        if _default_requester is None:
+            _default_requester = HedgedRequester.from_env()
+        return _default_requester
@@ -0,0 +1,212 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+# Turnos do chat passam na frente das chamadas em lote dos helpers
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+# Caracteres por token usados na estimativa
+CHARS_PER_TOKEN = 4
+
+
+class RequestCancelled(Exception):
+    """Requisição cancelada enquanto aguardava na fila do limitador"""
+
+
+def estimate_tokens(messages: List[dict], max_tokens: int) -> int:
+    """Estima os tokens de uma requisição: prompt + resposta máxima"""
+    prompt_chars = sum(len(m.get("content") or "") for m in messages)
+    return prompt_chars // CHARS_PER_TOKEN + max_tokens
+
+
+class RateLimiter:
+    def __init__(self, rpm: int = 30, tpm: int = 5000):
+        """
+        Limita requisições e tokens por minuto com dois token buckets
+
+        As requisições aguardam numa fila de prioridade; só a primeira da
+        fila consome dos buckets, então uma chamada interativa nunca espera
+        atrás de um lote de helpers. Um 429 do servidor pausa a fila inteira
+        pelo retry-after em vez de cada chamador repetir por conta própria.
+
+        Args:
+            rpm: Requisições por minuto (0 desativa o limite)
+            tpm: Tokens por minuto (0 desativa o limite)
+        """
+        self.rpm = rpm
+        self.tpm = tpm
+        now = time.monotonic()
+        self._request_level = float(rpm)
+        self._token_level = float(tpm)
+        self._updated = now
+        self._blocked_until = 0.0
+
+        self._queue: List[tuple] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self.stats = {"acquired": 0, "waited": 0, "wait_seconds": 0.0, "rate_limited": 0,
+                      "refunded": 0}
+
+    @classmethod
+    def from_env(cls) -> "RateLimiter":
+        """
+        Cria a partir de GROQ_RPM e GROQ_TPM
+
+        Os padrões (30 req/min, 5000 tokens/min) são os menores limites do
+        plano gratuito da Groq; com outro plano, use os valores da conta.
+        """
+        return cls(
+            rpm=int(os.getenv("GROQ_RPM", "30")),
+            tpm=int(os.getenv("GROQ_TPM", "5000")),
+        )
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        self._updated = now
+        if self.rpm:
+            self._request_level = min(self.rpm, self._request_level + elapsed * self.rpm / 60.0)
+        if self.tpm:
+            self._token_level = min(self.tpm, self._token_level + elapsed * self.tpm / 60.0)
+
+    def _wait_time(self, tokens: int, now: float) -> float:
+        """Segundos até haver saldo para a requisição"""
+        wait = self._blocked_until - now
+        if self.rpm and self._request_level < 1:
+            wait = max(wait, (1 - self._request_level) * 60.0 / self.rpm)
+        if self.tpm and self._token_level < tokens:
+            wait = max(wait, (tokens - self._token_level) * 60.0 / self.tpm)
+        return wait
+
+    def acquire(self, tokens: int, priority: int = PRIORITY_BATCH,
+                timeout: Optional[float] = None,
+                cancel: Optional[threading.Event] = None):
+        """
+        Aguarda saldo para uma requisição e o consome
+
+        Args:
+            tokens: Tokens estimados (ver estimate_tokens)
+            priority: Menor valor passa na frente
+            timeout: Espera máxima em segundos (None espera indefinidamente)
+            cancel: Quando sinalizado, sai da fila sem consumir saldo e
+                levanta RequestCancelled
+        """
+        if self.tpm:
+            tokens = min(tokens, self.tpm)  # Maior que o bucket nunca passaria
+        start = time.monotonic()
+        end = None if timeout is None else start + timeout
+        entry = (priority, next(self._seq))
+
+        with self._cond:
+            heapq.heappush(self._queue, entry)
+            try:
+                while True:
+                    if cancel is not None and cancel.is_set():
+                        raise RequestCancelled("Requisição cancelada na fila do limitador")
+                    now = time.monotonic()
+                    self._refill(now)
+                    wait = None
+                    if self._queue[0] == entry:
+                        wait = self._wait_time(tokens, now)
+                        if wait <= 0:
+                            break
+                    if end is not None:
+                        if now >= end:
+                            raise TimeoutError(f"Limite de requisições: espera maior que {timeout:.1f}s")
+                        wait = end - now if wait is None else min(wait, end - now)
+                    if cancel is not None:
+                        # O evento não notifica a condição: confere em intervalos curtos
+                        wait = 0.05 if wait is None else min(wait, 0.05)
+                    self._cond.wait(wait)
+            except BaseException:
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+                self._cond.notify_all()
+                raise
+
+            heapq.heappop(self._queue)
+            if self.rpm:
+                self._request_level -= 1
+            if self.tpm:
+                self._token_level -= tokens
+            waited = time.monotonic() - start
+            self.stats["acquired"] += 1
+            if waited > 0.001:
+                self.stats["waited"] += 1
+                self.stats["wait_seconds"] += waited
+            self._cond.notify_all()
+
+    def settle(self, reserved: int, used: int):
+        """
+        Devolve ao bucket a parte não usada de uma reserva
+
+        acquire reserva a resposta máxima (max_tokens); quando o stream
+        termina, o uso real é conhecido e a diferença volta ao saldo, para
+        que respostas curtas não limitem o chat ao pior caso.
+
+        Args:
+            reserved: Tokens passados a acquire
+            used: Tokens usados de fato (prompt + resposta)
+        """
+        if not self.tpm:
+            return
+        refund = min(reserved, self.tpm) - used
+        if refund <= 0:
+            return
+        with self._cond:
+            self._token_level = min(self.tpm, self._token_level + refund)
+            self.stats["refunded"] += refund
+            self._cond.notify_all()
+
+    def backoff(self, retry_after: float):
+        """Pausa a fila após um 429 do servidor"""
+        with self._cond:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+            self.stats["rate_limited"] += 1
+            self._cond.notify_all()
+
+    def call(self, func: Callable, tokens: int, priority: int = PRIORITY_BATCH,
+             timeout: Optional[float] = None, cancel: Optional[threading.Event] = None):
+        """
+        Executa func() após obter saldo, pausando a fila se receber 429
+
+        Args:
+            func: Requisição a executar
+            tokens: Tokens estimados
+            priority: Prioridade da requisição
+            timeout: Espera máxima na fila
+            cancel: Cancela a espera na fila (ver acquire)
+        """
+        self.acquire(tokens, priority, timeout, cancel)
+        try:
+            return func()
+        except Exception as e:
+            if getattr(e, "status_code", None) == 429:
+                self.backoff(_retry_after(e))
+            raise
+
+
+def _retry_after(error: Exception, default: float = 2.0) -> float:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after", default))
+    except (TypeError, ValueError):
+        return default
+
+
+# Os limites da Groq são por modelo
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(model: str) -> RateLimiter:
+    """Limitador compartilhado pelo processo para o modelo informado"""
+    with _limiters_lock:
+        limiter = _limiters.get(model)
+        if limiter is None:
+            limiter = _limiters[model] = RateLimiter.from_env()
+        return limiter
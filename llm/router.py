@@ -0,0 +1,181 @@
+import os
+import statistics
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from llm.hedging import GenerationCancelled
+
+# Helpers que sempre merecem o modelo maior
+HEAVY_CALLERS = {"generate_code", "improve_code", "debug_code"}
+
+
+class ModelRouter:
+    def __init__(self, fast_models: List[str], large_models: List[str],
+                 fast_max_prompt_chars: int = 600, fast_max_context_chars: int = 2000,
+                 heavy_callers: Optional[set] = None, latency_window: int = 20,
+                 error_penalty: float = 10.0, log_file: Optional[str] = "routing.log"):
+        """
+        Escolhe o modelo de cada requisição entre um grupo rápido e um grande
+
+        Regras: prompts curtos, pouco contexto recuperado e helpers leves vão
+        para o grupo rápido; o resto para o grande. Dentro de cada grupo a
+        ordem segue a latência mediana observada, e os demais modelos servem
+        de fallback em caso de erro ou timeout.
+
+        Args:
+            fast_models: Modelos de baixa latência, em ordem de preferência
+            large_models: Modelos para tarefas difíceis, em ordem de preferência
+            fast_max_prompt_chars: Tamanho máximo da pergunta para o grupo rápido
+            fast_max_context_chars: Contexto recuperado máximo para o grupo rápido
+            heavy_callers: Helpers que sempre usam o grupo grande
+            latency_window: Número de latências guardadas por modelo
+            error_penalty: Latência mínima registrada para uma chamada com erro,
+                para que modelos instáveis caiam na ordem de preferência
+            log_file: Arquivo onde as decisões são registradas (None desativa)
+        """
+        self.fast_models = fast_models
+        self.large_models = large_models
+        self.fast_max_prompt_chars = fast_max_prompt_chars
+        self.fast_max_context_chars = fast_max_context_chars
+        self.heavy_callers = HEAVY_CALLERS if heavy_callers is None else heavy_callers
+        self.log_file = log_file
+
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._window = latency_window
+        self.error_penalty = error_penalty
+        self._lock = threading.Lock()
+        self.decisions: Deque[Dict] = deque(maxlen=200)
+
+    @classmethod
+    def from_env(cls) -> "ModelRouter":
+        """Cria o roteador a partir das variáveis de ambiente"""
+        def models(name, default):
+            return [m.strip() for m in os.getenv(name, default).split(",") if m.strip()]
+
+        return cls(
+            fast_models=models("GROQ_FAST_MODELS", "llama3-8b-8192"),
+            large_models=models("GROQ_LARGE_MODELS", os.getenv("GROQ_MODEL", "mixtral-8x7b-32768")),
+            fast_max_prompt_chars=int(os.getenv("ROUTER_FAST_MAX_PROMPT_CHARS", "600")),
+            fast_max_context_chars=int(os.getenv("ROUTER_FAST_MAX_CONTEXT_CHARS", "2000")),
+        )
+
+    def median_latency(self, model: str) -> Optional[float]:
+        """Latência mediana recente do modelo, em segundos"""
+        with self._lock:
+            samples = self._latencies.get(model)
+            return statistics.median(samples) if samples else None
+
+    def _by_latency(self, models: List[str]) -> List[str]:
+        # Modelos sem amostras mantêm a ordem configurada e vêm primeiro
+        order = {model: i for i, model in enumerate(models)}
+        return sorted(models, key=lambda m: (self.median_latency(m) or 0.0, order[m]))
+
+    def choose(self, prompt_chars: int, caller: Optional[str] = None,
+               context_chars: int = 0) -> Tuple[List[str], str]:
+        """
+        Decide a ordem de modelos para uma requisição
+
+        Args:
+            prompt_chars: Tamanho da pergunta em caracteres (sem prompt de
+                sistema nem contexto recuperado)
+            caller: Helper que originou a chamada (ex: generate_code)
+            context_chars: Tamanho do contexto recuperado da memória
+
+        Returns:
+            tuple: (modelos em ordem de tentativa, motivo da escolha)
+        """
+        if caller in self.heavy_callers:
+            tier, reason = "large", f"helper {caller}"
+        elif prompt_chars > self.fast_max_prompt_chars:
+            tier, reason = "large", f"prompt com {prompt_chars} caracteres"
+        elif context_chars > self.fast_max_context_chars:
+            tier, reason = "large", f"contexto com {context_chars} caracteres"
+        else:
+            tier, reason = "fast", "requisição curta"
+
+        primary, secondary = (
+            (self.fast_models, self.large_models) if tier == "fast"
+            else (self.large_models, self.fast_models)
+        )
+        ordered = self._by_latency(primary) + [m for m in secondary if m not in primary]
+        return ordered, reason
+
+    def record(self, model: str, latency: float):
+        """Registra a latência observada de uma chamada"""
+        with self._lock:
+            samples = self._latencies.setdefault(model, deque(maxlen=self._window))
+            samples.append(latency)
+
+    def _log(self, decision: Dict):
+        self.decisions.append(decision)
+        if not self.log_file:
+            return
+        try:
+            with open(self.log_file, "a") as f:
+                f.write(
+                    f"{decision['timestamp']} caller={decision['caller']} "
+                    f"model={decision['model']} reason=\"{decision['reason']}\" "
+                    f"latency={decision['latency']:.3f}s ok={decision['ok']}"
+                    f"{' error=' + decision['error'] if decision.get('error') else ''}\n"
+                )
+        except OSError:
+            pass
+
+    def call(self, func: Callable[[str], str], prompt_chars: int,
+             caller: Optional[str] = None, context_chars: int = 0):
+        """
+        Executa func(model) no modelo escolhido, com fallback para os demais
+
+        Args:
+            func: Função que faz a requisição para o modelo informado
+            prompt_chars: Tamanho da pergunta em caracteres (sem prompt de
+                sistema nem contexto recuperado)
+            caller: Helper que originou a chamada
+            context_chars: Tamanho do contexto recuperado
+
+        Returns:
+            Resultado de func no primeiro modelo que responder
+        """
+        models, reason = self.choose(prompt_chars, caller, context_chars)
+        last_error = None
+        for model in models:
+            start = time.perf_counter()
+            try:
+                result = func(model)
+            except GenerationCancelled:
+                raise  # Cancelado pelo usuário: sem fallback nem penalidade
+            except Exception as e:
+                latency = time.perf_counter() - start
+                self.record(model, max(latency, self.error_penalty))
+                self._log({
+                    "timestamp": datetime.now().isoformat(), "caller": caller,
+                    "model": model, "reason": reason, "latency": latency,
+                    "ok": False, "error": str(e)
+                })
+                last_error = e
+                reason = f"fallback após erro em {model}"
+                continue
+            latency = time.perf_counter() - start
+            self.record(model, latency)
+            self._log({
+                "timestamp": datetime.now().isoformat(), "caller": caller,
+                "model": model, "reason": reason, "latency": latency, "ok": True
+            })
+            return result
+        raise last_error or RuntimeError("Nenhum modelo configurado")
+
+
+_default_router = None
+_default_lock = threading.Lock()
+
+
+def get_router() -> ModelRouter:
+    """Roteador compartilhado pelo processo (latências observadas em comum)"""
+    global _default_router
+    with _default_lock:
+        if _default_router is None:
+            _default_router = ModelRouter.from_env()
+        return _default_router
@@ -0,0 +1,135 @@
+"""
+Servidor local que imita o endpoint de chat da Groq, com atrasos injetados
+
+Uso:
+    python -m llm.stub_server --port 8765 --ttft 0.2 --slow-rate 0.1 --slow-ttft 5
+
+e depois GROQ_BASE_URL=http://127.0.0.1:8765 para que o cliente Groq use o
+servidor. Serve para testar prazos e hedging sem depender da API real.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubConfig:
+    def __init__(self, ttft: float = 0.2, token_delay: float = 0.01,
+                 slow_rate: float = 0.0, slow_ttft: float = 5.0,
+                 error_rate: float = 0.0, reply: str = "Resposta do servidor de teste."):
+        """
+        Comportamento do servidor
+
+        Args:
+            ttft: Atraso até o primeiro token, em segundos
+            token_delay: Atraso entre tokens
+            slow_rate: Fração das requisições que demoram slow_ttft
+            slow_ttft: Atraso até o primeiro token nas requisições lentas
+            error_rate: Fração das requisições que retornam erro 500
+            reply: Texto devolvido (em tokens separados por espaço)
+        """
+        self.ttft = ttft
+        self.token_delay = token_delay
+        self.slow_rate = slow_rate
+        self.slow_ttft = slow_ttft
+        self.error_rate = error_rate
+        self.reply = reply
+        self.requests = 0
+        self.lock = threading.Lock()
+
+
+def _make_handler(config: StubConfig):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            with config.lock:
+                config.requests += 1
+
+            if random.random() < config.error_rate:
+                payload = json.dumps({"error": {"message": "erro injetado"}}).encode()
+                self.send_response(500)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+                return
+
+            slow = random.random() < config.slow_rate
+            time.sleep(config.slow_ttft if slow else config.ttft)
+            model = body.get("model", "stub")
+            tokens = [t + " " for t in config.reply.split()]
+
+            if not body.get("stream"):
+                payload = json.dumps({
+                    "id": "stub", "object": "chat.completion", "created": int(time.time()),
+                    "model": model,
+                    "choices": [{
+                        "index": 0, "finish_reason": "stop",
+                        "message": {"role": "assistant", "content": "".join(tokens)}
+                    }]
+                }).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            try:
+                for token in tokens:
+                    chunk = {
+                        "id": "stub", "object": "chat.completion.chunk",
+                        "created": int(time.time()), "model": model,
+                        "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]
+                    }
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                    self.wfile.flush()
+                    time.sleep(config.token_delay)
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # Cliente cancelou a requisição
+            self.close_connection = True
+
+    return Handler
+
+
+def start_server(config: StubConfig, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """Inicia o servidor em uma thread e retorna a instância (porta em server_address)"""
+    server = ThreadingHTTPServer((host, port), _make_handler(config))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor de teste compatível com a API da Groq")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--ttft", type=float, default=0.2)
+    parser.add_argument("--token-delay", type=float, default=0.01)
+    parser.add_argument("--slow-rate", type=float, default=0.0)
+    parser.add_argument("--slow-ttft", type=float, default=5.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    config = StubConfig(args.ttft, args.token_delay, args.slow_rate, args.slow_ttft, args.error_rate)
+    server = ThreadingHTTPServer((args.host, args.port), _make_handler(config))
+    server.daemon_threads = True
+    print(f"Servidor de teste em http://{args.host}:{args.port} (GROQ_BASE_URL)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
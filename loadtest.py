@@ -0,0 +1,389 @@
+"""
+Teste de carga: reproduz conversas gravadas nos checkpoints
+
+Lê as conversas de checkpoints/data/*/messages.json (e dos arquivos .ckpt),
+opcionalmente multiplicadas com variações sintéticas, e as envia a
+handle_user_input em vários processos. Cada processo é uma instância isolada
+do assistente (NEXUS_DATA_DIR próprio dentro do diretório do teste), com o
+backend de LLM falso por padrão (LLM_BACKEND=fake). Com o backend falso o
+limitador de requisições (GROQ_RPM/GROQ_TPM) fica desativado, a menos que
+--limit seja usado: os limites da API mediriam as esperas da fila, não o
+assistente.
+
+Mede vazão, percentis de latência do turno e de cada etapa do pipeline
+(TurnPipeline.last_timings), e o crescimento de memória (RSS) e de disco de
+cada instância ao longo do tempo.
+
+Uso:
+    python loadtest.py --concurrency 4 --rate 2 --duration 120 --scale 3 --report carga.json
+
+--rate 0 (padrão) envia cada turno assim que o anterior termina; com --rate
+as chegadas seguem um processo de Poisson com a taxa total informada, e o
+atraso em relação ao horário previsto é medido à parte (lag).
+"""
+import argparse
+import contextlib
+import glob
+import multiprocessing
+import os
+import queue
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from llm.rate_limiter import RateLimiter
+from memory import serialization
+from memory.checkpoint_archive import CheckpointArchive
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+PERCENTILES = (50, 95, 99)
+
+
+def load_transcripts(checkpoint_dir: str) -> List[List[str]]:
+    """
+    Lê as mensagens do usuário de cada checkpoint gravado
+
+    Checkpoints seguidos repetem parte da mesma conversa; transcrições
+    idênticas são descartadas.
+
+    Returns:
+        List[List[str]]: Mensagens do usuário de cada transcrição, em ordem
+    """
+    data_dir = os.path.join(checkpoint_dir, "data")
+    transcripts, seen = [], set()
+    for path in sorted(glob.glob(os.path.join(data_dir, "*"))):
+        try:
+            if path.endswith(".ckpt"):
+                messages = CheckpointArchive(path).read_json("messages.json")
+            elif os.path.isfile(os.path.join(path, "messages.json")):
+                messages = serialization.load(os.path.join(path, "messages.json"))
+            else:
+                continue
+        except Exception as e:
+            print(f"Ignorando {path}: {e}", file=sys.stderr)
+            continue
+        turns = tuple(m["content"] for m in messages if m.get("role") == "user" and m.get("content"))
+        if turns and turns not in seen:
+            seen.add(turns)
+            transcripts.append(list(turns))
+    return transcripts
+
+
+def scale_transcripts(transcripts: List[List[str]], scale: int, seed: int = 0) -> List[List[str]]:
+    """
+    Multiplica as transcrições com variações sintéticas
+
+    Cada cópia embaralha a ordem das conversas e acrescenta um sufixo às
+    mensagens, para que o cache semântico e a memória vetorial não vejam
+    apenas textos repetidos.
+    """
+    rng = random.Random(seed)
+    scaled = [list(t) for t in transcripts]
+    for copy in range(1, scale):
+        variants = [[f"{turn} (variação {copy}.{rng.randint(0, 9999)})" for turn in t]
+                    for t in transcripts]
+        rng.shuffle(variants)
+        scaled.extend(variants)
+    return scaled
+
+
+def rss_bytes() -> int:
+    """RSS atual do processo (/proc), ou o pico quando /proc não existe"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def disk_bytes(directory: str) -> int:
+    """Espaço em disco ocupado pelos arquivos do diretório (sem seguir links)"""
+    total = 0
+    for root, dirs, files in os.walk(directory):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_blocks * 512
+            except OSError:
+                pass
+    return total
+
+
+def apply_backend_defaults(limit: bool = False) -> Dict:
+    """
+    Define o backend (falso por padrão) e os limites dos processos de carga
+
+    Variáveis já definidas no ambiente prevalecem.
+
+    Args:
+        limit: Mantém os limites padrão do RateLimiter com o backend falso
+
+    Returns:
+        Dict: Backend e limites efetivos
+    """
+    os.environ.setdefault("LLM_BACKEND", "fake")
+    if os.environ["LLM_BACKEND"] == "fake" and not limit:
+        os.environ.setdefault("GROQ_RPM", "0")
+        os.environ.setdefault("GROQ_TPM", "0")
+    limiter = RateLimiter.from_env()
+    return {"backend": os.environ["LLM_BACKEND"], "rpm": limiter.rpm, "tpm": limiter.tpm}
+
+
+def _worker(worker_id: int, turns: List[str], sandbox: str, rate: float,
+            duration: float, sample_interval: float, seed: int, results):
+    """Processo de carga: uma instância do assistente reproduzindo uma sessão"""
+    data_dir = os.path.join(sandbox, f"worker-{worker_id}")
+    os.makedirs(data_dir, exist_ok=True)
+    os.environ["NEXUS_DATA_DIR"] = data_dir
+    # Os logs do assistente vão para o diretório atual: contam no disco da instância
+    os.chdir(data_dir)
+    sys.path.insert(0, base_dir)
+
+    stop = threading.Event()
+
+    def sample():
+        results.put({"type": "sample", "worker": worker_id, "t": time.monotonic() - start,
+                     "rss": rss_bytes(), "disk": disk_bytes(data_dir)})
+
+    def sampler():
+        while not stop.wait(sample_interval):
+            sample()
+
+    try:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            import assistant
+            assistant.initialize_systems()
+            from llm.backends import create_llm_client
+            assistant.groq_client = create_llm_client()
+
+            rng = random.Random(seed + worker_id)
+            start = time.monotonic()
+            sample()
+            threading.Thread(target=sampler, daemon=True).start()
+
+            scheduled = 0.0
+            index = 0
+            while index < len(turns) or duration:
+                if duration and time.monotonic() - start >= duration:
+                    break
+                user_input = turns[index % len(turns)]
+                index += 1
+
+                lag = 0.0
+                if rate > 0:
+                    scheduled += rng.expovariate(rate)
+                    delay = start + scheduled - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                    else:
+                        lag = -delay
+
+                turn_start = time.perf_counter()
+                error = None
+                try:
+                    assistant.handle_user_input(user_input)
+                except Exception as e:
+                    error = str(e)
+                latency = time.perf_counter() - turn_start
+                # Etapas em segundo plano terminam aqui, para entrar nas medições
+                assistant.turn_pipeline.drain()
+                results.put({
+                    "type": "turn", "worker": worker_id, "t": time.monotonic() - start,
+                    "latency": latency, "lag": lag, "error": error,
+                    "stages": dict(assistant.turn_pipeline.last_timings)
+                })
+
+            stop.set()
+            sample()
+            assistant.shutdown()
+    except Exception as e:
+        results.put({"type": "error", "worker": worker_id, "error": str(e)})
+    finally:
+        stop.set()
+        results.put({"type": "done", "worker": worker_id})
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    return {f"p{p}": float(v) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))}
+
+
+def summarize(turns: List[Dict], samples: List[Dict], elapsed: float) -> Dict:
+    """Agrega as medições dos processos"""
+    stages: Dict[str, List[float]] = {}
+    for turn in turns:
+        for name, seconds in turn["stages"].items():
+            stages.setdefault(name, []).append(seconds)
+
+    growth = {}
+    for worker in sorted({s["worker"] for s in samples}):
+        series = sorted((s for s in samples if s["worker"] == worker), key=lambda s: s["t"])
+        growth[worker] = {
+            "rss_start": series[0]["rss"], "rss_end": series[-1]["rss"],
+            "rss_max": max(s["rss"] for s in series),
+            "disk_start": series[0]["disk"], "disk_end": series[-1]["disk"],
+        }
+
+    return {
+        "elapsed": elapsed,
+        "turns": len(turns),
+        "errors": sum(1 for t in turns if t["error"]),
+        "throughput": len(turns) / elapsed if elapsed else 0.0,
+        "latency": _percentiles([t["latency"] for t in turns]),
+        "lag": _percentiles([t["lag"] for t in turns]),
+        "stages": {name: _percentiles(values) for name, values in sorted(stages.items())},
+        "growth": growth,
+    }
+
+
+def _format_bytes(size: float) -> str:
+    sign = "-" if size < 0 else ""
+    size = abs(size)
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{sign}{size:.0f} {unit}" if unit == "B" else f"{sign}{size:.1f} {unit}"
+        size /= 1024
+    return f"{sign}{size:.1f} GB"
+
+
+def format_summary(summary: Dict) -> str:
+    def row(name, values):
+        return f"  {name:<14}" + "".join(f" {k} {v * 1000:9.1f} ms" for k, v in values.items())
+
+    lines = []
+    limiter = summary.get("limiter")
+    if limiter:
+        lines.append(f"Backend {limiter['backend']}, limitador: {limiter['rpm'] or 'sem limite'} req/min, "
+                     f"{limiter['tpm'] or 'sem limite'} tokens/min")
+    lines += [
+        f"Turnos: {summary['turns']} em {summary['elapsed']:.1f}s "
+        f"({summary['throughput']:.2f} turnos/s, {summary['errors']} erros)",
+        "Latência:",
+        row("turno", summary["latency"]),
+        row("lag", summary["lag"]),
+    ]
+    for name, values in summary["stages"].items():
+        lines.append(row(name, values))
+    lines.append("Crescimento por instância:")
+    for worker, g in summary["growth"].items():
+        lines.append(
+            f"  worker {worker}: RSS {_format_bytes(g['rss_start'])} -> {_format_bytes(g['rss_end'])} "
+            f"(pico {_format_bytes(g['rss_max'])}), disco {_format_bytes(g['disk_start'])} -> "
+            f"{_format_bytes(g['disk_end'])} ({_format_bytes(g['disk_end'] - g['disk_start'])})"
+        )
+    return "\n".join(lines)
+
+
+def run(transcripts: List[List[str]], concurrency: int = 1, rate: float = 0.0,
+        duration: float = 0.0, sample_interval: float = 5.0, seed: int = 0,
+        sandbox: Optional[str] = None, keep: bool = False, limit: bool = False) -> Dict:
+    """
+    Executa o teste de carga
+
+    Args:
+        transcripts: Mensagens do usuário de cada conversa
+        concurrency: Processos (instâncias do assistente) simultâneos
+        rate: Turnos por segundo somando todos os processos (0 = sem pausa)
+        duration: Segundos de teste; 0 reproduz as conversas uma vez
+        sample_interval: Segundos entre as medições de memória e disco
+        seed: Semente das chegadas e da ordem das conversas
+        sandbox: Diretório das instâncias (padrão: temporário)
+        keep: Mantém o diretório das instâncias ao final
+        limit: Mantém GROQ_RPM/GROQ_TPM padrão com o backend falso
+
+    Returns:
+        Dict: Resumo (ver summarize) com as séries em "turn_log" e "samples"
+    """
+    # Herdado pelos processos de carga
+    limiter = apply_backend_defaults(limit)
+    owns_sandbox = sandbox is None
+    sandbox = sandbox or tempfile.mkdtemp(prefix="nexus-loadtest-")
+    os.makedirs(sandbox, exist_ok=True)
+
+    # Cada processo começa numa conversa diferente e segue a ordem gravada
+    flat = [turn for transcript in transcripts for turn in transcript]
+    offsets = [len(flat) * i // concurrency for i in range(concurrency)]
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(
+            target=_worker,
+            args=(i, flat[offsets[i]:] + flat[:offsets[i]], sandbox, rate / concurrency,
+                  duration, sample_interval, seed, results),
+            daemon=True
+        )
+        for i in range(concurrency)
+    ]
+
+    start = time.monotonic()
+    for process in processes:
+        process.start()
+
+    turns, samples, running = [], [], concurrency
+    while running:
+        try:
+            message = results.get(timeout=1)
+        except queue.Empty:
+            if not any(p.is_alive() for p in processes):
+                break
+            continue
+        if message["type"] == "turn":
+            turns.append(message)
+            if len(turns) % 50 == 0:
+                print(f"  {len(turns)} turnos...", file=sys.stderr)
+        elif message["type"] == "sample":
+            samples.append(message)
+        elif message["type"] == "error":
+            print(f"Erro no worker {message['worker']}: {message['error']}", file=sys.stderr)
+        elif message["type"] == "done":
+            running -= 1
+    elapsed = time.monotonic() - start
+    for process in processes:
+        process.join(timeout=10)
+
+    if owns_sandbox and not keep:
+        shutil.rmtree(sandbox, ignore_errors=True)
+
+    summary = summarize(turns, samples, elapsed)
+    summary["limiter"] = limiter
+    summary["turn_log"] = turns
+    summary["samples"] = samples
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reproduz conversas dos checkpoints como teste de carga")
+    parser.add_argument("--checkpoints", default=os.path.join(base_dir, "checkpoints"),
+                        help="Diretório de checkpoints com as conversas gravadas")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--rate", type=float, default=0.0, help="Turnos/s no total (0 = sem pausa)")
+    parser.add_argument("--duration", type=float, default=0.0, help="Segundos (0 = uma passada)")
+    parser.add_argument("--scale", type=int, default=1, help="Multiplica as conversas com variações")
+    parser.add_argument("--sample-interval", type=float, default=5.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--sandbox", help="Diretório das instâncias (padrão: temporário)")
+    parser.add_argument("--keep", action="store_true", help="Mantém o diretório das instâncias")
+    parser.add_argument("--limit", action="store_true",
+                        help="Aplica GROQ_RPM/GROQ_TPM também com o backend falso")
+    parser.add_argument("--report", help="Grava o resumo e as séries em JSON")
+    args = parser.parse_args()
+
+    transcripts = load_transcripts(args.checkpoints)
+    if not transcripts:
+        print(f"Nenhuma conversa encontrada em {args.checkpoints}")
+        raise SystemExit(1)
+    transcripts = scale_transcripts(transcripts, args.scale, args.seed)
+    print(f"{len(transcripts)} conversas, {sum(len(t) for t in transcripts)} turnos")
+
+    summary = run(transcripts, args.concurrency, args.rate, args.duration,
+                  args.sample_interval, args.seed, args.sandbox, args.keep, args.limit)
+    print(format_summary(summary))
+    if args.report:
+        serialization.save(args.report, summary, pretty=True)
+        print(f"Relatório gravado em {args.report}")
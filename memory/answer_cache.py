@@ -0,0 +1,112 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import numpy as np
+
+
+class SemanticAnswerCache:
+    def __init__(self, embedding_function, threshold: float = 0.92,
+                 max_entries: int = 256, ttl: float = 3600.0):
+        """
+        Cache de respostas para perguntas quase idênticas
+
+        Cada entrada guarda o embedding normalizado da pergunta, a resposta e
+        a revisão do ConfigStore no momento da resposta; mudanças no
+        ConfigStore invalidam as entradas antigas.
+
+        Args:
+            embedding_function: Mesmo provedor de embeddings do VectorMemory
+            threshold: Similaridade de cosseno mínima para reaproveitar
+            max_entries: Número máximo de entradas (remoção por LRU)
+            ttl: Validade de cada entrada em segundos
+        """
+        self.embedding_function = embedding_function
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stats = {"hits": 0, "misses": 0, "invalidated": 0}
+
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._matrix = None
+        self._keys = []
+        self._last_query = (None, None)
+        self._lock = threading.Lock()
+
+    def _embed(self, question: str) -> np.ndarray:
+        cached_question, vector = self._last_query
+        if cached_question == question:
+            return vector
+        vector = np.asarray(self.embedding_function([question])[0], dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector = vector / norm
+        self._last_query = (question, vector)
+        return vector
+
+    def _expire(self, revision: int):
+        """Remove entradas vencidas ou de revisões antigas do ConfigStore"""
+        now = time.time()
+        stale = [
+            key for key, entry in self._entries.items()
+            if entry["revision"] != revision or now - entry["created_at"] > self.ttl
+        ]
+        for key in stale:
+            del self._entries[key]
+        if stale:
+            self.stats["invalidated"] += len(stale)
+            self._matrix = None
+
+    def lookup(self, question: str, revision: int) -> Optional[str]:
+        """
+        Procura uma resposta para pergunta semelhante
+
+        Args:
+            question: Pergunta do usuário
+            revision: Revisão atual do ConfigStore
+
+        Returns:
+            Optional[str]: Resposta em cache ou None
+        """
+        vector = self._embed(question)
+        with self._lock:
+            self._expire(revision)
+            if not self._entries:
+                self.stats["misses"] += 1
+                return None
+
+            if self._matrix is None:
+                self._keys = list(self._entries)
+                self._matrix = np.vstack([self._entries[k]["vector"] for k in self._keys])
+            scores = self._matrix @ vector
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                self.stats["misses"] += 1
+                return None
+
+            key = self._keys[best]
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return self._entries[key]["answer"]
+
+    def store(self, question: str, answer: str, revision: int):
+        """Guarda a resposta dada para uma pergunta"""
+        vector = self._embed(question)
+        with self._lock:
+            self._entries[question] = {
+                "vector": vector,
+                "answer": answer,
+                "revision": revision,
+                "created_at": time.time()
+            }
+            self._entries.move_to_end(question)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._matrix = None
+
+    def clear(self):
+        """Remove todas as entradas"""
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
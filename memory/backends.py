@@ -0,0 +1,41 @@
+import os
+from typing import Optional
+
+
+def create_vector_memory(persist_directory: str, backend: Optional[str] = None,
+                         collection_name: str = "chat_memory", **kwargs):
+    """
+    Cria o armazenamento vetorial configurado
+
+    Os backends são importados sob demanda, para que escolher um deles não
+    carregue as dependências dos outros.
+
+    Args:
+        persist_directory: Diretório base da memória vetorial
+        backend: "chroma", "numpy" ou "compact"; se omitido usa VECTOR_BACKEND
+        collection_name: Coleção; nos backends em arquivo vira um subdiretório
+        **kwargs: Repassados ao construtor do backend
+
+    Returns:
+        Instância com a interface de VectorMemory
+    """
+    backend = backend or os.getenv("VECTOR_BACKEND", "chroma")
+
+    if backend == "chroma":
+        from memory.vector_store import VectorMemory
+        return VectorMemory(persist_directory, collection_name=collection_name, **kwargs)
+
+    def directory(name):
+        if collection_name == "chat_memory":
+            return os.path.join(persist_directory, name)
+        return os.path.join(persist_directory, f"{name}_{collection_name}")
+
+    if backend == "numpy":
+        from memory.numpy_store import NumpyVectorMemory
+        return NumpyVectorMemory(directory("numpy"), **kwargs)
+
+    if backend == "compact":
+        from memory.compact_store import CompactVectorMemory
+        return CompactVectorMemory(directory("compact"), **kwargs)
+
+    raise ValueError(f"Backend vetorial desconhecido: {backend}")
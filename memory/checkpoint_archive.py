@@ -0,0 +1,195 @@
+import os
+import struct
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional
+
+from memory import serialization
+
+try:
+    import zstandard
+except ImportError:  # zlib é usado quando o zstandard não está instalado
+    zstandard = None
+
+MAGIC = b"NXCKPT1\n"
+FOOTER = struct.Struct("<Q8s")
+FOOTER_MAGIC = b"NXCKIDX1"
+# Tamanho de cada bloco comprimido de forma independente
+CHUNK_SIZE = 4 * 1024 * 1024
+
+
+class _Codec:
+    """Compressão por bloco; cada thread usa seu próprio (de)compressor"""
+
+    def __init__(self, name: str, level: int):
+        self.name = name
+        self.level = level
+        self._local = threading.local()
+
+    def compress(self, data: bytes) -> bytes:
+        if self.name == "zstd":
+            if not hasattr(self._local, "cctx"):
+                self._local.cctx = zstandard.ZstdCompressor(level=self.level)
+            return self._local.cctx.compress(data)
+        return zlib.compress(data, self.level)
+
+    def decompress(self, data: bytes) -> bytes:
+        if self.name == "zstd":
+            if not hasattr(self._local, "dctx"):
+                self._local.dctx = zstandard.ZstdDecompressor()
+            return self._local.dctx.decompress(data)
+        return zlib.decompress(data)
+
+
+def default_codec() -> str:
+    return "zstd" if zstandard is not None else "zlib"
+
+
+def _codec(name: str, level: Optional[int] = None) -> _Codec:
+    if name == "zstd" and zstandard is None:
+        raise RuntimeError("Checkpoint comprimido com zstd; instale o pacote zstandard")
+    return _Codec(name, level if level is not None else (3 if name == "zstd" else 6))
+
+
+def write_archive(path: str, members: Dict[str, bytes], trees: Dict[str, str],
+                  codec: Optional[str] = None, workers: Optional[int] = None) -> int:
+    """
+    Grava um checkpoint em um único arquivo
+
+    Formato: cabeçalho, blocos comprimidos independentes e um índice JSON
+    no final (com o tamanho no rodapé), para que qualquer membro possa ser
+    lido sem descomprimir o resto. Os blocos são comprimidos em paralelo,
+    com um número limitado em memória.
+
+    Args:
+        path: Arquivo de destino (gravado em .tmp e renomeado)
+        members: Nome -> conteúdo dos membros pequenos (ex: config.json)
+        trees: Prefixo -> diretório copiado recursivamente (ex: chroma_db)
+        codec: "zstd" ou "zlib" (padrão: zstd se disponível)
+        workers: Threads de compressão
+
+    Returns:
+        int: Tamanho do arquivo em bytes
+    """
+    codec = _codec(codec or default_codec())
+    workers = workers or min(8, os.cpu_count() or 1)
+    index = {"version": 1, "codec": codec.name, "members": {}, "dirs": []}
+
+    def sources() -> Iterator[tuple]:
+        # (nome, modo, iterador de blocos crus)
+        for name, data in members.items():
+            yield name, 0o644, (data[i:i + CHUNK_SIZE] for i in range(0, max(len(data), 1), CHUNK_SIZE))
+        for prefix, directory in trees.items():
+            for root, dirs, files in os.walk(directory):
+                rel_root = os.path.relpath(root, directory)
+                base = prefix if rel_root == "." else f"{prefix}/{rel_root}"
+                if not files and not dirs:
+                    index["dirs"].append(base)
+                for name in sorted(files):
+                    file_path = os.path.join(root, name)
+                    yield f"{base}/{name}", os.stat(file_path).st_mode & 0o777, _read_chunks(file_path)
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as out, ThreadPoolExecutor(max_workers=workers) as pool:
+        out.write(MAGIC)
+        pending: List[tuple] = []
+
+        def flush(limit: int):
+            # Grava em ordem os blocos prontos, mantendo no máximo `limit` em voo
+            while len(pending) > limit:
+                entry, future = pending.pop(0)
+                block = future.result()
+                entry["chunks"].append([out.tell(), len(block)])
+                out.write(block)
+
+        for name, mode, chunks in sources():
+            entry = {"size": 0, "mode": mode, "chunks": []}
+            index["members"][name] = entry
+            for chunk in chunks:
+                entry["size"] += len(chunk)
+                pending.append((entry, pool.submit(codec.compress, chunk)))
+                flush(workers * 2)
+        flush(0)
+
+        index_bytes = zlib.compress(serialization.dumps(index))
+        out.write(index_bytes)
+        out.write(FOOTER.pack(len(index_bytes), FOOTER_MAGIC))
+        out.flush()
+        os.fsync(out.fileno())
+    os.replace(tmp_path, path)
+    return os.path.getsize(path)
+
+
+def _read_chunks(path: str) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+
+class CheckpointArchive:
+    def __init__(self, path: str):
+        """Abre um checkpoint em arquivo único lendo apenas o índice do final"""
+        self.path = path
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"Arquivo de checkpoint inválido: {path}")
+            f.seek(-FOOTER.size, os.SEEK_END)
+            index_length, magic = FOOTER.unpack(f.read(FOOTER.size))
+            if magic != FOOTER_MAGIC:
+                raise ValueError(f"Índice do checkpoint ausente ou corrompido: {path}")
+            f.seek(-FOOTER.size - index_length, os.SEEK_END)
+            self.index = serialization.loads(zlib.decompress(f.read(index_length)))
+        self.codec = _codec(self.index["codec"])
+
+    def names(self) -> List[str]:
+        return list(self.index["members"])
+
+    def _blocks(self, f, entry: Dict) -> Iterator[bytes]:
+        for offset, length in entry["chunks"]:
+            f.seek(offset)
+            yield f.read(length)
+
+    def read(self, name: str) -> bytes:
+        """Lê e descomprime um único membro"""
+        entry = self.index["members"][name]
+        with open(self.path, "rb") as f:
+            return b"".join(self.codec.decompress(block) for block in self._blocks(f, entry))
+
+    def read_json(self, name: str):
+        return serialization.loads(self.read(name))
+
+    def extract_tree(self, prefix: str, destination: str, workers: Optional[int] = None):
+        """
+        Extrai os membros sob prefix para destination, descomprimindo em paralelo
+
+        Args:
+            prefix: Prefixo gravado em write_archive (ex: chroma_db)
+            destination: Diretório de destino
+            workers: Threads de descompressão
+        """
+        workers = workers or min(8, os.cpu_count() or 1)
+        os.makedirs(destination, exist_ok=True)
+        for directory in self.index.get("dirs", []):
+            if directory == prefix or directory.startswith(prefix + "/"):
+                os.makedirs(os.path.join(destination, os.path.relpath(directory, prefix)),
+                            exist_ok=True)
+
+        with open(self.path, "rb") as f, ThreadPoolExecutor(max_workers=workers) as pool:
+            for name, entry in self.index["members"].items():
+                if not name.startswith(prefix + "/"):
+                    continue
+                target = os.path.join(destination, name[len(prefix) + 1:])
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                with open(target, "wb") as out:
+                    pending = []
+                    for block in self._blocks(f, entry):
+                        pending.append(pool.submit(self.codec.decompress, block))
+                        if len(pending) > workers * 2:
+                            out.write(pending.pop(0).result())
+                    for future in pending:
+                        out.write(future.result())
+                os.chmod(target, entry["mode"])
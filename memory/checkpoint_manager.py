@@ -1,34 +1,184 @@
-import json
 import os
 import shutil
+import threading
+import uuid
 from datetime import datetime
 from typing import Dict, List, Optional
 import hashlib
+from memory import serialization
+from memory.checkpoint_archive import CheckpointArchive, write_archive
 
 class CheckpointManager:
-    def __init__(self, base_directory: str = "./checkpoints"):
+    def __init__(self, base_directory: str = "./checkpoints", archive: Optional[bool] = None):
         """
         Gerencia checkpoints do sistema
         
         Args:
             base_directory: Diretório base para armazenar checkpoints
+            archive: Se True, novos checkpoints são gravados em um único
+                arquivo comprimido; se omitido usa CHECKPOINT_FORMAT=archive
         """
         self.base_directory = base_directory
+        if archive is None:
+            archive = os.getenv("CHECKPOINT_FORMAT", "dir") == "archive"
+        self.archive = archive
         self.checkpoints_file = os.path.join(base_directory, "checkpoints.json")
         self.data_directory = os.path.join(base_directory, "data")
+        self.live_directory = os.path.join(base_directory, "live")
         self._ensure_directories()
         self.checkpoints = self._load_checkpoints()
         
+        # Estado do diretório vetorial ativo (ver attach_live_directory)
+        self.live_path = None
+        self._on_switch = None
+        self._borrowed = None
+        self._fork_ready = threading.Event()
+        self._fork_ready.set()
+        self._fork_result = None
+        self._lazy_targets = None
+        self._switch_lock = threading.Lock()
+        # Gerações em preparo (ainda não apontadas pelo link): a coleta as ignora
+        self._in_flight = set()
+        self._generations_lock = threading.Lock()
+        
     def _ensure_directories(self):
         """Garante que os diretórios necessários existem"""
         os.makedirs(self.base_directory, exist_ok=True)
         os.makedirs(self.data_directory, exist_ok=True)
+        os.makedirs(self.live_directory, exist_ok=True)
+        
+    @staticmethod
+    def _read_json(path: str):
+        return serialization.load(path)
+        
+    def _archive_path(self, checkpoint_id: str) -> str:
+        return os.path.join(self.data_directory, f"{checkpoint_id}.ckpt")
+        
+    def _new_generation(self) -> str:
+        """
+        Retorna o caminho de uma nova geração do diretório ativo
+
+        A geração fica reservada (a coleta não a remove, nem sua versão
+        .tmp) até o link apontar para ela ou _release_generation.
+        """
+        generation = os.path.realpath(os.path.join(self.live_directory, uuid.uuid4().hex[:12]))
+        with self._generations_lock:
+            self._in_flight.add(generation)
+        return generation
+        
+    def _release_generation(self, generation: Optional[str]):
+        if generation:
+            with self._generations_lock:
+                self._in_flight.discard(generation)
+        
+    def _discard_fork(self):
+        """Descarta a cópia em segundo plano não usada (a coleta a remove)"""
+        self._release_generation(self._fork_result)
+        self._fork_result = None
+        
+    def _point_live_to(self, target: str):
+        """Troca atomicamente o link simbólico do diretório ativo"""
+        tmp_link = f"{self.live_path}.{uuid.uuid4().hex[:8]}.tmp"
+        os.symlink(os.path.abspath(target), tmp_link)
+        os.replace(tmp_link, self.live_path)
+        # Ativa: a partir daqui é protegida por ser o destino do link
+        self._release_generation(os.path.realpath(target))
+        if self._on_switch:
+            self._on_switch()
+        
+    def _collect_garbage(self):
+        """Remove gerações antigas do diretório ativo em segundo plano"""
+        def run():
+            for name in os.listdir(self.live_directory):
+                path = os.path.realpath(os.path.join(self.live_directory, name))
+                # Link e reservas relidos a cada entrada: uma geração criada ou
+                # ativada durante a varredura nunca é removida
+                with self._generations_lock:
+                    current = os.path.realpath(self.live_path) if self.live_path else None
+                    if path == current or path.removesuffix(".tmp") in self._in_flight:
+                        continue
+                shutil.rmtree(path, ignore_errors=True)
+                
+        threading.Thread(target=run, name="checkpoint-gc", daemon=True).start()
+        
+    def attach_live_directory(self, live_path: str, on_switch=None):
+        """
+        Passa a gerenciar o diretório vetorial ativo por um link simbólico
+        
+        O diretório real vira uma geração em checkpoints/live e live_path
+        passa a ser um link para ela, permitindo restaurações em tempo
+        constante pela troca do link.
+        
+        Args:
+            live_path: Caminho usado pela memória vetorial (ex: chroma_db)
+            on_switch: Chamado após cada troca do link (reabrir conexões)
+        """
+        self.live_path = os.path.abspath(live_path)
+        self._on_switch = None
+        
+        if not os.path.islink(self.live_path):
+            generation = self._new_generation()
+            if os.path.isdir(self.live_path):
+                shutil.move(self.live_path, generation)
+            else:
+                os.makedirs(generation)
+            self._point_live_to(generation)
+        else:
+            target = os.path.realpath(self.live_path)
+            if not target.startswith(self.live_directory + os.sep):
+                # Sessão anterior terminou antes de copiar o snapshot restaurado
+                self._borrowed = target
+                self._start_fork(target)
+                
+        self._on_switch = on_switch
+        self._collect_garbage()
+        
+    def _start_fork(self, snapshot_dir: str):
+        """Copia o snapshot restaurado para uma nova geração em segundo plano"""
+        self._fork_ready.clear()
+        self._discard_fork()
+        # Reservada antes de existir no disco
+        generation = self._new_generation()
+        
+        def run():
+            try:
+                shutil.copytree(snapshot_dir, generation + ".tmp", symlinks=True)
+                os.rename(generation + ".tmp", generation)
+                self._fork_result = generation
+            except Exception as e:
+                self._release_generation(generation)
+                print(f"Erro ao preparar cópia do checkpoint: {str(e)}")
+            finally:
+                self._fork_ready.set()
+                
+        threading.Thread(target=run, name="checkpoint-fork", daemon=True).start()
+        
+    def ensure_writable(self):
+        """
+        Garante que o diretório ativo não é um snapshot de checkpoint
+        
+        Após uma restauração o link aponta para o snapshot; antes da primeira
+        escrita ele passa a apontar para a cópia feita em segundo plano.
+        """
+        if self._borrowed is None:
+            return
+        with self._switch_lock:
+            if self._borrowed is None:
+                return
+            self._fork_ready.wait()
+            generation = self._fork_result
+            if generation is None:
+                # A cópia falhou: faz a cópia de forma síncrona
+                generation = self._new_generation()
+                shutil.copytree(self._borrowed, generation, symlinks=True)
+            self._borrowed = None
+            self._point_live_to(generation)
+            self._collect_garbage()
         
     def _load_checkpoints(self) -> Dict:
         """Carrega registro de checkpoints"""
         if os.path.exists(self.checkpoints_file):
-            with open(self.checkpoints_file, 'r') as f:
-                return json.load(f)
+            return serialization.load(self.checkpoints_file)
         return {
             "checkpoints": [],
             "current": None,
@@ -40,8 +190,7 @@ class CheckpointManager:
         
     def _save_checkpoints(self):
         """Salva registro de checkpoints"""
-        with open(self.checkpoints_file, 'w') as f:
-            json.dump(self.checkpoints, f, indent=2)
+        serialization.save(self.checkpoints_file, self.checkpoints)
             
     def _generate_checkpoint_id(self, message: str) -> str:
         """Gera ID único para o checkpoint"""
@@ -63,38 +212,61 @@ class CheckpointManager:
             str: ID do checkpoint criado
         """
         checkpoint_id = self._generate_checkpoint_id(message)
-        checkpoint_dir = os.path.join(self.data_directory, checkpoint_id)
-        os.makedirs(checkpoint_dir, exist_ok=True)
-        
-        # Salva configurações
-        config_file = os.path.join(checkpoint_dir, "config.json")
-        with open(config_file, 'w') as f:
-            json.dump(config_store.config, f, indent=2)
-            
-        # Salva cache de mensagens
-        messages_file = os.path.join(checkpoint_dir, "messages.json")
-        with open(messages_file, 'w') as f:
-            json.dump([
-                {"role": role, "content": content}
-                for role, content in message_cache.messages
-            ], f, indent=2)
-            
-        # Copia banco de dados Chroma
-        if os.path.exists(config_store.persist_directory):
-            chroma_backup = os.path.join(checkpoint_dir, "chroma_db")
-            shutil.copytree(config_store.persist_directory, chroma_backup)
+        config_data = config_store.config
+        messages_data = [
+            {"role": role, "content": content}
+            for role, content in message_cache.messages
+        ]
+        
+        # Diretório vetorial ativo
+        if self.live_path:
+            vector_directory = os.path.realpath(self.live_path)
+        else:
+            vector_directory = message_cache.vector_memory.persist_directory
+        trees = {"chroma_db": vector_directory} if os.path.exists(vector_directory) else {}
+        
+        if self.archive:
+            # Um único arquivo comprimido, com índice no final
+            size = write_archive(
+                self._archive_path(checkpoint_id),
+                members={
+                    "config.json": serialization.encode(config_data),
+                    "messages.json": serialization.encode(messages_data),
+                },
+                trees=trees
+            )
+            files = {"archive": f"{checkpoint_id}.ckpt"}
+        else:
+            checkpoint_dir = os.path.join(self.data_directory, checkpoint_id)
+            os.makedirs(checkpoint_dir, exist_ok=True)
+            
+            # Salva configurações
+            serialization.save(os.path.join(checkpoint_dir, "config.json"), config_data)
+                
+            # Salva cache de mensagens
+            serialization.save(os.path.join(checkpoint_dir, "messages.json"), messages_data)
+                
+            # Copia o diretório vetorial ativo
+            if trees:
+                chroma_backup = os.path.join(checkpoint_dir, "chroma_db")
+                shutil.copytree(vector_directory, chroma_backup, symlinks=True)
+            size = None
+            files = {
+                "config": "config.json",
+                "messages": "messages.json",
+                "chroma": "chroma_db"
+            }
             
         # Registra checkpoint
         checkpoint_data = {
             "id": checkpoint_id,
             "message": message,
             "timestamp": datetime.now().isoformat(),
-            "files": {
-                "config": "config.json",
-                "messages": "messages.json",
-                "chroma": "chroma_db"
-            }
+            "format": "archive" if self.archive else "dir",
+            "files": files
         }
+        if size is not None:
+            checkpoint_data["size"] = size
         
         self.checkpoints["checkpoints"].append(checkpoint_data)
         self.checkpoints["current"] = checkpoint_id
@@ -108,6 +280,12 @@ class CheckpointManager:
         """
         Restaura o sistema para um checkpoint específico
         
+        A restauração tem custo constante: configurações e mensagens são lidas
+        sob demanda no primeiro acesso e o diretório vetorial ativo passa a
+        apontar para o snapshot, que é copiado em segundo plano antes da
+        próxima escrita (ensure_writable). O estado antigo é removido em
+        segundo plano.
+        
         Args:
             checkpoint_id: ID do checkpoint
             config_store: Instância do ConfigStore
@@ -116,33 +294,35 @@ class CheckpointManager:
         Returns:
             bool: True se restaurado com sucesso
         """
+        # Checkpoint em arquivo único
+        if os.path.exists(self._archive_path(checkpoint_id)):
+            return self._restore_archive(checkpoint_id, config_store, message_cache)
+            
         # Verifica se checkpoint existe
         checkpoint_dir = os.path.join(self.data_directory, checkpoint_id)
         if not os.path.exists(checkpoint_dir):
             return False
             
         try:
-            # Restaura configurações
+            # Restaura configurações e cache de mensagens sob demanda
             config_file = os.path.join(checkpoint_dir, "config.json")
-            with open(config_file, 'r') as f:
-                config_store.config = json.load(f)
-            config_store._save_config()
-            
-            # Restaura cache de mensagens
             messages_file = os.path.join(checkpoint_dir, "messages.json")
-            with open(messages_file, 'r') as f:
-                messages = json.load(f)
-                message_cache.messages = [
-                    (msg["role"], msg["content"])
-                    for msg in messages
-                ]
+            config_store.load_lazily(lambda: self._read_json(config_file))
+            message_cache.load_lazily(lambda: [
+                (msg["role"], msg["content"])
+                for msg in self._read_json(messages_file)
+            ])
+            self._lazy_targets = (checkpoint_id, config_store, message_cache)
                 
-            # Restaura banco de dados Chroma
+            # Aponta o diretório vetorial ativo para o snapshot
             chroma_backup = os.path.join(checkpoint_dir, "chroma_db")
-            if os.path.exists(chroma_backup):
-                if os.path.exists(config_store.persist_directory):
-                    shutil.rmtree(config_store.persist_directory)
-                shutil.copytree(chroma_backup, config_store.persist_directory)
+            if os.path.exists(chroma_backup) and self.live_path:
+                with self._switch_lock:
+                    self._fork_ready.wait()
+                    self._borrowed = os.path.abspath(chroma_backup)
+                    self._point_live_to(chroma_backup)
+                    self._start_fork(chroma_backup)
+                self._collect_garbage()
                 
             # Atualiza checkpoint atual
             self.checkpoints["current"] = checkpoint_id
@@ -154,6 +334,47 @@ class CheckpointManager:
             print(f"Erro ao restaurar checkpoint: {str(e)}")
             return False
             
+    def _restore_archive(self, checkpoint_id: str, config_store: object,
+                         message_cache: object) -> bool:
+        """
+        Restaura um checkpoint em arquivo único
+        
+        Configurações e mensagens são lidas do índice sob demanda; o
+        diretório vetorial é extraído (em paralelo) para uma nova geração,
+        já gravável, e o link ativo passa a apontar para ela.
+        """
+        try:
+            archive = CheckpointArchive(self._archive_path(checkpoint_id))
+            config_store.load_lazily(lambda: archive.read_json("config.json"))
+            message_cache.load_lazily(lambda: [
+                (msg["role"], msg["content"])
+                for msg in archive.read_json("messages.json")
+            ])
+            self._lazy_targets = (checkpoint_id, config_store, message_cache)
+            
+            if self.live_path and any(n.startswith("chroma_db/") for n in archive.names()):
+                with self._switch_lock:
+                    self._fork_ready.wait()
+                    generation = self._new_generation()
+                    try:
+                        archive.extract_tree("chroma_db", generation + ".tmp")
+                        os.rename(generation + ".tmp", generation)
+                    except Exception:
+                        self._release_generation(generation)
+                        raise
+                    self._borrowed = None
+                    self._discard_fork()
+                    self._point_live_to(generation)
+                self._collect_garbage()
+                
+            self.checkpoints["current"] = checkpoint_id
+            self._save_checkpoints()
+            return True
+            
+        except Exception as e:
+            print(f"Erro ao restaurar checkpoint: {str(e)}")
+            return False
+            
     def list_checkpoints(self, limit: int = 10) -> List[Dict]:
         """
         Lista checkpoints disponíveis
@@ -175,7 +396,29 @@ class CheckpointManager:
             if checkpoint["id"] == checkpoint_id:
                 return checkpoint
         return None
-        
+
+    def merge_registry(self, entries: List[Dict]) -> int:
+        """
+        Acrescenta ao registro checkpoints vindos de outro host
+
+        Entradas com ID já registrado são ignoradas, então repetir a mescla
+        não altera nada.
+
+        Args:
+            entries: Entradas do registro do outro host
+
+        Returns:
+            int: Número de checkpoints adicionados
+        """
+        known = {cp["id"] for cp in self.checkpoints["checkpoints"]}
+        added = [dict(entry) for entry in entries if entry["id"] not in known]
+        if not added:
+            return 0
+        self.checkpoints["checkpoints"].extend(added)
+        self.checkpoints["checkpoints"].sort(key=lambda x: x["timestamp"])
+        self._save_checkpoints()
+        return len(added)
+
     def delete_checkpoint(self, checkpoint_id: str) -> bool:
         """
         Remove um checkpoint
@@ -187,8 +430,20 @@ class CheckpointManager:
             bool: True se removido com sucesso
         """
         checkpoint_dir = os.path.join(self.data_directory, checkpoint_id)
+        
+        # Dados ainda lidos sob demanda a partir deste checkpoint
+        if self._lazy_targets and self._lazy_targets[0] == checkpoint_id:
+            _, config_store, message_cache = self._lazy_targets
+            config_store.load_pending()
+            message_cache.load_pending()
+            self._lazy_targets = None
+        if self._borrowed and self._borrowed.startswith(checkpoint_dir + os.sep):
+            self.ensure_writable()
+            
         if os.path.exists(checkpoint_dir):
             shutil.rmtree(checkpoint_dir)
+        if os.path.exists(self._archive_path(checkpoint_id)):
+            os.remove(self._archive_path(checkpoint_id))
             
         # Remove do registro
         self.checkpoints["checkpoints"] = [
@@ -0,0 +1,192 @@
+import os
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from memory.numpy_store import NumpyVectorMemory
+
+
+class CompactVectorMemory(NumpyVectorMemory):
+    # Linhas processadas por vez na busca, limita a memória temporária
+    _SCAN_BLOCK = 8192
+    _VECTORS_FILE = "vectors.f32"
+
+    def __init__(self, persist_directory: str = "./compact_db", embedding_function=None,
+                 rerank_factor: int = 4, keep_full_vectors: Optional[bool] = None):
+        """
+        Armazenamento vetorial compacto com vetores quantizados em int8
+
+        Os códigos int8 (e uma escala por vetor) ficam em arrays mapeados em
+        memória e a busca varre os códigos de forma vetorizada. Em disco e na
+        varredura ocupa ~4x menos que o float32.
+
+        Args:
+            persist_directory: Diretório dos arquivos do índice
+            embedding_function: Provedor de embeddings (padrão: compartilhado)
+            rerank_factor: Candidatos por resultado reordenados pelos float32
+                (só tem efeito com keep_full_vectors)
+            keep_full_vectors: Se True, guarda também os float32 e reordena
+                com eles os melhores candidatos da varredura (disco maior que
+                o backend numpy). Se omitido, usa COMPACT_FULL_VECTORS=1. Um
+                índice com dados mantém o modo com que foi criado
+        """
+        self.rerank_factor = rerank_factor
+        self.codes_file = os.path.join(persist_directory, "codes.i8")
+        self.scales_file = os.path.join(persist_directory, "scales.f32")
+        if keep_full_vectors is None:
+            keep_full_vectors = os.getenv("COMPACT_FULL_VECTORS", "0") == "1"
+        if os.path.exists(self.codes_file) and os.path.getsize(self.codes_file) > 0:
+            has_vectors = os.path.exists(os.path.join(persist_directory, self._VECTORS_FILE))
+            if keep_full_vectors != has_vectors:
+                with open("vector_errors.log", "a") as f:
+                    f.write(f"{datetime.now()}: Índice compacto em {persist_directory} criado "
+                            f"{'com' if has_vectors else 'sem'} vetores float32; "
+                            f"keep_full_vectors={keep_full_vectors} ignorado\n")
+            keep_full_vectors = has_vectors
+        self.keep_full_vectors = keep_full_vectors
+        super().__init__(persist_directory, embedding_function)
+
+    def _close_arrays(self):
+        self._codes = self._scales = self._vectors = None
+
+    def _array_files(self) -> List[str]:
+        return [self.codes_file, self.scales_file, self.vectors_file]
+
+    def _open_arrays(self):
+        """(Re)abre os arrays mapeados em memória conforme o tamanho em disco"""
+        size = os.path.getsize(self.codes_file) if os.path.exists(self.codes_file) else 0
+        self._capacity = size // self.dim
+        if self._capacity == 0:
+            self._close_arrays()
+            return
+        shape = (self._capacity, self.dim)
+        self._codes = np.memmap(self.codes_file, dtype=np.int8, mode="r+", shape=shape)
+        self._scales = np.memmap(self.scales_file, dtype=np.float32, mode="r+",
+                                 shape=(self._capacity,))
+        if self.keep_full_vectors:
+            self._vectors = np.memmap(self.vectors_file, dtype=np.float32, mode="r+",
+                                      shape=shape)
+
+    def _ensure_capacity(self, needed: int):
+        """Cresce os arquivos dobrando a capacidade"""
+        if needed <= self._capacity:
+            return
+        capacity = max(needed, self._capacity * 2, 1024)
+        self._close_arrays()
+        sizes = [(self.codes_file, capacity * self.dim), (self.scales_file, capacity * 4)]
+        if self.keep_full_vectors:
+            sizes.append((self.vectors_file, capacity * self.dim * 4))
+        for path, size in sizes:
+            with open(path, "ab") as f:
+                f.truncate(size)
+        self._open_arrays()
+
+    @staticmethod
+    def _quantize(vectors: np.ndarray):
+        """Quantização simétrica int8 com uma escala por vetor"""
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+        return codes, scales.astype(np.float32)
+
+    def _store_vectors(self, start: int, end: int, vectors: np.ndarray):
+        codes, scales = self._quantize(vectors)
+        self._codes[start:end] = codes
+        self._scales[start:end] = scales
+        if self.keep_full_vectors:
+            self._vectors[start:end] = vectors
+
+    def _get_vectors(self, indices: np.ndarray) -> np.ndarray:
+        if self.keep_full_vectors:
+            return np.asarray(self._vectors[indices], dtype=np.float32)
+        return self._codes[indices].astype(np.float32) * self._scales[indices][:, None]
+
+    def _search_indices(self, query_vector: np.ndarray, n_results: int) -> np.ndarray:
+        """Retorna os índices dos vetores mais similares, do melhor ao pior"""
+        query = self._normalize(query_vector.reshape(1, -1).astype(np.float32))[0]
+        count = self.count
+        n_results = min(count, n_results)
+        # Sem os float32 não há como reordenar: o top-k sai direto da varredura
+        n_candidates = (min(count, n_results * self.rerank_factor)
+                        if self.keep_full_vectors else n_results)
+
+        # Varredura aproximada por blocos sobre os códigos int8
+        scores = np.empty(count, dtype=np.float32)
+        for start in range(0, count, self._SCAN_BLOCK):
+            end = min(start + self._SCAN_BLOCK, count)
+            block = self._codes[start:end].astype(np.float32)
+            scores[start:end] = (block @ query) * self._scales[start:end]
+        candidates = np.argpartition(-scores, n_candidates - 1)[:n_candidates]
+
+        if not self.keep_full_vectors:
+            return candidates[np.argsort(-scores[candidates])]
+
+        # Reordenação exata apenas dos candidatos
+        candidates = np.sort(candidates)
+        exact = self._vectors[candidates] @ query
+        order = np.argsort(-exact)[:n_results]
+        return candidates[order]
+
+    def memory_footprint(self) -> Dict[str, int]:
+        """
+        Calcula o tamanho dos dados vetoriais
+
+        Returns:
+            Dict: bytes varridos por busca e bytes totais em disco
+        """
+        if not self.dim:
+            return {"scan_bytes": 0, "disk_bytes": 0, "float32_bytes": 0}
+        scan = self.count * (self.dim + 4)
+        disk = scan + (self.count * self.dim * 4 if self.keep_full_vectors else 0)
+        return {
+            "scan_bytes": scan,
+            "disk_bytes": disk,
+            "float32_bytes": self.count * self.dim * 4
+        }
+
+
+if __name__ == "__main__":
+    # Benchmark: memória e recall do índice compacto versus float32 exato
+    import tempfile
+    import time
+
+    n, dim, k, queries = 50_000, 384, 5, 200
+    rng = np.random.default_rng(42)
+    centers = rng.normal(size=(256, dim)).astype(np.float32)
+    data = centers[rng.integers(0, 256, n)] + 0.35 * rng.normal(size=(n, dim)).astype(np.float32)
+    probes = data[rng.integers(0, n, queries)] + 0.1 * rng.normal(size=(queries, dim)).astype(np.float32)
+
+    exact_matrix = CompactVectorMemory._normalize(data)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = CompactVectorMemory(tmp, embedding_function=lambda texts: [],
+                                    keep_full_vectors=os.getenv("COMPACT_FULL_VECTORS", "0") == "1")
+        for start in range(0, n, 10_000):
+            chunk = data[start:start + 10_000]
+            store._append(chunk, [""] * len(chunk),
+                          [{"role": "user"}] * len(chunk),
+                          [f"b{start + i}" for i in range(len(chunk))])
+
+        hits, compact_time, exact_time = 0, 0.0, 0.0
+        for probe in probes:
+            t0 = time.perf_counter()
+            found = store._search_indices(probe, k)
+            compact_time += time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            q = probe / np.linalg.norm(probe)
+            truth = np.argsort(-(exact_matrix @ q))[:k]
+            exact_time += time.perf_counter() - t0
+            hits += len(set(found.tolist()) & set(truth.tolist()))
+
+        footprint = store.memory_footprint()
+        print(f"Vetores: {n} x {dim}")
+        print(f"float32 em RAM: {footprint['float32_bytes'] / 2**20:.1f} MiB")
+        print(f"int8 varrido:   {footprint['scan_bytes'] / 2**20:.1f} MiB "
+              f"({footprint['float32_bytes'] / footprint['scan_bytes']:.1f}x menor)")
+        print(f"Em disco:       {footprint['disk_bytes'] / 2**20:.1f} MiB "
+              f"(float32 {'mantido' if store.keep_full_vectors else 'descartado'})")
+        print(f"Recall@{k}:      {hits / (queries * k):.3f}")
+        print(f"Busca compacta: {compact_time / queries * 1000:.2f} ms/consulta")
+        print(f"Busca exata:    {exact_time / queries * 1000:.2f} ms/consulta")
@@ -1,22 +1,108 @@
-import json
 import os
 import socket
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple, Union
+from collections import defaultdict
+from memory import serialization
+from memory.port_allocator import PortAllocator
 
 class ConfigStore:
-    def __init__(self, persist_directory: str = "./config_db"):
+    def __init__(self, persist_directory: str = "./config_db",
+                 port_ranges: Optional[List[Tuple[int, int]]] = None,
+                 preferred_ports: Optional[List[int]] = None,
+                 lease_ttl: float = 60.0):
         """
         Inicializa o armazenamento de configurações
         
         Args:
             persist_directory: Diretório para armazenar as configurações
+            port_ranges: Faixas (início, fim) usadas na alocação de portas
+            preferred_ports: Portas tentadas antes das faixas
+            lease_ttl: Validade padrão das reservas de porta, em segundos
         """
         self.persist_directory = persist_directory
         self.config_file = os.path.join(persist_directory, "system_config.json")
         self._ensure_directory()
+        self.port_allocator = PortAllocator(
+            os.path.join(persist_directory, "port_leases.bin"),
+            ranges=port_ranges,
+            preferred_ports=preferred_ports,
+            lease_ttl=lease_ttl,
+            probe=self._check_port_in_use_system
+        )
+        # Tokens das reservas feitas por esta instância, por porta
+        self._lease_tokens: Dict[int, str] = {}
+        # Incrementada a cada alteração (invalida caches dependentes)
+        self.revision = 0
+        self._pending_loader = None
         self.config = self._load_config()
         
+    @property
+    def config(self) -> Dict:
+        """Configurações atuais (carregadas sob demanda após uma restauração)"""
+        if self._pending_loader is not None:
+            self.load_pending()
+        return self._config
+        
+    @config.setter
+    def config(self, value: Dict):
+        self._pending_loader = None
+        self._config = value
+        self._rebuild_indexes()
+        
+    def load_lazily(self, loader):
+        """
+        Adia o carregamento das configurações até o primeiro acesso
+        
+        Args:
+            loader: Função sem argumentos que retorna o dicionário de configurações
+        """
+        self._pending_loader = loader
+        self.revision += 1
+        
+    def load_pending(self):
+        """Carrega e persiste configurações pendentes, se houver"""
+        loader, self._pending_loader = self._pending_loader, None
+        if loader is not None:
+            self._config = loader()
+            self._rebuild_indexes(replace_ports=True)
+            self._save_config()
+        
+    def _rebuild_indexes(self, replace_ports: bool = False):
+        """
+        Reconstrói os índices secundários a partir das configurações
+        
+        Os dicionários de valor None funcionam como conjuntos ordenados.
+        
+        Args:
+            replace_ports: Se True, o bitmap do alocador passa a refletir só
+                estas configurações (usado após restaurar um checkpoint)
+        """
+        self._service_ports: Dict[str, Dict[str, None]] = defaultdict(dict)
+        self._ports_by_status: Dict[str, Dict[str, None]] = defaultdict(dict)
+        self._service_dependencies: Dict[str, Dict[Tuple[str, str], None]] = defaultdict(dict)
+        
+        for port, info in self._config["ports"].items():
+            self._index_port(port, info)
+        for dep_name, versions in self._config["dependencies"].items():
+            for version in versions:
+                self._service_dependencies[version["service"]][(dep_name, version["version"])] = None
+                
+        self.port_allocator.sync_registered(
+            (int(port) for port in self._ports_by_status["in_use"]), replace=replace_ports
+        )
+                
+    def _index_port(self, port: str, info: Dict):
+        self._service_ports[info["service"]][port] = None
+        self._ports_by_status[info["status"]][port] = None
+        
+    def _unindex_port(self, port: str):
+        info = self._config["ports"].get(port)
+        if info is None:
+            return
+        self._service_ports[info["service"]].pop(port, None)
+        self._ports_by_status[info["status"]].pop(port, None)
+        
     def _ensure_directory(self):
         """Garante que o diretório de persistência existe"""
         os.makedirs(self.persist_directory, exist_ok=True)
@@ -24,8 +110,7 @@ class ConfigStore:
     def _load_config(self) -> Dict:
         """Carrega configurações do arquivo"""
         if os.path.exists(self.config_file):
-            with open(self.config_file, 'r') as f:
-                return json.load(f)
+            return serialization.load(self.config_file)
         return {
             "services": {},
             "ports": {},
@@ -39,9 +124,9 @@ class ConfigStore:
         
     def _save_config(self):
         """Salva configurações no arquivo"""
+        self.revision += 1
         self.config["metadata"]["last_updated"] = datetime.now().isoformat()
-        with open(self.config_file, 'w') as f:
-            json.dump(self.config, f, indent=2)
+        serialization.save(self.config_file, self.config)
             
     def _check_port_in_use_system(self, port: int) -> bool:
         """
@@ -63,23 +148,29 @@ class ConfigStore:
             if result == 0:
                 return True
                 
-            # Tenta criar um socket UDP
+            # Tenta ocupar a porta UDP (connect em UDP sempre retorna 0)
             sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            result = sock.connect_ex(('127.0.0.1', port))
-            sock.close()
+            try:
+                sock.bind(('0.0.0.0', port))
+            except OSError:
+                return True
+            finally:
+                sock.close()
             
-            return result == 0
+            return False
         except:
             # Em caso de erro, assume que a porta pode estar em uso
             return True
             
-    def is_port_available(self, port: int, check_system: bool = True) -> Tuple[bool, str]:
+    def is_port_available(self, port: int, check_system: bool = True,
+                          lease_token: Optional[str] = None) -> Tuple[bool, str]:
         """
         Verifica se uma porta está disponível, tanto no registro quanto no sistema
         
         Args:
             port: Número da porta
             check_system: Se deve verificar também no sistema operacional
+            lease_token: Token de reserva que autoriza o uso de uma porta reservada
             
         Returns:
             tuple: (disponível, motivo)
@@ -89,13 +180,19 @@ class ConfigStore:
             service = self.config["ports"][str(port)]["service"]
             return False, f"Porta {port} já registrada para o serviço '{service}'"
             
+        # Verifica reservas de outras sessões
+        lease = self.port_allocator.get_lease(port)
+        if lease and lease["token"] != (lease_token or self._lease_tokens.get(port)):
+            return False, f"Porta {port} está reservada para '{lease['owner']}'"
+            
         # Verifica no sistema se solicitado
         if check_system and self._check_port_in_use_system(port):
             return False, f"Porta {port} está em uso no sistema operacional"
             
         return True, "Porta disponível"
         
-    def register_port(self, port: int, service: str, protocol: str = "tcp", force: bool = False) -> Tuple[bool, str]:
+    def register_port(self, port: int, service: str, protocol: str = "tcp", force: bool = False,
+                      lease_token: Optional[str] = None) -> Tuple[bool, str]:
         """
         Registra uma porta em uso, com verificações de segurança
         
@@ -104,17 +201,28 @@ class ConfigStore:
             service: Nome do serviço
             protocol: Protocolo (tcp/udp)
             force: Se deve forçar o registro mesmo se a porta estiver em uso
+            lease_token: Token da reserva obtida com lease_port, se houver
             
         Returns:
             tuple: (sucesso, mensagem)
         """
+        lease_token = lease_token or self._lease_tokens.get(port)
+        
         # Verifica disponibilidade
-        available, reason = self.is_port_available(port)
+        available, reason = self.is_port_available(port, lease_token=lease_token)
         
         if not available and not force:
             return False, f"Não foi possível registrar a porta: {reason}"
             
+        # Confirma a reserva de forma atômica no alocador compartilhado
+        confirmed, reason = self.port_allocator.confirm(port, service, lease_token, force=force)
+        if not confirmed and not force:
+            return False, f"Não foi possível registrar a porta: {reason}"
+        self._lease_tokens.pop(port, None)
+            
         # Registra a porta
+        self.load_pending()
+        self._unindex_port(str(port))
         self.config["ports"][str(port)] = {
             "service": service,
             "protocol": protocol,
@@ -122,6 +230,7 @@ class ConfigStore:
             "status": "in_use",
             "last_verified": datetime.now().isoformat()
         }
+        self._index_port(str(port), self.config["ports"][str(port)])
         self._save_config()
         
         return True, f"Porta {port} registrada com sucesso para '{service}'"
@@ -194,9 +303,33 @@ class ConfigStore:
         
         return False, f"ATENÇÃO: Serviço '{name}' marcado para revisão. Por favor, verifique manualmente se é seguro parar este serviço."
         
+    def lease_port(self, owner: str, preferred_ports: Optional[List[int]] = None,
+                   ranges: Optional[List[Tuple[int, int]]] = None,
+                   ttl: Optional[float] = None) -> Tuple[Optional[Dict], str]:
+        """
+        Reserva uma porta livre até ser confirmada por register_port
+        
+        Args:
+            owner: Serviço que vai usar a porta
+            preferred_ports: Portas para tentar primeiro
+            ranges: Faixas (início, fim) no lugar das configuradas
+            ttl: Validade da reserva em segundos
+            
+        Returns:
+            tuple: (reserva com port, token e expires_at, ou None; mensagem)
+        """
+        lease = self.port_allocator.lease(owner, preferred_ports, ranges, ttl)
+        if lease is None:
+            return None, "Não foi possível encontrar uma porta disponível"
+        self._lease_tokens[lease["port"]] = lease["token"]
+        return lease, f"Porta {lease['port']} reservada para '{owner}'"
+        
     def get_next_available_port(self, start_port: int = 3000, preferred_ports: Optional[List[int]] = None) -> Tuple[Optional[int], str]:
         """
-        Encontra próxima porta disponível com verificações de segurança
+        Encontra e reserva a próxima porta disponível
+        
+        A porta fica reservada para esta instância pelo tempo da reserva,
+        então outra sessão não recebe a mesma porta antes do register_port.
         
         Args:
             start_port: Porta inicial para busca
@@ -205,22 +338,14 @@ class ConfigStore:
         Returns:
             tuple: (porta ou None, mensagem)
         """
-        # Tenta primeiro as portas preferenciais
-        if preferred_ports:
-            for port in preferred_ports:
-                available, reason = self.is_port_available(port)
-                if available:
-                    return port, f"Porta preferencial {port} está disponível"
-                    
-        # Busca a próxima porta disponível
-        current_port = start_port
-        while current_port < 65535:
-            available, reason = self.is_port_available(current_port)
-            if available:
-                return current_port, f"Próxima porta disponível: {current_port}"
-            current_port += 1
-            
-        return None, "Não foi possível encontrar uma porta disponível"
+        lease, msg = self.lease_port(
+            "pending", preferred_ports=preferred_ports, ranges=[(start_port, 65535)]
+        )
+        if lease is None:
+            return None, msg
+        if preferred_ports and lease["port"] in preferred_ports:
+            return lease["port"], f"Porta preferencial {lease['port']} está disponível"
+        return lease["port"], f"Próxima porta disponível: {lease['port']}"
         
     def verify_system_ports(self) -> List[Dict]:
         """
@@ -230,11 +355,11 @@ class ConfigStore:
             List[Dict]: Lista de portas que precisam de atenção
         """
         needs_attention = []
+        ports = self.config["ports"]
         
-        for port, info in self.config["ports"].items():
-            if info["status"] != "in_use":
-                continue
-                
+        for port in list(self._ports_by_status["in_use"]):
+            info = ports[port]
+            
             # Verifica se a porta ainda está em uso no sistema
             system_check = self._check_port_in_use_system(int(port))
             
@@ -259,6 +384,11 @@ class ConfigStore:
         if name not in self.config["dependencies"]:
             self.config["dependencies"][name] = []
             
+        # Ignora registros repetidos da mesma versão para o mesmo serviço
+        if (name, version) in self._service_dependencies[service]:
+            return
+            
+        self._service_dependencies[service][(name, version)] = None
         self.config["dependencies"][name].append({
             "version": version,
             "service": service,
@@ -288,29 +418,26 @@ class ConfigStore:
         
     def get_service_ports(self, service: str) -> List[int]:
         """Lista todas as portas usadas por um serviço"""
+        self.load_pending()
+        in_use = self._ports_by_status["in_use"]
         return [
-            int(port) for port, info in self.config["ports"].items()
-            if info["service"] == service and info["status"] == "in_use"
+            int(port) for port in self._service_ports.get(service, ())
+            if port in in_use
         ]
         
     def get_service_dependencies(self, service: str) -> List[Dict]:
         """Lista todas as dependências de um serviço"""
-        deps = []
-        for dep_name, versions in self.config["dependencies"].items():
-            for version in versions:
-                if version["service"] == service:
-                    deps.append({
-                        "name": dep_name,
-                        "version": version["version"]
-                    })
-        return deps
+        self.load_pending()
+        return [
+            {"name": dep_name, "version": version}
+            for dep_name, version in self._service_dependencies.get(service, ())
+        ]
         
     def get_system_overview(self) -> Dict:
         """Retorna visão geral do sistema"""
         return {
             "active_services": len(self.config["services"]),
-            "ports_in_use": len([p for p, info in self.config["ports"].items() 
-                                if info["status"] == "in_use"]),
+            "ports_in_use": len(self._ports_by_status["in_use"]),
             "total_dependencies": len(self.config["dependencies"]),
             "environment_vars": len(self.config["environment"]),
             "last_updated": self.config["metadata"]["last_updated"]
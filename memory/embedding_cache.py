@@ -0,0 +1,193 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Dict, List, Optional
+
+from memory.embeddings import EmbeddingProvider
+
+
+class SQLiteEmbeddingCache(EmbeddingProvider):
+    # Limite de parâmetros por consulta IN (...) do SQLite
+    _CHUNK = 500
+
+    def __init__(self, provider: EmbeddingProvider, db_path: str,
+                 max_entries: int = 200_000):
+        """
+        Cache persistente de embeddings em volta de outro provedor
+
+        Vetores são guardados como BLOBs float32, indexados por
+        (modelo, sha256 do texto). Só textos nunca vistos chegam ao provedor.
+
+        Args:
+            provider: Provedor que calcula os embeddings ausentes
+            db_path: Caminho do banco SQLite do cache
+            max_entries: Número máximo de vetores antes da remoção por LRU
+        """
+        self.provider = provider
+        self.model_id = provider.model_id
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute('''CREATE TABLE IF NOT EXISTS embeddings
+                              (model_id TEXT NOT NULL,
+                               text_hash TEXT NOT NULL,
+                               vector BLOB NOT NULL,
+                               last_used REAL NOT NULL,
+                               PRIMARY KEY (model_id, text_hash))''')
+        self._conn.execute('''CREATE INDEX IF NOT EXISTS idx_embeddings_last_used
+                              ON embeddings(last_used)''')
+        self._conn.commit()
+        # Contagem mantida em memória: _evict não varre a tabela a cada inserção
+        (self._count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+
+    @staticmethod
+    def _hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _encode(vector: List[float]) -> bytes:
+        return array("f", vector).tobytes()
+
+    @staticmethod
+    def _decode(blob: bytes) -> List[float]:
+        vector = array("f")
+        vector.frombytes(blob)
+        return vector.tolist()
+
+    def _lookup(self, hashes: List[str]) -> Dict[str, List[float]]:
+        """Busca vetores já calculados e atualiza o último uso"""
+        found = {}
+        for start in range(0, len(hashes), self._CHUNK):
+            chunk = hashes[start:start + self._CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self._conn.execute(
+                f"SELECT text_hash, vector FROM embeddings "
+                f"WHERE model_id = ? AND text_hash IN ({placeholders})",
+                [self.model_id, *chunk]
+            ).fetchall()
+            for text_hash, blob in rows:
+                found[text_hash] = self._decode(blob)
+
+        if found:
+            now = time.time()
+            self._conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE model_id = ? AND text_hash = ?",
+                [(now, self.model_id, h) for h in found]
+            )
+        return found
+
+    def _evict(self):
+        """Remove os vetores menos usados quando o limite é excedido"""
+        if self._count <= self.max_entries:
+            return
+        # Outros processos podem usar o mesmo banco: confirma antes de remover
+        (self._count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        excess = self._count - self.max_entries
+        if excess <= 0:
+            return
+        # Remove um pouco além do excesso para não despejar a cada inserção
+        excess += self.max_entries // 20
+        cursor = self._conn.execute(
+            '''DELETE FROM embeddings WHERE rowid IN
+               (SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)''',
+            (excess,)
+        )
+        self.stats["evictions"] += cursor.rowcount
+        self._count -= cursor.rowcount
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        hashes = [self._hash(text) for text in texts]
+
+        with self._lock:
+            found = self._lookup(list(set(hashes)))
+
+        # Textos repetidos na mesma chamada são calculados uma vez
+        pending: Dict[str, str] = {}
+        for text, text_hash in zip(texts, hashes):
+            if text_hash not in found:
+                pending.setdefault(text_hash, text)
+
+        if pending:
+            vectors = self.provider.embed(list(pending.values()))
+            now = time.time()
+            with self._lock:
+                # Um texto calculado ao mesmo tempo por outra thread já está lá
+                cursor = self._conn.executemany(
+                    "INSERT OR IGNORE INTO embeddings VALUES (?, ?, ?, ?)",
+                    [(self.model_id, h, self._encode(v), now)
+                     for h, v in zip(pending, vectors)]
+                )
+                self._count += cursor.rowcount
+                self._evict()
+                self._conn.commit()
+            found.update(zip(pending, (list(map(float, v)) for v in vectors)))
+        else:
+            with self._lock:
+                self._conn.commit()
+
+        with self._lock:
+            self.stats["hits"] += len(texts) - len(pending)
+            self.stats["misses"] += len(pending)
+        return [found[text_hash] for text_hash in hashes]
+
+    def get_stats(self) -> Dict:
+        """
+        Retorna estatísticas do cache
+
+        Returns:
+            Dict: acertos, faltas, remoções, entradas e bytes armazenados
+        """
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+            ).fetchone()
+            stats = dict(self.stats)
+        total = stats["hits"] + stats["misses"]
+        stats.update({
+            "entries": entries,
+            "bytes": size,
+            "hit_rate": stats["hits"] / total if total else 0.0
+        })
+        return stats
+
+    def clear(self):
+        """Remove todos os vetores do modelo atual"""
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM embeddings WHERE model_id = ?", (self.model_id,))
+            self._conn.commit()
+            self._count -= cursor.rowcount
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def wrap_with_cache(provider: EmbeddingProvider, db_path: Optional[str] = None) -> EmbeddingProvider:
+    """
+    Envolve um provedor com o cache persistente, se configurado
+
+    Args:
+        provider: Provedor original
+        db_path: Caminho do cache; se omitido usa EMBEDDING_CACHE_DB
+
+    Returns:
+        EmbeddingProvider: O provedor com cache, ou o original sem caminho
+    """
+    db_path = db_path or os.getenv("EMBEDDING_CACHE_DB")
+    if not db_path:
+        return provider
+    max_entries = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+    return SQLiteEmbeddingCache(provider, db_path, max_entries=max_entries)
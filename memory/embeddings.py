@@ -0,0 +1,199 @@
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+
+
+class EmbeddingProvider:
+    """
+    Interface de provedores de embeddings usados pelo VectorMemory
+
+    Compatível com o protocolo EmbeddingFunction do Chroma: a instância
+    pode ser passada diretamente como embedding_function de uma coleção.
+    """
+
+    model_id = "unknown"
+
+    def __call__(self, input: List[str]) -> List[List[float]]:
+        return self.embed(list(input))
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """
+        Gera embeddings para uma lista de textos
+
+        Args:
+            texts: Textos a vetorizar
+
+        Returns:
+            List[List[float]]: Um vetor por texto, na mesma ordem
+        """
+        raise NotImplementedError
+
+
+class DefaultEmbeddingProvider(EmbeddingProvider):
+    """Modelo padrão do Chroma (all-MiniLM-L6-v2), carregado sob demanda"""
+
+    model_id = "all-MiniLM-L6-v2"
+
+    def __init__(self):
+        self._function = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        """Carrega o modelo apenas no primeiro uso"""
+        with self._lock:
+            if self._function is None:
+                from chromadb.utils import embedding_functions
+                self._function = embedding_functions.DefaultEmbeddingFunction()
+        return self._function
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        function = self._function or self._load()
+        return [list(map(float, vector)) for vector in function(texts)]
+
+
+class BatchingEmbeddingWorker(EmbeddingProvider):
+    def __init__(self, provider: EmbeddingProvider, max_batch_size: int = 64,
+                 max_latency_ms: float = 10.0, cache_size: int = 2048):
+        """
+        Worker local que agrupa pedidos concorrentes em micro-lotes
+
+        Args:
+            provider: Provedor que realmente calcula os embeddings
+            max_batch_size: Número máximo de textos por lote
+            max_latency_ms: Tempo máximo de espera para completar um lote
+            cache_size: Tamanho do cache LRU texto → vetor (0 desativa)
+        """
+        self.provider = provider
+        self.model_id = provider.model_id
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency_ms / 1000.0
+        self.cache_size = cache_size
+
+        self._cache: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._requests: "queue.Queue[Tuple[List[str], Future]]" = queue.Queue()
+        self.stats = {"requests": 0, "batches": 0, "embedded": 0, "cache_hits": 0}
+
+        self._thread = threading.Thread(
+            target=self._run, name="embedding-worker", daemon=True
+        )
+        self._thread.start()
+
+    def _cache_get(self, text: str) -> Optional[List[float]]:
+        with self._cache_lock:
+            vector = self._cache.get(text)
+            if vector is not None:
+                self._cache.move_to_end(text)
+            return vector
+
+    def _cache_put(self, text: str, vector: List[float]):
+        if self.cache_size <= 0:
+            return
+        with self._cache_lock:
+            self._cache[text] = vector
+            self._cache.move_to_end(text)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        missing = []
+        for i, text in enumerate(texts):
+            vector = self._cache_get(text)
+            if vector is None:
+                missing.append(i)
+            else:
+                results[i] = vector
+        with self._cache_lock:
+            self.stats["requests"] += 1
+            self.stats["cache_hits"] += len(texts) - len(missing)
+
+        if missing:
+            future: Future = Future()
+            self._requests.put(([texts[i] for i in missing], future))
+            for i, vector in zip(missing, future.result()):
+                results[i] = vector
+        return results
+
+    def _collect_batch(self) -> List[Tuple[List[str], Future]]:
+        """Aguarda o primeiro pedido e agrega os seguintes até o prazo"""
+        batch = [self._requests.get()]
+        size = len(batch[0][0])
+        deadline = time.monotonic() + self.max_latency
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._requests.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(request)
+            size += len(request[0])
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+
+            # Textos repetidos entre pedidos são calculados uma única vez
+            unique: Dict[str, int] = {}
+            for texts, _ in batch:
+                for text in texts:
+                    unique.setdefault(text, len(unique))
+
+            try:
+                vectors = self.provider.embed(list(unique))
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            self.stats["batches"] += 1
+            self.stats["embedded"] += len(unique)
+            for text, index in unique.items():
+                self._cache_put(text, vectors[index])
+            for texts, future in batch:
+                future.set_result([vectors[unique[text]] for text in texts])
+
+
+_providers: Dict[str, EmbeddingProvider] = {}
+_providers_lock = threading.Lock()
+
+
+def get_embedding_provider(name: Optional[str] = None) -> EmbeddingProvider:
+    """
+    Retorna o provedor de embeddings compartilhado pelo processo
+
+    Args:
+        name: "default" (modelo em processo) ou "worker" (micro-lotes com
+            cache LRU). Se omitido, usa a variável EMBEDDING_PROVIDER.
+
+    Returns:
+        EmbeddingProvider: Instância única por nome, envolvida pelo cache
+            persistente quando EMBEDDING_CACHE_DB está definido
+    """
+    name = name or os.getenv("EMBEDDING_PROVIDER", "default")
+    with _providers_lock:
+        if name not in _providers:
+            if name == "default":
+                provider = DefaultEmbeddingProvider()
+            elif name == "worker":
+                provider = BatchingEmbeddingWorker(
+                    DefaultEmbeddingProvider(),
+                    max_batch_size=int(os.getenv("EMBEDDING_BATCH_SIZE", "64")),
+                    max_latency_ms=float(os.getenv("EMBEDDING_BATCH_LATENCY_MS", "10")),
+                    cache_size=int(os.getenv("EMBEDDING_CACHE_SIZE", "2048")),
+                )
+            else:
+                raise ValueError(f"Provedor de embeddings desconhecido: {name}")
+
+            from memory.embedding_cache import wrap_with_cache
+            _providers[name] = wrap_with_cache(provider)
+        return _providers[name]
@@ -0,0 +1,99 @@
+import sys
+import tracemalloc
+from collections import deque
+from typing import Dict, Optional
+
+# Itens medidos por contêiner; o resto é extrapolado pela média
+SAMPLE_SIZE = 64
+
+
+def estimate_size(obj, sample: int = SAMPLE_SIZE, max_depth: int = 8,
+                  _seen: Optional[set] = None, _depth: int = 0) -> int:
+    """
+    Estima o tamanho residente de um objeto e do que ele referencia
+
+    Usa sys.getsizeof recursivamente; contêineres grandes têm apenas uma
+    amostra dos itens medida, e o total é extrapolado pela média.
+
+    Args:
+        obj: Objeto a medir
+        sample: Itens medidos por contêiner
+        max_depth: Profundidade máxima da recursão
+    """
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+
+    # Arrays numpy: getsizeof já conta os dados só quando o array os possui
+    # (memmaps e views contam apenas o cabeçalho)
+    size = sys.getsizeof(obj)
+    if _depth >= max_depth or isinstance(obj, (str, bytes, bytearray, int, float, bool)) \
+            or hasattr(obj, "nbytes"):
+        return size
+
+    def measure(items, count):
+        items = list(items)
+        if not items:
+            return 0
+        total = sum(estimate_size(item, sample, max_depth, _seen, _depth + 1) for item in items)
+        return total * count // len(items)
+
+    if isinstance(obj, dict):
+        keys = list(obj.keys())[:sample]
+        size += measure(keys, len(obj))
+        size += measure((obj[k] for k in keys), len(obj))
+    elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+        size += measure((item for _, item in zip(range(sample), obj)), len(obj))
+    elif hasattr(obj, "__dict__") and not isinstance(obj, type):
+        size += estimate_size(vars(obj), sample, max_depth, _seen, _depth + 1)
+    return size
+
+
+def _format_bytes(size: int) -> str:
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+def _max_rss() -> Optional[int]:
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except (ImportError, OSError):
+        return None
+
+
+def memory_report(components: Dict[str, object], top: int = 5) -> str:
+    """
+    Monta o relatório de memória dos componentes informados
+
+    Args:
+        components: Nome -> objeto a medir (None é ignorado)
+        top: Linhas de código com mais alocações (se o tracemalloc estiver ativo)
+
+    Returns:
+        str: Relatório formatado
+    """
+    lines = ["Memória residente estimada:"]
+    for name, obj in components.items():
+        if obj is None:
+            continue
+        lines.append(f"  {name}: {_format_bytes(estimate_size(obj))}")
+
+    rss = _max_rss()
+    if rss:
+        lines.append(f"  Pico de RSS do processo: {_format_bytes(rss)}")
+
+    if tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        lines.append(f"  tracemalloc: atual {_format_bytes(current)}, pico {_format_bytes(peak)}")
+        for stat in tracemalloc.take_snapshot().statistics("lineno")[:top]:
+            frame = stat.traceback[0]
+            lines.append(f"    {frame.filename}:{frame.lineno} {_format_bytes(stat.size)}")
+    else:
+        lines.append("  (MEM_TRACE=1 ativa o tracemalloc para detalhar as alocações)")
+    return "\n".join(lines)
@@ -0,0 +1,99 @@
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class MMRSettings:
+    def __init__(self, lambda_mult: float = 0.5, fetch_k: int = 20):
+        """
+        Re-ranqueamento por relevância marginal máxima (MMR)
+
+        Args:
+            lambda_mult: Peso da relevância (1.0 = só relevância, 0.0 = só diversidade)
+            fetch_k: Candidatos buscados antes da seleção
+        """
+        if not 0.0 <= lambda_mult <= 1.0:
+            raise ValueError("lambda_mult deve estar entre 0 e 1")
+        self.lambda_mult = lambda_mult
+        self.fetch_k = fetch_k
+
+    @classmethod
+    def from_env(cls) -> Optional["MMRSettings"]:
+        """Configuração do .env, ou None se CONTEXT_MMR estiver desligado"""
+        if os.getenv("CONTEXT_MMR", "0") != "1":
+            return None
+        return cls(
+            lambda_mult=float(os.getenv("CONTEXT_MMR_LAMBDA", "0.5")),
+            fetch_k=int(os.getenv("CONTEXT_MMR_FETCH_K", "20")),
+        )
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def mmr_select(query_vector, candidate_vectors, k: int, lambda_mult: float = 0.5) -> List[int]:
+    """
+    Escolhe k candidatos equilibrando relevância e diversidade
+
+    A cada passo escolhe o candidato que maximiza
+    lambda * sim(consulta, c) - (1 - lambda) * max sim(c, já escolhidos).
+    As similaridades (cosseno) são calculadas de uma vez em matrizes; o
+    laço só atualiza a similaridade máxima com os escolhidos.
+
+    Args:
+        query_vector: Embedding da consulta
+        candidate_vectors: Embeddings dos candidatos (n x dim)
+        k: Quantidade a escolher
+        lambda_mult: Peso da relevância
+
+    Returns:
+        List[int]: Posições dos candidatos escolhidos, em ordem de escolha
+    """
+    candidates = _normalize(np.asarray(candidate_vectors, dtype=np.float32))
+    n = len(candidates)
+    k = min(k, n)
+    if k <= 0:
+        return []
+
+    query = _normalize(np.asarray(query_vector, dtype=np.float32).reshape(1, -1))[0]
+    relevance = candidates @ query
+    similarity = candidates @ candidates.T
+
+    selected: List[int] = []
+    available = np.ones(n, dtype=bool)
+    max_similarity = np.full(n, -np.inf, dtype=np.float32)
+    for step in range(k):
+        if step == 0:
+            scores = relevance.copy()
+        else:
+            scores = lambda_mult * relevance - (1 - lambda_mult) * max_similarity
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(max_similarity, similarity[best], out=max_similarity)
+    return selected
+
+
+def query_diverse(store, query: str, n_results: int,
+                  settings: MMRSettings) -> List[Tuple[str, Dict]]:
+    """
+    Busca fetch_k candidatos no armazenamento e devolve n_results diversos
+
+    Args:
+        store: Backend vetorial com query_candidates
+        query: Texto da consulta
+        n_results: Quantidade de documentos retornados
+        settings: Parâmetros do MMR
+
+    Returns:
+        List[Tuple[str, Dict]]: Pares (documento, metadados)
+    """
+    query_vector, results, vectors = store.query_candidates(query, max(settings.fetch_k, n_results))
+    if len(results) <= n_results:
+        return results
+    return [results[i] for i in mmr_select(query_vector, vectors, n_results, settings.lambda_mult)]
@@ -0,0 +1,322 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from memory.embeddings import get_embedding_provider
+from memory.mmr import MMRSettings, query_diverse
+
+
+class NumpyVectorMemory:
+    _VECTORS_FILE = "vectors.npy"
+
+    def __init__(self, persist_directory: str = "./numpy_db", embedding_function=None):
+        """
+        Armazenamento vetorial em processo, sem Chroma
+
+        Os embeddings normalizados ficam em uma matriz .npy mapeada em memória
+        e os metadados em uma tabela SQLite ao lado. A busca é um produto
+        escalar vetorizado seguido de argpartition para o top-k.
+
+        Args:
+            persist_directory: Diretório dos arquivos do índice
+            embedding_function: Provedor de embeddings (padrão: compartilhado)
+        """
+        self.persist_directory = persist_directory
+        os.makedirs(persist_directory, exist_ok=True)
+        self.embedding_function = embedding_function or get_embedding_provider()
+        self.vectors_file = os.path.join(persist_directory, self._VECTORS_FILE)
+        # Re-ranqueamento MMR do contexto (CONTEXT_MMR=1)
+        self.mmr = MMRSettings.from_env()
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            os.path.join(persist_directory, "metadata.db"), check_same_thread=False
+        )
+        self._conn.execute('''CREATE TABLE IF NOT EXISTS messages
+                              (idx INTEGER PRIMARY KEY,
+                               msg_id TEXT NOT NULL,
+                               role TEXT NOT NULL,
+                               content TEXT NOT NULL,
+                               metadata TEXT)''')
+        self._conn.execute('''CREATE TABLE IF NOT EXISTS info
+                              (key TEXT PRIMARY KEY, value TEXT)''')
+        self._conn.commit()
+
+        row = self._conn.execute("SELECT value FROM info WHERE key = 'dim'").fetchone()
+        self.dim = int(row[0]) if row else None
+        # count é o número de posições usadas na matriz; live desconta as removidas
+        (self.count,) = self._conn.execute(
+            "SELECT COALESCE(MAX(idx) + 1, 0) FROM messages").fetchone()
+        (self.live,) = self._conn.execute("SELECT COUNT(*) FROM messages").fetchone()
+        self._capacity = 0
+        self._close_arrays()
+        if self.dim:
+            self._open_arrays()
+
+    def _close_arrays(self):
+        self._vectors = None
+
+    def _array_files(self) -> List[str]:
+        return [self.vectors_file]
+
+    def _open_arrays(self):
+        """Abre a matriz mapeada em memória, se existir"""
+        if not os.path.exists(self.vectors_file):
+            self._capacity = 0
+            return
+        self._vectors = np.lib.format.open_memmap(self.vectors_file, mode="r+")
+        self._capacity = self._vectors.shape[0]
+
+    def _ensure_capacity(self, needed: int):
+        """Cresce a matriz dobrando a capacidade (cópia amortizada)"""
+        if needed <= self._capacity:
+            return
+        capacity = max(needed, self._capacity * 2, 1024)
+        tmp_file = self.vectors_file + ".tmp"
+        grown = np.lib.format.open_memmap(
+            tmp_file, mode="w+", dtype=np.float32, shape=(capacity, self.dim)
+        )
+        if self._vectors is not None:
+            grown[:self.count] = self._vectors[:self.count]
+        grown.flush()
+        del grown
+        self._close_arrays()
+        os.replace(tmp_file, self.vectors_file)
+        self._open_arrays()
+
+    def _store_vectors(self, start: int, end: int, vectors: np.ndarray):
+        self._vectors[start:end] = vectors
+
+    def _get_vectors(self, indices: np.ndarray) -> np.ndarray:
+        """Lê os vetores normalizados das posições informadas"""
+        return np.asarray(self._vectors[indices], dtype=np.float32)
+
+    def _search_indices(self, query_vector: np.ndarray, n_results: int) -> np.ndarray:
+        """Retorna os índices dos vetores mais similares, do melhor ao pior"""
+        query = self._normalize(query_vector.reshape(1, -1).astype(np.float32))[0]
+        scores = self._vectors[:self.count] @ query
+        n_results = min(n_results, self.count)
+        top = np.argpartition(-scores, n_results - 1)[:n_results]
+        return top[np.argsort(-scores[top])]
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def _append(self, vectors: np.ndarray, documents: List[str], metadatas: List[Dict],
+                ids: List[str]):
+        """Grava vetores já calculados e seus metadados"""
+        vectors = self._normalize(np.asarray(vectors, dtype=np.float32))
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                self._conn.execute("INSERT OR REPLACE INTO info VALUES ('dim', ?)",
+                                   (str(self.dim),))
+            start, end = self.count, self.count + len(vectors)
+            self._ensure_capacity(end)
+            self._store_vectors(start, end, vectors)
+
+            self._conn.executemany(
+                "INSERT INTO messages VALUES (?, ?, ?, ?, ?)",
+                [(start + i, msg_id, meta.get("role", "document"), doc, json.dumps(meta))
+                 for i, (msg_id, doc, meta) in enumerate(zip(ids, documents, metadatas))]
+            )
+            self._conn.commit()
+            self.count = end
+            self.live += len(vectors)
+
+    @property
+    def deleted(self) -> int:
+        """Posições da matriz ocupadas por documentos removidos"""
+        return self.count - self.live
+
+    def add_messages(self, messages: List[tuple]):
+        """Adiciona várias mensagens calculando os embeddings em um único lote"""
+        if not messages:
+            return
+        now = datetime.now()
+        documents = [content for _, content in messages]
+        metadatas = [{"timestamp": now.isoformat(), "role": role} for role, _ in messages]
+        ids = [f"msg_{now.timestamp()}_{i}" for i in range(len(messages))]
+        vectors = self.embedding_function(documents)
+        self._append(vectors, documents, metadatas, ids)
+
+    def add_message(self, role, content, metadata=None):
+        """Adiciona uma mensagem ao índice"""
+        try:
+            if metadata is None:
+                metadata = {}
+            metadata.update({
+                "timestamp": datetime.now().isoformat(),
+                "role": role
+            })
+            msg_id = f"msg_{datetime.now().timestamp()}"
+            vectors = self.embedding_function([content])
+            self._append(vectors, [content], [metadata], [msg_id])
+        except Exception as e:
+            with open("vector_errors.log", "a") as f:
+                f.write(f"{datetime.now()}: Erro ao adicionar mensagem: {str(e)}\n")
+
+    def add_documents(self, documents: List[str], metadatas: List[Dict], ids: List[str]):
+        """Adiciona documentos com ids próprios (ex: trechos de arquivos)"""
+        if documents:
+            self._append(self.embedding_function(documents), documents, metadatas, ids)
+
+    def add_embeddings(self, documents: List[str], metadatas: List[Dict], ids: List[str],
+                       embeddings) -> None:
+        """Grava documentos com embeddings já calculados, substituindo ids existentes"""
+        if not documents:
+            return
+        self.delete_documents(ids)
+        self._append(np.asarray(embeddings, dtype=np.float32), documents, metadatas, ids)
+
+    def iter_documents(self, batch_size: int = 1000, include_embeddings: bool = False
+                       ) -> Iterator[Tuple[List[str], List[str], List[Dict], Optional[np.ndarray]]]:
+        """Percorre os documentos em lotes: (ids, documentos, metadados, embeddings)"""
+        last = -1
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT idx, msg_id, content, metadata FROM messages "
+                    "WHERE idx > ? ORDER BY idx LIMIT ?", (last, batch_size)
+                ).fetchall()
+                if not rows:
+                    return
+                vectors = None
+                if include_embeddings:
+                    vectors = self._get_vectors(np.array([row[0] for row in rows]))
+            last = rows[-1][0]
+            yield ([row[1] for row in rows], [row[2] for row in rows],
+                   [json.loads(row[3]) if row[3] else {} for row in rows], vectors)
+
+    def delete_documents(self, ids: List[str]):
+        """
+        Remove documentos pelo id
+
+        As posições na matriz são zeradas e ignoradas nas buscas; o espaço só
+        é recuperado em clear().
+        """
+        if not ids:
+            return
+        with self._lock:
+            placeholders = ",".join("?" * len(ids))
+            rows = self._conn.execute(
+                f"SELECT idx FROM messages WHERE msg_id IN ({placeholders})", ids
+            ).fetchall()
+            if not rows:
+                return
+            zeros = np.zeros((1, self.dim), dtype=np.float32)
+            for (idx,) in rows:
+                self._store_vectors(idx, idx + 1, zeros)
+            self._conn.execute(f"DELETE FROM messages WHERE msg_id IN ({placeholders})", ids)
+            self._conn.commit()
+            self.live -= len(rows)
+
+    def _query(self, query_vector: np.ndarray, n_results: int, with_vectors: bool = False):
+        with self._lock:
+            # Posições removidas podem aparecer entre as melhores; busca a mais
+            indices = self._search_indices(query_vector, min(self.count, n_results + self.deleted))
+            results, found = [], []
+            for idx in indices.tolist():
+                row = self._conn.execute(
+                    "SELECT content, metadata FROM messages WHERE idx = ?", (idx,)
+                ).fetchone()
+                if row is None:
+                    continue
+                results.append((row[0], json.loads(row[1]) if row[1] else {}))
+                found.append(idx)
+                if len(results) == n_results:
+                    break
+            vectors = self._get_vectors(np.asarray(found, dtype=np.int64)) if with_vectors else None
+        return results, vectors
+
+    def query_documents(self, query: str, n_results: int = 5) -> List[Tuple[str, Dict]]:
+        """Busca os documentos mais similares, como pares (documento, metadados)"""
+        if not self.live:
+            return []
+        query_vector = np.asarray(self.embedding_function([query])[0], dtype=np.float32)
+        return self._query(query_vector, n_results)[0]
+
+    def query_candidates(self, query: str, n_results: int
+                         ) -> Tuple[Optional[np.ndarray], List[Tuple[str, Dict]], np.ndarray]:
+        """Como query_documents, devolvendo também a consulta e os embeddings (para o MMR)"""
+        if not self.live:
+            return None, [], np.empty((0, self.dim or 0), dtype=np.float32)
+        query_vector = np.asarray(self.embedding_function([query])[0], dtype=np.float32)
+        results, vectors = self._query(query_vector, n_results, with_vectors=True)
+        return query_vector, results, vectors
+
+    def search_context(self, query, n_results=5):
+        """Busca mensagens relevantes para o contexto atual"""
+        try:
+            if self.mmr:
+                results = query_diverse(self, query, n_results, self.mmr)
+            else:
+                results = self.query_documents(query, n_results)
+            messages = []
+            for doc, meta in results:
+                prefix = "Usuário: " if meta.get("role") == "user" else "Assistente: "
+                messages.append(f"{prefix}{doc}")
+            return messages
+        except Exception as e:
+            with open("vector_errors.log", "a") as f:
+                f.write(f"{datetime.now()}: Erro na busca: {str(e)}\n")
+            return []
+
+    def archive_messages(self, messages):
+        """Arquiva mensagens antigas no índice"""
+        self.add_messages(list(messages))
+
+    def clear(self):
+        """Limpa todas as mensagens do índice"""
+        with self._lock:
+            self._close_arrays()
+            for path in self._array_files():
+                if os.path.exists(path):
+                    os.remove(path)
+            self._conn.execute("DELETE FROM messages")
+            self._conn.execute("DELETE FROM info")
+            self._conn.commit()
+            self.dim = None
+            self.count = 0
+            self.live = 0
+            self._capacity = 0
+
+
+if __name__ == "__main__":
+    # Benchmark: abertura a frio e latência de busca com 100 mil vetores
+    import tempfile
+    import time
+
+    n, dim, queries = 100_000, 384, 200
+    rng = np.random.default_rng(7)
+    data = rng.normal(size=(n, dim)).astype(np.float32)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = NumpyVectorMemory(tmp, embedding_function=lambda texts: [])
+        for start in range(0, n, 10_000):
+            chunk = data[start:start + 10_000]
+            store._append(chunk, [""] * len(chunk),
+                          [{"role": "user"}] * len(chunk),
+                          [f"b{start + i}" for i in range(len(chunk))])
+        del store
+
+        t0 = time.perf_counter()
+        store = NumpyVectorMemory(tmp, embedding_function=lambda texts: [])
+        open_time = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        for probe in data[rng.integers(0, n, queries)]:
+            store._search_indices(probe, 5)
+        search_time = (time.perf_counter() - t0) / queries
+
+        print(f"Vetores: {n} x {dim}")
+        print(f"Abertura: {open_time * 1000:.2f} ms")
+        print(f"Busca top-5: {search_time * 1000:.2f} ms/consulta")
@@ -0,0 +1,229 @@
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: apenas exclusão entre threads
+    fcntl = None
+
+_BITMAP_SIZE = 65536 // 8
+_NOT_FULL = re.compile(b"[^\xff]")
+
+
+class PortAllocator:
+    def __init__(self, state_file: str, ranges: Optional[List[Tuple[int, int]]] = None,
+                 preferred_ports: Optional[List[int]] = None, lease_ttl: float = 60.0,
+                 probe: Optional[Callable[[int], bool]] = None, bound_ttl: float = 30.0):
+        """
+        Alocador de portas com bitmap e reservas temporárias (leases)
+
+        O bitmap de portas registradas e as reservas ativas ficam em um
+        arquivo compartilhado, lido e gravado sob trava de arquivo, para que
+        sessões concorrentes nunca recebam a mesma porta.
+
+        Args:
+            state_file: Arquivo de estado compartilhado
+            ranges: Faixas (início, fim) inclusivas onde procurar portas
+            preferred_ports: Portas tentadas antes das faixas
+            lease_ttl: Validade padrão de uma reserva, em segundos
+            probe: Função que diz se a porta está em uso no sistema
+            bound_ttl: Tempo que uma porta vista em uso fica marcada
+        """
+        self.state_file = state_file
+        self.lock_file = state_file + ".lock"
+        self.ranges = ranges or [(3000, 65535)]
+        self.preferred_ports = preferred_ports or []
+        self.lease_ttl = lease_ttl
+        self.probe = probe
+        self.bound_ttl = bound_ttl
+
+        self._thread_lock = threading.RLock()
+        self._registered = bytearray(_BITMAP_SIZE)
+        self._leases: Dict[str, Dict] = {}
+        # Portas vistas em uso no sistema (por processo, expiram)
+        self._bound = bytearray(_BITMAP_SIZE)
+        self._bound_since = time.monotonic()
+        # Próxima posição de busca por faixa (next-fit)
+        self._cursors: Dict[Tuple[int, int], int] = {}
+
+    @staticmethod
+    def _test(bitmap: bytearray, port: int) -> bool:
+        return bool(bitmap[port >> 3] & (1 << (port & 7)))
+
+    @staticmethod
+    def _set(bitmap: bytearray, port: int):
+        bitmap[port >> 3] |= 1 << (port & 7)
+
+    @contextmanager
+    def _locked(self, write: bool = True):
+        """
+        Trava entre threads e processos, com o estado recarregado do disco
+
+        Args:
+            write: Grava o estado ao sair; consultas usam False e não
+                reescrevem o arquivo (reservas vencidas saem na próxima escrita)
+        """
+        with self._thread_lock:
+            with open(self.lock_file, "a") as lock:
+                if fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    self._load_state()
+                    yield
+                    if write:
+                        self._save_state()
+                finally:
+                    if fcntl:
+                        fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _load_state(self):
+        if not os.path.exists(self.state_file):
+            return
+        with open(self.state_file, "rb") as f:
+            data = f.read()
+        self._registered = bytearray(data[:_BITMAP_SIZE])
+        self._leases = json.loads(data[_BITMAP_SIZE:] or b"{}")
+
+    def _save_state(self):
+        tmp_file = f"{self.state_file}.{os.getpid()}.tmp"
+        with open(tmp_file, "wb") as f:
+            f.write(bytes(self._registered))
+            f.write(json.dumps(self._leases).encode())
+        os.replace(tmp_file, self.state_file)
+
+    def _expire_leases(self):
+        now = time.time()
+        for port, lease in list(self._leases.items()):
+            if lease["expires_at"] <= now:
+                del self._leases[port]
+        if time.monotonic() - self._bound_since > self.bound_ttl:
+            self._bound = bytearray(_BITMAP_SIZE)
+            self._bound_since = time.monotonic()
+
+    def _is_free(self, port: int) -> bool:
+        """Verifica bitmap, reservas e, por último, o sistema operacional"""
+        if self._test(self._registered, port) or self._test(self._bound, port):
+            return False
+        if str(port) in self._leases:
+            return False
+        if self.probe and self.probe(port):
+            self._set(self._bound, port)
+            return False
+        return True
+
+    def _scan_range(self, start: int, end: int) -> Optional[int]:
+        """Busca next-fit no bitmap, pulando bytes totalmente ocupados"""
+        cursor = self._cursors.get((start, end), start)
+        if not start <= cursor <= end:
+            cursor = start
+        for lo, hi in ((cursor, end), (start, cursor - 1)):
+            port = lo
+            while port <= hi:
+                byte = port >> 3
+                if self._registered[byte] == 0xFF:
+                    match = _NOT_FULL.search(self._registered, byte + 1)
+                    if match is None:
+                        break
+                    port = match.start() << 3
+                    continue
+                if self._is_free(port):
+                    self._cursors[(start, end)] = port + 1
+                    return port
+                port += 1
+        return None
+
+    def sync_registered(self, ports: Iterable[int], replace: bool = False):
+        """
+        Atualiza o bitmap com as portas registradas no ConfigStore
+
+        Args:
+            ports: Portas em uso segundo as configurações
+            replace: Se True, descarta o bitmap anterior (ex: após restaurar)
+        """
+        with self._locked():
+            if replace:
+                self._registered = bytearray(_BITMAP_SIZE)
+            for port in ports:
+                self._set(self._registered, int(port))
+
+    def lease(self, owner: str, preferred_ports: Optional[List[int]] = None,
+              ranges: Optional[List[Tuple[int, int]]] = None,
+              ttl: Optional[float] = None) -> Optional[Dict]:
+        """
+        Reserva uma porta livre por um tempo limitado
+
+        Args:
+            owner: Serviço ou sessão que pede a porta
+            preferred_ports: Portas a tentar primeiro (além das padrão)
+            ranges: Faixas a usar no lugar das configuradas
+            ttl: Validade da reserva em segundos
+
+        Returns:
+            Optional[Dict]: Reserva com port, token, owner e expires_at
+        """
+        with self._locked():
+            self._expire_leases()
+            port = None
+            for candidate in (preferred_ports or []) + self.preferred_ports:
+                if self._is_free(candidate):
+                    port = candidate
+                    break
+            if port is None:
+                for start, end in ranges or self.ranges:
+                    port = self._scan_range(start, end)
+                    if port is not None:
+                        break
+            if port is None:
+                return None
+
+            lease = {
+                "port": port,
+                "token": uuid.uuid4().hex,
+                "owner": owner,
+                "expires_at": time.time() + (ttl or self.lease_ttl)
+            }
+            self._leases[str(port)] = lease
+            return dict(lease)
+
+    def get_lease(self, port: int) -> Optional[Dict]:
+        """Retorna a reserva ativa de uma porta, se houver"""
+        with self._locked(write=False):
+            self._expire_leases()
+            lease = self._leases.get(str(port))
+            return dict(lease) if lease else None
+
+    def confirm(self, port: int, owner: str, token: Optional[str] = None,
+                force: bool = False) -> Tuple[bool, str]:
+        """
+        Confirma o registro de uma porta, consumindo sua reserva
+
+        Args:
+            port: Porta registrada
+            owner: Serviço que está registrando
+            token: Token da reserva; obrigatório se a porta estiver reservada
+            force: Consome a reserva de outro dono (registro forçado)
+
+        Returns:
+            tuple: (sucesso, mensagem)
+        """
+        with self._locked():
+            self._expire_leases()
+            lease = self._leases.get(str(port))
+            if lease and lease["token"] != token and not force:
+                return False, f"Porta {port} está reservada para '{lease['owner']}'"
+            self._leases.pop(str(port), None)
+            self._set(self._registered, port)
+            return True, "Reserva confirmada"
+
+    def release(self, token: str):
+        """Libera uma reserva antes de expirar"""
+        with self._locked():
+            for port, lease in list(self._leases.items()):
+                if lease["token"] == token:
+                    del self._leases[port]
@@ -0,0 +1,143 @@
+"""
+Serialização compartilhada dos arquivos persistentes
+
+Usa orjson (JSON) ou msgpack (binário) quando instalados e cai para o json
+da biblioteca padrão. Por padrão grava JSON compacto; a forma indentada só é
+usada quando pedida (SERIALIZATION_PRETTY=1 ou pretty=True).
+
+Arquivos binários começam com um cabeçalho versionado (MAGIC + versão +
+codec); arquivos sem cabeçalho são JSON, o que mantém legíveis todos os
+arquivos antigos.
+"""
+import json
+import os
+import uuid
+from typing import Any, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MAGIC = b"NXS"
+FORMAT_VERSION = 1
+_CODEC_MSGPACK = b"m"
+
+
+def backend() -> str:
+    """Implementação usada para JSON ("orjson" ou "json")"""
+    return "orjson" if orjson is not None else "json"
+
+
+def dumps(obj: Any, pretty: bool = False) -> bytes:
+    """Serializa para JSON (compacto por padrão) em UTF-8"""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if pretty else 0)
+        return orjson.dumps(obj, option=option)
+    if pretty:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode("utf-8")
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def loads(data) -> Any:
+    """Lê dados gravados por dumps ou save (JSON ou binário versionado)"""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    if data.startswith(MAGIC):
+        version, codec = data[len(MAGIC)], data[len(MAGIC) + 1:len(MAGIC) + 2]
+        if version > FORMAT_VERSION:
+            raise ValueError(f"Formato de serialização {version} não suportado")
+        if codec == _CODEC_MSGPACK:
+            if msgpack is None:
+                raise RuntimeError("Arquivo em msgpack; instale o pacote msgpack")
+            return msgpack.unpackb(data[len(MAGIC) + 2:], raw=False, strict_map_key=False)
+        raise ValueError(f"Codec de serialização desconhecido: {codec!r}")
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _binary_format() -> bool:
+    return os.getenv("SERIALIZATION_FORMAT", "json") == "msgpack" and msgpack is not None
+
+
+def encode(obj: Any, pretty: Optional[bool] = None) -> bytes:
+    """
+    Codifica no formato configurado
+
+    Args:
+        obj: Dados a gravar
+        pretty: JSON indentado; se omitido usa SERIALIZATION_PRETTY
+    """
+    if pretty is None:
+        pretty = os.getenv("SERIALIZATION_PRETTY", "0") == "1"
+    if not pretty and _binary_format():
+        return MAGIC + bytes([FORMAT_VERSION]) + _CODEC_MSGPACK + msgpack.packb(obj, use_bin_type=True)
+    return dumps(obj, pretty=pretty)
+
+
+def save(path: str, obj: Any, pretty: Optional[bool] = None):
+    """Grava obj em path de forma atômica (arquivo temporário + rename)"""
+    tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(encode(obj, pretty))
+    os.replace(tmp_path, path)
+
+
+def load(path: str) -> Any:
+    """Lê um arquivo gravado por save (ou JSON antigo)"""
+    with open(path, "rb") as f:
+        return loads(f.read())
+
+
+if __name__ == "__main__":
+    # Benchmark: json indentado (formato antigo) versus o caminho configurado
+    import tempfile
+    import time
+
+    data = {
+        "checkpoints": [
+            {"id": f"{i:08x}", "message": f"Checkpoint automático antes da resposta {i}",
+             "timestamp": "2024-01-01T00:00:00", "format": "dir",
+             "files": {"config": "config.json", "messages": "messages.json", "chroma": "chroma_db"}}
+            for i in range(5000)
+        ],
+        "current": None,
+        "metadata": {"last_checkpoint": None, "version": "1.0"}
+    }
+    rounds = 20
+
+    def bench(name, write, read):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "data")
+            start = time.perf_counter()
+            for _ in range(rounds):
+                write(path)
+            write_time = (time.perf_counter() - start) / rounds
+            start = time.perf_counter()
+            for _ in range(rounds):
+                read(path)
+            read_time = (time.perf_counter() - start) / rounds
+            size = os.path.getsize(path)
+        print(f"{name:<24} grava {write_time * 1000:7.2f} ms  lê {read_time * 1000:7.2f} ms  {size / 1024:8.1f} KB")
+        return write_time + read_time
+
+    def legacy_write(path):
+        with open(path, "w") as f:
+            json.dump(data, f, indent=2)
+
+    def legacy_read(path):
+        with open(path) as f:
+            json.load(f)
+
+    baseline = bench("json indent=2", legacy_write, legacy_read)
+    fast = bench(f"{backend()} compacto", lambda p: save(p, data, pretty=False), load)
+    print(f"Ganho: {baseline / fast:.1f}x")
+    if msgpack is not None:
+        os.environ["SERIALIZATION_FORMAT"] = "msgpack"
+        bench("msgpack", lambda p: save(p, data, pretty=False), load)
@@ -0,0 +1,587 @@
+"""
+Sincronização incremental de checkpoints e histórico entre hosts
+
+Cada nó descreve seu estado em um resumo pequeno: o registro de checkpoints,
+um digest por checkpoint e um digest por dia do chat_history. Quem sincroniza
+(pull) compara com o próprio estado e pede apenas o que falta:
+
+- Checkpoints: os arquivos de data/ são divididos em chunks definidos pelo
+  conteúdo (hash rolante, como no rsync) e endereçados por sha256. Só os
+  chunks que não existem em nenhum arquivo local atravessam o transporte.
+- Histórico: apenas os dias com digest diferente trocam chaves, e só as
+  linhas ausentes são enviadas.
+
+A mescla é idempotente: repetir a sincronização não duplica checkpoints nem
+mensagens. Cada nó puxa do outro; para sincronizar nos dois sentidos, rode
+o pull nos dois hosts.
+
+Uso:
+    python -m memory.sync serve --socket /tmp/nexus-sync.sock
+    python -m memory.sync pull unix:/tmp/nexus-sync.sock
+    python -m memory.sync pull /outro/host/checkpoints --db /outro/host/chat_history.db
+"""
+import hashlib
+import os
+import re
+import shutil
+import socket
+import socketserver
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from memory import serialization
+from memory.checkpoint_manager import CheckpointManager
+
+# Chunks definidos pelo conteúdo: média ~16 KiB, entre 4 e 64 KiB
+MIN_CHUNK = 4 * 1024
+MAX_CHUNK = 64 * 1024
+CHUNK_MASK = (1 << 14) - 1
+WINDOW = 48
+READ_SIZE = 1024 * 1024
+# Limite de bytes por pedido de chunks
+FETCH_BATCH_BYTES = 4 * 1024 * 1024
+
+# Tabela fixa do hash rolante (igual em todos os hosts e versões do numpy)
+_GEAR = np.array(
+    [int.from_bytes(hashlib.sha256(bytes([i])).digest()[:4], "little") for i in range(256)],
+    dtype=np.uint64
+)
+_CHECKPOINT_ID = re.compile(r"^[0-9A-Za-z_-]+$")
+PEER_METHODS = {"summary", "checkpoint_manifest", "get_chunks", "history_keys", "history_rows"}
+
+
+def chunk_boundaries(data: bytes) -> List[int]:
+    """
+    Posições de corte (fim de cada chunk) definidas pelo conteúdo
+
+    O hash é a soma, em uma janela de WINDOW bytes, de valores aleatórios
+    fixos por byte; a soma é calculada de uma vez com cumsum e os cortes
+    ficam onde os bits baixos são zero, respeitando MIN_CHUNK e MAX_CHUNK.
+    Uma inserção no meio do arquivo só muda os chunks ao redor dela.
+    """
+    n = len(data)
+    cuts, last = [], 0
+    if n > MIN_CHUNK:
+        gear = _GEAR[np.frombuffer(data, dtype=np.uint8)]
+        sums = np.concatenate((np.zeros(1, dtype=np.uint64), np.cumsum(gear, dtype=np.uint64)))
+        window = sums[WINDOW:] - sums[:-WINDOW]
+        for position in (np.flatnonzero((window & np.uint64(CHUNK_MASK)) == 0) + WINDOW).tolist():
+            if position - last < MIN_CHUNK:
+                continue
+            while position - last > MAX_CHUNK:
+                last += MAX_CHUNK
+                cuts.append(last)
+            cuts.append(position)
+            last = position
+    while n - last > MAX_CHUNK:
+        last += MAX_CHUNK
+        cuts.append(last)
+    if last < n or not cuts:
+        cuts.append(n)
+    return cuts
+
+
+def iter_chunks(path: str) -> Iterator[bytes]:
+    """Lê o arquivo em blocos e produz seus chunks, com memória limitada"""
+    with open(path, "rb") as f:
+        buffer = b""
+        while True:
+            block = f.read(READ_SIZE)
+            buffer += block
+            if not block:
+                start = 0
+                for cut in chunk_boundaries(buffer) if buffer else []:
+                    yield buffer[start:cut]
+                    start = cut
+                return
+            cuts = chunk_boundaries(buffer)
+            # O último chunk pode continuar no próximo bloco
+            start = 0
+            for cut in cuts[:-1]:
+                yield buffer[start:cut]
+                start = cut
+            buffer = buffer[start:]
+
+
+def _history_key(role: str, content: str, timestamp: str) -> str:
+    return hashlib.sha1(f"{role}\0{timestamp}\0{content}".encode("utf-8")).hexdigest()
+
+
+class SyncNode:
+    def __init__(self, checkpoint_manager: CheckpointManager, db_path: str):
+        """
+        Estado sincronizável de um host: checkpoints e chat_history
+
+        O manifesto dos arquivos (chunks de cada arquivo em data/) fica em
+        sync.db no diretório de checkpoints e só é recalculado para arquivos
+        com tamanho ou mtime diferentes.
+
+        Args:
+            checkpoint_manager: Gerenciador dos checkpoints do host
+            db_path: Banco SQLite com a tabela chat_history
+        """
+        self.checkpoints = checkpoint_manager
+        self.data_directory = checkpoint_manager.data_directory
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            os.path.join(checkpoint_manager.base_directory, "sync.db"), check_same_thread=False
+        )
+        self._conn.execute('''CREATE TABLE IF NOT EXISTS files
+                              (path TEXT PRIMARY KEY,
+                               size INTEGER NOT NULL,
+                               mtime_ns INTEGER NOT NULL,
+                               chunks TEXT NOT NULL)''')
+        self._conn.commit()
+
+    # --- Manifesto dos arquivos ---
+
+    def _walk(self) -> Iterator[str]:
+        for root, dirs, files in os.walk(self.data_directory):
+            dirs[:] = [d for d in dirs if not d.startswith(".sync-")]
+            for name in files:
+                if name.endswith(".tmp"):
+                    continue
+                yield os.path.relpath(os.path.join(root, name), self.data_directory)
+
+    def scan(self):
+        """Atualiza o manifesto com os arquivos novos, alterados ou removidos"""
+        with self._lock:
+            known = {row[0]: (row[1], row[2]) for row in
+                     self._conn.execute("SELECT path, size, mtime_ns FROM files")}
+            seen = set()
+            for path in self._walk():
+                seen.add(path)
+                try:
+                    stat = os.stat(os.path.join(self.data_directory, path))
+                except FileNotFoundError:
+                    continue
+                if known.get(path) == (stat.st_size, stat.st_mtime_ns):
+                    continue
+                chunks = [[hashlib.sha256(c).hexdigest(), len(c)]
+                          for c in iter_chunks(os.path.join(self.data_directory, path))]
+                self._conn.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+                                   (path, stat.st_size, stat.st_mtime_ns,
+                                    serialization.dumps(chunks).decode("utf-8")))
+            self._conn.executemany("DELETE FROM files WHERE path = ?",
+                                   [(path,) for path in known if path not in seen])
+            self._conn.commit()
+
+    def _files(self) -> Dict[str, List[List]]:
+        with self._lock:
+            return {path: serialization.loads(chunks) for path, chunks in
+                    self._conn.execute("SELECT path, chunks FROM files")}
+
+    @staticmethod
+    def _checkpoint_of(path: str) -> str:
+        first = path.split(os.sep, 1)[0]
+        return first[:-5] if first.endswith(".ckpt") else first
+
+    def _chunk_index(self) -> Dict[str, Tuple[str, int, int]]:
+        """Chunk -> (arquivo local, posição, tamanho), para reaproveitar dados locais"""
+        index = {}
+        for path, chunks in self._files().items():
+            offset = 0
+            for digest, length in chunks:
+                index.setdefault(digest, (path, offset, length))
+                offset += length
+        return index
+
+    # --- Métodos atendidos para o outro nó ---
+
+    def summary(self) -> Dict:
+        """Registro, digest de cada checkpoint e digest de cada dia do histórico"""
+        self.scan()
+        by_checkpoint = defaultdict(list)
+        for path, chunks in sorted(self._files().items()):
+            by_checkpoint[self._checkpoint_of(path)].append(
+                f"{path}:{','.join(digest for digest, _ in chunks)}"
+            )
+        days = defaultdict(list)
+        for day, key in self._history_rows_keys():
+            days[day].append(key)
+        return {
+            "registry": self.checkpoints.checkpoints["checkpoints"],
+            "checkpoints": {cid: hashlib.sha256("\n".join(entries).encode()).hexdigest()
+                            for cid, entries in by_checkpoint.items()},
+            "history": {day: hashlib.sha256("".join(sorted(keys)).encode()).hexdigest()
+                        for day, keys in days.items()},
+        }
+
+    def checkpoint_manifest(self, checkpoint_ids: List[str]) -> Dict[str, List[List]]:
+        """Arquivos (caminho relativo a data/) e chunks dos checkpoints pedidos"""
+        wanted = set(checkpoint_ids)
+        return {path: chunks for path, chunks in self._files().items()
+                if self._checkpoint_of(path) in wanted}
+
+    def get_chunks(self, digests: List[str]) -> List[bytes]:
+        """Conteúdo dos chunks pedidos, na mesma ordem"""
+        index = self._chunk_index()
+        result = []
+        for digest in digests:
+            path, offset, length = index[digest]
+            with open(os.path.join(self.data_directory, path), "rb") as f:
+                f.seek(offset)
+                result.append(f.read(length))
+        return result
+
+    def _history_rows_keys(self) -> Iterator[Tuple[str, str]]:
+        if not os.path.exists(self.db_path):
+            return
+        conn = sqlite3.connect(self.db_path)
+        try:
+            for role, content, timestamp in conn.execute(
+                    "SELECT role, content, timestamp FROM chat_history"):
+                yield str(timestamp)[:10], _history_key(role, content, str(timestamp))
+        except sqlite3.OperationalError:
+            return  # Tabela ainda não criada
+        finally:
+            conn.close()
+
+    def history_keys(self, days: List[str]) -> Dict[str, List[str]]:
+        """Chaves das mensagens dos dias pedidos"""
+        wanted = set(days)
+        keys = defaultdict(list)
+        for day, key in self._history_rows_keys():
+            if day in wanted:
+                keys[day].append(key)
+        return keys
+
+    def history_rows(self, keys: List[str]) -> List[List[str]]:
+        """Mensagens (role, content, timestamp) com as chaves pedidas"""
+        wanted = set(keys)
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return [[role, content, str(timestamp)] for role, content, timestamp in conn.execute(
+                        "SELECT role, content, timestamp FROM chat_history ORDER BY id")
+                    if _history_key(role, content, str(timestamp)) in wanted]
+        finally:
+            conn.close()
+
+    # --- Pull ---
+
+    def _fetch_checkpoint(self, transport, checkpoint_id: str, manifest: Dict[str, List[List]],
+                          index: Dict[str, Tuple[str, int, int]], stats: Dict[str, int]):
+        """
+        Monta os arquivos de um checkpoint com chunks locais e os que faltarem
+
+        Os chunks do checkpoint montado entram em index: checkpoints seguidos
+        quase iguais só recebem, cada um, o que mudou em relação ao anterior.
+        """
+        missing = list(dict.fromkeys(
+            digest for chunks in manifest.values() for digest, _ in chunks if digest not in index
+        ))
+        lengths = {digest: length for chunks in manifest.values() for digest, length in chunks}
+        fetched: Dict[str, bytes] = {}
+        batch, batch_bytes = [], 0
+        for digest in missing + [None]:
+            if digest is not None:
+                batch.append(digest)
+                batch_bytes += lengths[digest]
+            if batch and (digest is None or batch_bytes >= FETCH_BATCH_BYTES):
+                for requested, data in zip(batch, transport.call("get_chunks", batch)):
+                    if hashlib.sha256(data).hexdigest() != requested:
+                        raise ValueError(f"Chunk corrompido recebido: {requested[:12]}")
+                    fetched[requested] = data
+                batch, batch_bytes = [], 0
+        stats["chunks_fetched"] += len(missing)
+        stats["chunks_reused"] += sum(len(c) for c in manifest.values()) - len(missing)
+
+        staging = os.path.join(self.data_directory, f".sync-{checkpoint_id}")
+        shutil.rmtree(staging, ignore_errors=True)
+        for path, chunks in manifest.items():
+            target = os.path.join(staging, path)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, "wb") as out:
+                for digest, length in chunks:
+                    if digest in fetched:
+                        out.write(fetched[digest])
+                        continue
+                    source, offset, _ = index[digest]
+                    with open(os.path.join(self.data_directory, source), "rb") as f:
+                        f.seek(offset)
+                        out.write(f.read(length))
+            stats["files"] += 1
+
+        # O checkpoint aparece inteiro ou não aparece
+        for name in os.listdir(staging):
+            os.replace(os.path.join(staging, name), os.path.join(self.data_directory, name))
+        os.rmdir(staging)
+        for path, chunks in manifest.items():
+            offset = 0
+            for digest, length in chunks:
+                index.setdefault(digest, (path, offset, length))
+                offset += length
+
+    def _merge_history(self, transport, remote_days: Dict[str, str], stats: Dict[str, int]):
+        local = self.summary_history()
+        days = [day for day, digest in remote_days.items() if local.get(day) != digest]
+        if not days:
+            return
+        local_keys = {key for keys in self.history_keys(days).values() for key in keys}
+        missing = [key for keys in transport.call("history_keys", days).values()
+                   for key in keys if key not in local_keys]
+        if not missing:
+            return
+        rows = transport.call("history_rows", missing)
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.execute('''CREATE TABLE IF NOT EXISTS chat_history
+                            (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                             role TEXT NOT NULL,
+                             content TEXT NOT NULL,
+                             timestamp DATETIME DEFAULT CURRENT_TIMESTAMP)''')
+            conn.executemany("INSERT INTO chat_history (role, content, timestamp) VALUES (?, ?, ?)",
+                             [tuple(row) for row in rows])
+            conn.commit()
+        finally:
+            conn.close()
+        stats["messages"] += len(rows)
+
+    def summary_history(self) -> Dict[str, str]:
+        days = defaultdict(list)
+        for day, key in self._history_rows_keys():
+            days[day].append(key)
+        return {day: hashlib.sha256("".join(sorted(keys)).encode()).hexdigest()
+                for day, keys in days.items()}
+
+    def pull(self, transport) -> Tuple[bool, str]:
+        """
+        Traz do outro nó os checkpoints e mensagens que faltam aqui
+
+        Returns:
+            tuple: (sucesso, mensagem com o resumo da transferência)
+        """
+        try:
+            start = time.perf_counter()
+            stats = defaultdict(int)
+            self.scan()
+            remote = transport.call("summary")
+
+            local_ids = {self._checkpoint_of(path) for path in self._files()}
+            new_ids = [cid for cid in remote["checkpoints"]
+                       if cid not in local_ids and _CHECKPOINT_ID.match(cid)]
+            if new_ids:
+                manifests = transport.call("checkpoint_manifest", new_ids)
+                grouped = defaultdict(dict)
+                for path, chunks in manifests.items():
+                    normalized = os.path.normpath(path)
+                    if os.path.isabs(normalized) or normalized.startswith(".."):
+                        raise ValueError(f"Caminho inválido no manifesto: {path}")
+                    grouped[self._checkpoint_of(normalized)][normalized] = chunks
+                index = self._chunk_index()
+                for checkpoint_id in new_ids:
+                    self._fetch_checkpoint(transport, checkpoint_id, grouped[checkpoint_id], index, stats)
+                self.scan()
+
+            # Só entram no registro checkpoints cujos dados existem aqui
+            available = {self._checkpoint_of(path) for path in self._files()}
+            added = self.checkpoints.merge_registry(
+                [entry for entry in remote["registry"] if entry["id"] in available]
+            )
+            local_digests = self.summary()["checkpoints"]
+            conflicts = sum(1 for cid, digest in remote["checkpoints"].items()
+                            if cid in local_digests and local_digests[cid] != digest)
+
+            self._merge_history(transport, remote["history"], stats)
+
+            msg = (f"Sincronizado em {time.perf_counter() - start:.1f}s: {added} checkpoints no registro, "
+                   f"{stats['files']} arquivos ({stats['chunks_fetched']} chunks recebidos, "
+                   f"{stats['chunks_reused']} reaproveitados), {stats['messages']} mensagens; "
+                   f"{transport.bytes_received / 1024:.1f} KB recebidos")
+            if conflicts:
+                msg += f"; {conflicts} checkpoints com conteúdo diferente mantidos como estão"
+            return True, msg
+        except Exception as e:
+            with open("sync_errors.log", "a") as f:
+                f.write(f"{datetime.now()}: Erro na sincronização: {str(e)}\n")
+            return False, f"Erro na sincronização: {str(e)}"
+
+
+# --- Transportes ---
+
+def _encode(message: Dict) -> bytes:
+    # Listas de bytes (chunks) vão em binário após o cabeçalho JSON
+    payload = b""
+    result = message.get("result")
+    if isinstance(result, list) and result and all(isinstance(item, bytes) for item in result):
+        message = {"blobs": [len(item) for item in result]}
+        payload = b"".join(result)
+    header = serialization.dumps(message)
+    return zlib.compress(struct.pack(">I", len(header)) + header + payload, 6)
+
+
+def _decode(frame: bytes) -> Dict:
+    data = zlib.decompress(frame)
+    (header_length,) = struct.unpack(">I", data[:4])
+    message = serialization.loads(data[4:4 + header_length])
+    if "blobs" in message:
+        offset, blobs = 4 + header_length, []
+        for length in message.pop("blobs"):
+            blobs.append(data[offset:offset + length])
+            offset += length
+        message["result"] = blobs
+    return message
+
+
+def _dispatch(node: SyncNode, request: Dict) -> Dict:
+    method = request.get("method")
+    if method not in PEER_METHODS:
+        return {"error": f"Método desconhecido: {method}"}
+    try:
+        return {"result": getattr(node, method)(*request.get("args", []))}
+    except Exception as e:
+        return {"error": str(e)}
+
+
+class LocalTransport:
+    def __init__(self, node: SyncNode):
+        """
+        Nó em outro diretório do mesmo sistema de arquivos (ou montado)
+
+        As mensagens passam pela mesma codificação do socket, então os
+        bytes contados são os que iriam pela rede.
+        """
+        self.node = node
+        self.bytes_received = 0
+
+    def call(self, method: str, *args):
+        frame = _encode(_dispatch(self.node, {"method": method, "args": list(args)}))
+        self.bytes_received += len(frame)
+        response = _decode(frame)
+        if "error" in response:
+            raise RuntimeError(response["error"])
+        return response["result"]
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    data = bytearray()
+    while len(data) < size:
+        part = sock.recv(size - len(data))
+        if not part:
+            raise ConnectionError("Conexão encerrada pelo outro nó")
+        data += part
+    return bytes(data)
+
+
+def _send_frame(sock: socket.socket, frame: bytes):
+    sock.sendall(struct.pack(">I", len(frame)) + frame)
+
+
+def _recv_frame(sock: socket.socket) -> bytes:
+    (length,) = struct.unpack(">I", _recv_exact(sock, 4))
+    return _recv_exact(sock, length)
+
+
+class UnixSocketTransport:
+    def __init__(self, path: str, timeout: float = 60.0):
+        """Nó atendido por SyncServer em um socket Unix"""
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(path)
+        self.bytes_received = 0
+
+    def call(self, method: str, *args):
+        _send_frame(self.sock, _encode({"method": method, "args": list(args)}))
+        frame = _recv_frame(self.sock)
+        self.bytes_received += len(frame)
+        response = _decode(frame)
+        if "error" in response:
+            raise RuntimeError(response["error"])
+        return response["result"]
+
+    def close(self):
+        self.sock.close()
+
+
+class SyncServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, node: SyncNode, path: str):
+        """Atende os métodos de SyncNode em um socket Unix (acessível só pelo dono)"""
+        self.node = node
+        self.path = path
+        if os.path.exists(path):
+            os.unlink(path)
+        node_lock = threading.Lock()
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(handler):
+                while True:
+                    try:
+                        request = _decode(_recv_frame(handler.request))
+                    except (ConnectionError, OSError):
+                        return
+                    with node_lock:
+                        response = _dispatch(node, request)
+                    _send_frame(handler.request, _encode(response))
+
+        old_umask = os.umask(0o177)
+        try:
+            super().__init__(path, Handler)
+        finally:
+            os.umask(old_umask)
+
+    def start(self) -> "SyncServer":
+        threading.Thread(target=self.serve_forever, name="sync-server", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+def open_transport(target: str, db_path: Optional[str] = None):
+    """
+    Cria o transporte para o alvo informado
+
+    Args:
+        target: "unix:/caminho.sock" ou o diretório de checkpoints do outro nó
+        db_path: Banco do outro nó (transporte local; padrão: chat_history.db
+            ao lado do diretório de checkpoints)
+    """
+    if target.startswith("unix:"):
+        return UnixSocketTransport(target[5:])
+    if not os.path.isdir(target):
+        raise ValueError(f"Destino de sincronização não encontrado: {target}")
+    db_path = db_path or os.path.join(os.path.dirname(os.path.abspath(target)), "chat_history.db")
+    return LocalTransport(SyncNode(CheckpointManager(target), db_path))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Sincroniza checkpoints e histórico entre hosts")
+    parser.add_argument("action", choices=["serve", "pull"])
+    parser.add_argument("target", nargs="?", help="unix:/caminho.sock ou diretório de checkpoints (pull)")
+    parser.add_argument("--checkpoints", default=os.path.join(base_dir, "checkpoints"))
+    parser.add_argument("--db", default=os.path.join(base_dir, "chat_history.db"))
+    parser.add_argument("--remote-db", help="Banco do outro nó (transporte local)")
+    parser.add_argument("--socket", default=os.path.join(base_dir, "sync.sock"))
+    args = parser.parse_args()
+
+    node = SyncNode(CheckpointManager(args.checkpoints), args.db)
+    if args.action == "serve":
+        server = SyncServer(node, args.socket)
+        print(f"Atendendo sincronização em unix:{args.socket}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.stop()
+    else:
+        if not args.target:
+            parser.error("informe o alvo do pull")
+        ok, message = node.pull(open_transport(args.target, args.remote_db))
+        print(message)
+        raise SystemExit(0 if ok else 1)
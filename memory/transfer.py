@@ -0,0 +1,230 @@
+import base64
+import gzip
+import io
+import json
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+from typing import Tuple
+
+import numpy as np
+
+# Versão do formato de exportação
+FORMAT_VERSION = 1
+
+
+def open_stream(path: str, mode: str):
+    """
+    Abre um arquivo JSONL em modo texto, comprimido conforme a extensão
+
+    .zst usa zstandard (multithread), .gz usa gzip; outras extensões ficam
+    sem compressão.
+
+    Args:
+        path: Caminho do arquivo
+        mode: "r" ou "w"
+    """
+    if path.endswith(".zst"):
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError("Pacote zstandard não instalado; use um arquivo .gz")
+        raw = open(path, mode + "b")
+        if mode == "w":
+            stream = zstandard.ZstdCompressor(level=3, threads=-1).stream_writer(raw, closefd=True)
+        else:
+            stream = zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+        return io.TextIOWrapper(stream, encoding="utf-8")
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8", compresslevel=6)
+    return open(path, mode, encoding="utf-8")
+
+
+def _encode_vector(vector) -> str:
+    return base64.b64encode(np.asarray(vector, dtype="<f4").tobytes()).decode("ascii")
+
+
+def _decode_vector(data: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(data), dtype="<f4")
+
+
+def _model_id(vector_memory):
+    return getattr(getattr(vector_memory, "embedding_function", None), "model_id", None)
+
+
+def export_history(db_path: str, out_path: str, vector_memory=None,
+                   include_embeddings: bool = False, batch_size: int = 2000) -> Tuple[bool, str]:
+    """
+    Exporta o histórico do chat (e opcionalmente a memória vetorial) em JSONL
+
+    As linhas são lidas e gravadas em lotes, com memória constante
+    independente do tamanho do histórico.
+
+    Args:
+        db_path: Banco SQLite com a tabela chat_history
+        out_path: Arquivo de saída (.jsonl, .jsonl.gz ou .jsonl.zst)
+        vector_memory: Memória vetorial a exportar junto
+        include_embeddings: Se inclui os documentos e embeddings da memória vetorial
+        batch_size: Linhas por lote
+
+    Returns:
+        tuple: (sucesso, mensagem)
+    """
+    try:
+        messages = vectors = 0
+        with closing(sqlite3.connect(db_path)) as conn:
+            with open_stream(out_path, "w") as out:
+                out.write(json.dumps({
+                    "type": "header",
+                    "version": FORMAT_VERSION,
+                    "created_at": datetime.now().isoformat(),
+                    "embeddings": bool(include_embeddings and vector_memory),
+                    "model_id": _model_id(vector_memory)
+                }) + "\n")
+
+                cursor = conn.execute(
+                    "SELECT id, role, content, timestamp FROM chat_history ORDER BY id"
+                )
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    out.write("".join(
+                        json.dumps({"type": "message", "id": row[0], "role": row[1],
+                                    "content": row[2], "timestamp": row[3]},
+                                   ensure_ascii=False) + "\n"
+                        for row in rows
+                    ))
+                    messages += len(rows)
+
+                if include_embeddings and vector_memory is not None:
+                    for ids, documents, metadatas, embeddings in vector_memory.iter_documents(
+                            batch_size, include_embeddings=True):
+                        out.write("".join(
+                            json.dumps({"type": "vector", "id": id, "document": doc,
+                                        "metadata": meta, "embedding": _encode_vector(vector)},
+                                       ensure_ascii=False) + "\n"
+                            for id, doc, meta, vector in zip(ids, documents, metadatas, embeddings)
+                        ))
+                        vectors += len(ids)
+        return True, f"Exportadas {messages} mensagens e {vectors} vetores para {out_path}"
+    except Exception as e:
+        return False, f"Erro ao exportar histórico: {str(e)}"
+
+
+def import_history(db_path: str, in_path: str, vector_memory=None,
+                   batch_size: int = 2000) -> Tuple[bool, str]:
+    """
+    Importa um arquivo gerado por export_history
+
+    Mensagens entram no chat_history com inserções em lote (novos ids,
+    timestamps preservados); vetores são gravados em lote na memória
+    vetorial, substituindo ids existentes. Vetores de outro modelo de
+    embeddings são ignorados.
+
+    Como as mensagens recebem novos ids, importar o mesmo arquivo duas
+    vezes duplica as linhas do chat_history.
+
+    Args:
+        db_path: Banco SQLite com a tabela chat_history
+        in_path: Arquivo exportado
+        vector_memory: Memória vetorial de destino dos vetores
+        batch_size: Linhas por lote
+
+    Returns:
+        tuple: (sucesso, mensagem)
+    """
+    try:
+        messages = vectors = skipped = 0
+        with closing(sqlite3.connect(db_path)) as conn:
+            # Permite importar num host novo, antes da primeira execução do chat
+            conn.execute('''CREATE TABLE IF NOT EXISTS chat_history
+                            (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                             role TEXT NOT NULL,
+                             content TEXT NOT NULL,
+                             timestamp DATETIME DEFAULT CURRENT_TIMESTAMP)''')
+            with open_stream(in_path, "r") as source:
+                header = json.loads(source.readline() or "{}")
+                if header.get("type") != "header":
+                    return False, "Arquivo de exportação inválido: cabeçalho ausente"
+                if header.get("version", 0) > FORMAT_VERSION:
+                    return False, f"Versão {header['version']} do formato não suportada"
+
+                accept_vectors = vector_memory is not None
+                model_id = _model_id(vector_memory)
+                if accept_vectors and header.get("model_id") and model_id \
+                        and header["model_id"] != model_id:
+                    accept_vectors = False
+
+                message_batch, vector_batch = [], []
+
+                def flush_messages():
+                    conn.executemany(
+                        "INSERT INTO chat_history (role, content, timestamp) VALUES (?, ?, ?)",
+                        message_batch
+                    )
+                    conn.commit()
+                    message_batch.clear()
+
+                def flush_vectors():
+                    vector_memory.add_embeddings(
+                        [v["document"] for v in vector_batch],
+                        [v["metadata"] for v in vector_batch],
+                        [v["id"] for v in vector_batch],
+                        np.vstack([_decode_vector(v["embedding"]) for v in vector_batch])
+                    )
+                    vector_batch.clear()
+
+                for line in source:
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    if record["type"] == "message":
+                        message_batch.append((record["role"], record["content"], record["timestamp"]))
+                        messages += 1
+                        if len(message_batch) >= batch_size:
+                            flush_messages()
+                    elif record["type"] == "vector":
+                        if not accept_vectors:
+                            skipped += 1
+                            continue
+                        vector_batch.append(record)
+                        vectors += 1
+                        if len(vector_batch) >= batch_size:
+                            flush_vectors()
+
+                if message_batch:
+                    flush_messages()
+                if vector_batch:
+                    flush_vectors()
+
+        msg = f"Importadas {messages} mensagens e {vectors} vetores de {in_path}"
+        if skipped:
+            msg += f" ({skipped} vetores ignorados: modelo de embeddings diferente ou sem memória vetorial)"
+        return True, msg
+    except Exception as e:
+        return False, f"Erro ao importar histórico: {str(e)}"
+
+
+if __name__ == "__main__":
+    # Uso: python -m memory.transfer export|import <banco.db> <arquivo> [--vectors <dir>]
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Exporta/importa o histórico do chat")
+    parser.add_argument("action", choices=["export", "import"])
+    parser.add_argument("db_path")
+    parser.add_argument("path")
+    parser.add_argument("--vectors", help="Diretório da memória vetorial (ex: chroma_db)")
+    args = parser.parse_args()
+
+    memory = None
+    if args.vectors:
+        from memory.backends import create_vector_memory
+        memory = create_vector_memory(args.vectors)
+
+    if args.action == "export":
+        ok, message = export_history(args.db_path, args.path, memory, include_embeddings=bool(memory))
+    else:
+        ok, message = import_history(args.db_path, args.path, memory)
+    print(message)
+    raise SystemExit(0 if ok else 1)
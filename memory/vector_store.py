@@ -3,12 +3,23 @@ from chromadb.config import Settings
 import os
 from datetime import datetime
 import json
+from typing import Dict, Iterator, List, Optional, Tuple
+import numpy as np
+from memory.embeddings import get_embedding_provider
+from memory.mmr import MMRSettings, query_diverse
 
 class VectorMemory:
-    def __init__(self, persist_directory="./chroma_db"):
+    def __init__(self, persist_directory="./chroma_db", embedding_function=None,
+                 collection_name="chat_memory"):
         self.persist_directory = persist_directory
+        self.collection_name = collection_name
         os.makedirs(persist_directory, exist_ok=True)
         
+        # Provedor de embeddings compartilhado (EMBEDDING_PROVIDER no .env)
+        self.embedding_function = embedding_function or get_embedding_provider()
+        # Re-ranqueamento MMR do contexto (CONTEXT_MMR=1)
+        self.mmr = MMRSettings.from_env()
+        
         # Inicializa o cliente Chroma com persistência
         self.client = chromadb.Client(Settings(
             persist_directory=persist_directory,
@@ -16,26 +27,12 @@ class VectorMemory:
             anonymized_telemetry=False
         ))
         
-        # Cria ou recupera a coleção de mensagens
+        # Cria ou recupera a coleção (mensagens do chat por padrão)
         self.collection = self.client.get_or_create_collection(
-            name="chat_memory",
-            metadata={"hnsw:space": "cosine"}
+            name=collection_name,
+            metadata={"hnsw:space": "cosine"},
+            embedding_function=self.embedding_function
         )
-        
-        # Debug: lista todas as mensagens ao inicializar
-        try:
-            all_messages = self.collection.get()
-            with open("chroma_debug.log", "a") as f:
-                f.write(f"\n=== Inicializando VectorMemory ===\n")
-                f.write(f"Diretório: {persist_directory}\n")
-                f.write(f"Total de mensagens: {len(all_messages['ids']) if all_messages['ids'] else 0}\n")
-                if all_messages['ids']:
-                    for i, (doc, meta, id) in enumerate(zip(all_messages['documents'], all_messages['metadatas'], all_messages['ids'])):
-                        f.write(f"{i+1}. ID: {id}, Role: {meta['role']}, Content: {doc}\n")
-                f.write("\n---\n")
-        except Exception as e:
-            with open("chroma_errors.log", "a") as f:
-                f.write(f"{datetime.now()}: Erro ao inicializar: {str(e)}\n")
 
     def add_message(self, role, content, metadata=None):
         """Adiciona uma mensagem ao Chroma"""
@@ -78,6 +75,13 @@ class VectorMemory:
     def search_context(self, query, n_results=5):
         """Busca mensagens relevantes para o contexto atual"""
         try:
+            # Com MMR, candidatos quase repetidos dão lugar a mensagens diversas
+            if self.mmr:
+                return [
+                    f"{'Usuário: ' if meta['role'] == 'user' else 'Assistente: '}{doc}"
+                    for doc, meta in query_diverse(self, query, n_results, self.mmr)
+                ]
+            
             # Debug: lista todas as mensagens antes da busca
             with open("chroma_debug.log", "a") as f:
                 f.write(f"\nBuscando contexto para: {query}\n")
@@ -116,6 +120,71 @@ class VectorMemory:
                 f.write(f"{datetime.now()}: Erro na busca: {str(e)}\n")
             return []
     
+    def add_documents(self, documents: List[str], metadatas: List[Dict], ids: List[str]):
+        """Adiciona documentos com ids próprios (ex: trechos de arquivos)"""
+        if documents:
+            self.collection.add(documents=documents, metadatas=metadatas, ids=ids)
+
+    def delete_documents(self, ids: List[str]):
+        """Remove documentos pelo id"""
+        if ids:
+            self.collection.delete(ids=ids)
+
+    def query_documents(self, query: str, n_results: int = 5) -> List[Tuple[str, Dict]]:
+        """Busca os documentos mais similares, como pares (documento, metadados)"""
+        total = self.collection.count()
+        if not total:
+            return []
+        results = self.collection.query(query_texts=[query], n_results=min(n_results, total))
+        if not results['documents'] or not results['documents'][0]:
+            return []
+        return list(zip(results['documents'][0], results['metadatas'][0]))
+    
+    def query_candidates(self, query: str, n_results: int
+                         ) -> Tuple[Optional[np.ndarray], List[Tuple[str, Dict]], np.ndarray]:
+        """Como query_documents, devolvendo também a consulta e os embeddings (para o MMR)"""
+        total = self.collection.count()
+        if not total:
+            return None, [], np.empty((0, 0), dtype=np.float32)
+        query_vector = np.asarray(self.embedding_function([query])[0], dtype=np.float32)
+        results = self.collection.query(
+            query_embeddings=[query_vector.tolist()],
+            n_results=min(n_results, total),
+            include=["documents", "metadatas", "embeddings"]
+        )
+        if not results['documents'] or not results['documents'][0]:
+            return query_vector, [], np.empty((0, 0), dtype=np.float32)
+        return (query_vector,
+                list(zip(results['documents'][0], results['metadatas'][0])),
+                np.asarray(results['embeddings'][0], dtype=np.float32))
+    
+    def add_embeddings(self, documents: List[str], metadatas: List[Dict], ids: List[str],
+                       embeddings) -> None:
+        """Grava documentos com embeddings já calculados, substituindo ids existentes"""
+        if not documents:
+            return
+        embeddings = [list(map(float, e)) for e in embeddings]
+        upsert = getattr(self.collection, "upsert", None)
+        if upsert is not None:
+            upsert(documents=documents, metadatas=metadatas, ids=ids, embeddings=embeddings)
+        else:
+            self.collection.delete(ids=ids)
+            self.collection.add(documents=documents, metadatas=metadatas, ids=ids,
+                                embeddings=embeddings)
+
+    def iter_documents(self, batch_size: int = 1000, include_embeddings: bool = False
+                       ) -> Iterator[Tuple[List[str], List[str], List[Dict], Optional[list]]]:
+        """Percorre os documentos em lotes: (ids, documentos, metadados, embeddings)"""
+        include = ["documents", "metadatas"] + (["embeddings"] if include_embeddings else [])
+        offset = 0
+        while True:
+            batch = self.collection.get(limit=batch_size, offset=offset, include=include)
+            if not batch['ids']:
+                return
+            yield (batch['ids'], batch['documents'], batch['metadatas'],
+                   batch['embeddings'] if include_embeddings else None)
+            offset += len(batch['ids'])
+    
     def archive_messages(self, messages):
         """Arquiva mensagens antigas no Chroma"""
         for role, content in messages:
@@ -123,8 +192,9 @@ class VectorMemory:
     
     def clear(self):
         """Limpa todas as mensagens do Chroma"""
-        self.client.delete_collection("chat_memory")
+        self.client.delete_collection(self.collection_name)
         self.collection = self.client.get_or_create_collection(
-            name="chat_memory",
-            metadata={"hnsw:space": "cosine"}
+            name=self.collection_name,
+            metadata={"hnsw:space": "cosine"},
+            embedding_function=self.embedding_function
         )
@@ -0,0 +1,239 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from memory.backends import create_vector_memory
+
+# Diretórios que nunca são indexados
+IGNORED_DIRS = {".git", "__pycache__", "node_modules", ".venv", "venv"}
+
+
+class WorkspaceIndexer:
+    COLLECTION = "workspace"
+
+    def __init__(self, workspace_dir: str, index_dir: str, vector_memory=None,
+                 chunk_lines: int = 40, overlap: int = 5, max_file_bytes: int = 1_000_000):
+        """
+        Índice incremental dos arquivos do workspace
+
+        Cada arquivo é registrado com mtime, tamanho e hash; só os arquivos
+        novos ou alterados são divididos em trechos e têm os embeddings
+        recalculados, numa coleção própria separada do histórico do chat.
+
+        Args:
+            workspace_dir: Diretório indexado
+            index_dir: Diretório do índice (fora dos checkpoints do chat)
+            vector_memory: Coleção de destino (padrão: create_vector_memory)
+            chunk_lines: Linhas por trecho
+            overlap: Linhas repetidas entre trechos consecutivos
+            max_file_bytes: Arquivos maiores são ignorados
+        """
+        self.workspace_dir = os.path.abspath(workspace_dir)
+        self.index_dir = index_dir
+        self.chunk_lines = chunk_lines
+        self.overlap = overlap
+        self.max_file_bytes = max_file_bytes
+        os.makedirs(index_dir, exist_ok=True)
+
+        self.vector_memory = vector_memory or create_vector_memory(
+            index_dir, collection_name=self.COLLECTION
+        )
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            os.path.join(index_dir, "manifest.db"), check_same_thread=False
+        )
+        self._conn.execute('''CREATE TABLE IF NOT EXISTS files
+                              (path TEXT PRIMARY KEY,
+                               mtime_ns INTEGER NOT NULL,
+                               size INTEGER NOT NULL,
+                               sha256 TEXT NOT NULL,
+                               chunks INTEGER NOT NULL)''')
+        self._conn.commit()
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {"scans": 0, "indexed": 0, "unchanged": 0, "removed": 0}
+
+    def _chunk(self, relpath: str, text: str) -> Tuple[List[str], List[Dict]]:
+        """Divide o arquivo em trechos de linhas com sobreposição"""
+        lines = text.splitlines()
+        step = max(1, self.chunk_lines - self.overlap)
+        documents, metadatas = [], []
+        for start in range(0, max(len(lines), 1), step):
+            chunk = lines[start:start + self.chunk_lines]
+            if not any(line.strip() for line in chunk):
+                continue
+            end = start + len(chunk)
+            documents.append(f"{relpath}\n" + "\n".join(chunk))
+            metadatas.append({"path": relpath, "start_line": start + 1, "end_line": end})
+            if end >= len(lines):
+                break
+        return documents, metadatas
+
+    @staticmethod
+    def _log_error(message: str):
+        with open("workspace_errors.log", "a") as f:
+            f.write(f"{datetime.now()}: {message}\n")
+
+    @staticmethod
+    def _chunk_ids(relpath: str, count: int) -> List[str]:
+        return [f"{relpath}#{i}" for i in range(count)]
+
+    def _walk(self):
+        for root, dirs, files in os.walk(self.workspace_dir):
+            dirs[:] = [d for d in dirs if d not in IGNORED_DIRS and not d.startswith(".")]
+            for name in files:
+                if not name.startswith("."):
+                    yield os.path.join(root, name)
+
+    def _remove(self, relpath: str, chunks: int):
+        self.vector_memory.delete_documents(self._chunk_ids(relpath, chunks))
+        self._conn.execute("DELETE FROM files WHERE path = ?", (relpath,))
+
+    def _index(self, path: str, known: Optional[tuple]) -> str:
+        """
+        Atualiza um arquivo no índice
+
+        Returns:
+            str: "indexed", "unchanged" ou "removed"
+        """
+        relpath = os.path.relpath(path, self.workspace_dir)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            if known:
+                self._remove(relpath, known[3])
+                return "removed"
+            return "unchanged"
+
+        # mtime e tamanho iguais: nem lê o arquivo
+        if known and known[0] == st.st_mtime_ns and known[1] == st.st_size:
+            return "unchanged"
+
+        data = None
+        if st.st_size <= self.max_file_bytes:
+            with open(path, "rb") as f:
+                data = f.read()
+        if data is None or b"\0" in data[:8192]:
+            # Grande demais ou binário: fica fora do índice
+            if known:
+                self._remove(relpath, known[3])
+                return "removed"
+            return "unchanged"
+        digest = hashlib.sha256(data).hexdigest()
+
+        if known and known[2] == digest:
+            # Só o mtime mudou (ex: touch): mantém os embeddings
+            self._conn.execute("UPDATE files SET mtime_ns = ?, size = ? WHERE path = ?",
+                               (st.st_mtime_ns, st.st_size, relpath))
+            return "unchanged"
+
+        documents, metadatas = self._chunk(relpath, data.decode("utf-8", errors="replace"))
+        if known:
+            self.vector_memory.delete_documents(self._chunk_ids(relpath, known[3]))
+        self.vector_memory.add_documents(documents, metadatas,
+                                         self._chunk_ids(relpath, len(documents)))
+        self._conn.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)",
+                           (relpath, st.st_mtime_ns, st.st_size, digest, len(documents)))
+        return "indexed"
+
+    def _known(self) -> Dict[str, tuple]:
+        return {
+            row[0]: row[1:]
+            for row in self._conn.execute("SELECT path, mtime_ns, size, sha256, chunks FROM files")
+        }
+
+    def _rebuild_if_fragmented(self):
+        """Recria o índice quando os trechos removidos superam os ativos"""
+        deleted = getattr(self.vector_memory, "deleted", 0)
+        if deleted > max(1000, getattr(self.vector_memory, "live", 0)):
+            self.vector_memory.clear()
+            self._conn.execute("DELETE FROM files")
+            self._conn.commit()
+
+    def scan(self) -> Dict[str, int]:
+        """
+        Percorre o workspace e atualiza apenas o que mudou
+
+        Returns:
+            Dict[str, int]: Arquivos indexados, inalterados e removidos
+        """
+        result = {"indexed": 0, "unchanged": 0, "removed": 0}
+        with self._lock:
+            try:
+                self._rebuild_if_fragmented()
+                known = self._known()
+                for path in self._walk():
+                    relpath = os.path.relpath(path, self.workspace_dir)
+                    try:
+                        result[self._index(path, known.pop(relpath, None))] += 1
+                    except Exception as e:
+                        self._log_error(f"Erro ao indexar {relpath}: {str(e)}")
+                for relpath, entry in known.items():
+                    self._remove(relpath, entry[3])
+                    result["removed"] += 1
+            except Exception as e:
+                self._log_error(f"Erro ao indexar workspace: {str(e)}")
+            finally:
+                self._conn.commit()
+        self.stats["scans"] += 1
+        for key, value in result.items():
+            self.stats[key] += value
+        return result
+
+    def index_file(self, path: str) -> str:
+        """Atualiza imediatamente um arquivo (ex: logo após criá-lo)"""
+        relpath = os.path.relpath(os.path.abspath(path), self.workspace_dir)
+        with self._lock:
+            try:
+                known = self._conn.execute(
+                    "SELECT mtime_ns, size, sha256, chunks FROM files WHERE path = ?", (relpath,)
+                ).fetchone()
+                status = self._index(os.path.join(self.workspace_dir, relpath), known)
+                self._conn.commit()
+                return status
+            except Exception as e:
+                self._log_error(f"Erro ao indexar {relpath}: {str(e)}")
+                return "unchanged"
+
+    def search(self, query: str, n_results: int = 3) -> List[str]:
+        """
+        Busca os trechos do workspace relevantes para a pergunta
+
+        Returns:
+            List[str]: Trechos formatados com caminho e linhas
+        """
+        try:
+            snippets = []
+            for doc, meta in self.vector_memory.query_documents(query, n_results):
+                code = doc.split("\n", 1)[1] if "\n" in doc else ""
+                snippets.append(
+                    f"{meta['path']} (linhas {meta['start_line']}-{meta['end_line']}):\n{code}"
+                )
+            return snippets
+        except Exception as e:
+            self._log_error(f"Erro na busca do workspace: {str(e)}")
+            return []
+
+    def start(self, interval: float = 10.0):
+        """Reindexa em segundo plano a cada interval segundos"""
+        if self._thread is not None:
+            return
+
+        def loop():
+            while not self._stop.is_set():
+                self.scan()
+                self._stop.wait(interval)
+
+        self._thread = threading.Thread(target=loop, name="workspace-index", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Interrompe a reindexação em segundo plano"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,112 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+
+class Stage:
+    def __init__(self, name: str, func: Callable[[Dict[str, Any]], Any],
+                 deps: Iterable[str] = (), background: bool = False):
+        """
+        Etapa de um turno do assistente
+
+        Args:
+            name: Nome único da etapa
+            func: Recebe um dicionário com os resultados das dependências
+            deps: Etapas que precisam terminar antes desta
+            background: Se True, o turno não espera esta etapa terminar
+        """
+        self.name = name
+        self.func = func
+        self.deps = list(deps)
+        self.background = background
+
+
+class TurnPipeline:
+    def __init__(self, max_workers: int = 4):
+        """
+        Executa as etapas de um turno como um pequeno grafo de dependências
+
+        Etapas independentes rodam em paralelo num pool de threads; etapas
+        em segundo plano terminam depois do retorno e são aguardadas por
+        drain() antes do próximo turno.
+
+        Args:
+            max_workers: Threads do pool
+        """
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="turn")
+        self.last_timings: Dict[str, float] = {}
+        self._pending: List[Future] = []
+        self._lock = threading.Lock()
+
+    def _run_stage(self, stage: Stage, futures: Dict[str, Future]) -> Any:
+        results = {dep: futures[dep].result() for dep in stage.deps}
+        start = time.perf_counter()
+        try:
+            return stage.func(results)
+        finally:
+            with self._lock:
+                self.last_timings[stage.name] = time.perf_counter() - start
+
+    def run(self, stages: List[Stage], cancel: Optional[threading.Event] = None) -> Dict[str, Any]:
+        """
+        Executa as etapas, em ordem topológica
+
+        Args:
+            stages: Etapas do turno; dependências devem vir antes
+            cancel: Sinalizado em um Ctrl-C durante a espera; as etapas que o
+                observam terminam logo e o erro delas substitui o
+                KeyboardInterrupt. Sem ele, o Ctrl-C é propagado.
+
+        Returns:
+            Dict[str, Any]: Resultado de cada etapa que não é de segundo plano
+        """
+        futures: Dict[str, Future] = {}
+        with self._lock:
+            self.last_timings = {}
+        for stage in stages:
+            missing = [dep for dep in stage.deps if dep not in futures]
+            if missing:
+                raise ValueError(f"Etapa '{stage.name}' depende de etapas desconhecidas: {missing}")
+            futures[stage.name] = self.executor.submit(self._run_stage, stage, futures)
+
+        for stage in stages:
+            if stage.background:
+                futures[stage.name].add_done_callback(self._log_failure(stage.name, cancel))
+                with self._lock:
+                    self._pending.append(futures[stage.name])
+
+        def results():
+            return {
+                stage.name: futures[stage.name].result()
+                for stage in stages if not stage.background
+            }
+
+        try:
+            return results()
+        except KeyboardInterrupt:
+            if cancel is None:
+                raise
+            cancel.set()
+            return results()
+
+    @staticmethod
+    def _log_failure(name: str, cancel: Optional[threading.Event] = None):
+        def callback(future: Future):
+            error = future.exception()
+            # Num turno cancelado, etapas que dependem da resposta falham por isso
+            if error is not None and not (cancel is not None and cancel.is_set()):
+                with open("pipeline_errors.log", "a") as f:
+                    f.write(f"{datetime.now()}: Erro na etapa '{name}': {str(error)}\n")
+        return callback
+
+    def drain(self):
+        """Aguarda as etapas em segundo plano dos turnos anteriores"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        for future in pending:
+            try:
+                future.result()
+            except Exception:
+                pass  # Já registrado em pipeline_errors.log
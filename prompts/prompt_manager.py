@@ -1,50 +1,121 @@
 import os
-import json
-from typing import Dict, Optional
+import string
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set
+from memory import serialization
+
+class CompiledPrompt:
+    def __init__(self, name: str, data: dict, mtime_ns: int):
+        """Prompt pré-processado: campos exigidos e partes estáticas prontas"""
+        self.name = name
+        self.data = data
+        self.mtime_ns = mtime_ns
+        self.system = data.get('system', '')
+        self.template = data.get('template', '')
+        self.fields = self._parse_fields(self.template)
+        # Resultado sem argumentos não muda até o arquivo mudar
+        self.static = {'system': self.system, 'template': self.template}
+        self.rendered: "OrderedDict[tuple, Dict[str, str]]" = OrderedDict()
+
+    @staticmethod
+    def _parse_fields(template: str) -> Set[str]:
+        fields = set()
+        for _, field, _, _ in string.Formatter().parse(template):
+            if field:
+                fields.add(field.split('.')[0].split('[')[0])
+        return fields
 
 class PromptManager:
-    def __init__(self, prompts_dir: str = None):
-        """Inicializa o gerenciador de prompts"""
+    # Renderizações guardadas por prompt
+    RENDER_CACHE_SIZE = 64
+
+    def __init__(self, prompts_dir: str = None, reload_interval: float = 1.0):
+        """
+        Inicializa o gerenciador de prompts
+
+        Os arquivos são lidos apenas no primeiro uso e recarregados quando
+        o mtime muda, verificado no máximo a cada reload_interval segundos.
+        """
         if prompts_dir is None:
             prompts_dir = os.path.dirname(os.path.abspath(__file__))
         self.prompts_dir = prompts_dir
+        self.reload_interval = reload_interval
         self.prompts: Dict[str, dict] = {}
-        self.load_prompts()
-    
+        self._compiled: Dict[str, CompiledPrompt] = {}
+        self._last_check: Dict[str, float] = {}
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.prompts_dir, f"{name}.json")
+
+    def _load(self, name: str) -> Optional[CompiledPrompt]:
+        """Carrega o prompt se ainda não carregado ou se o arquivo mudou"""
+        compiled = self._compiled.get(name)
+        now = time.monotonic()
+        if compiled and now - self._last_check.get(name, 0) < self.reload_interval:
+            return compiled
+        self._last_check[name] = now
+
+        try:
+            mtime_ns = os.stat(self._path(name)).st_mtime_ns
+        except OSError:
+            self._compiled.pop(name, None)
+            self.prompts.pop(name, None)
+            return None
+        if compiled and compiled.mtime_ns == mtime_ns:
+            return compiled
+
+        data = serialization.load(self._path(name))
+        compiled = CompiledPrompt(name, data, mtime_ns)
+        self._compiled[name] = compiled
+        self.prompts[name] = data
+        return compiled
+
     def load_prompts(self):
         """Carrega todos os prompts do diretório"""
-        for filename in os.listdir(self.prompts_dir):
-            if filename.endswith('.json'):
-                prompt_name = filename[:-5]  # Remove .json
-                filepath = os.path.join(self.prompts_dir, filename)
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    self.prompts[prompt_name] = json.load(f)
-    
+        for name in self.list_prompts():
+            self._load(name)
+
     def get_prompt(self, name: str, **kwargs) -> Optional[str]:
         """Obtém um prompt específico e formata com os argumentos fornecidos"""
-        if name not in self.prompts:
+        compiled = self._load(name)
+        if compiled is None:
+            return None
+
+        if not kwargs:
+            return dict(compiled.static)
+
+        missing = compiled.fields - kwargs.keys()
+        if missing:
+            print(f"Erro: Argumento '{sorted(missing)[0]}' necessário para o prompt '{name}'")
             return None
-        
-        prompt_data = self.prompts[name]
-        system = prompt_data.get('system', '')
-        template = prompt_data.get('template', '')
-        
-        # Formata o template com os argumentos fornecidos
-        if kwargs:
-            try:
-                template = template.format(**kwargs)
-            except KeyError as e:
-                print(f"Erro: Argumento {e} necessário para o prompt '{name}'")
-                return None
-        
-        return {
-            'system': system,
-            'template': template
+
+        # Reaproveita renderizações com os mesmos argumentos
+        try:
+            key = tuple(sorted((k, kwargs[k]) for k in compiled.fields))
+            hash(key)
+        except TypeError:
+            key = None
+        if key is not None and key in compiled.rendered:
+            compiled.rendered.move_to_end(key)
+            return dict(compiled.rendered[key])
+
+        result = {
+            'system': compiled.system,
+            'template': compiled.template.format(**kwargs)
         }
-    
+        if key is not None:
+            compiled.rendered[key] = result
+            if len(compiled.rendered) > self.RENDER_CACHE_SIZE:
+                compiled.rendered.popitem(last=False)
+        return dict(result)
+
     def list_prompts(self) -> list:
         """Lista todos os prompts disponíveis"""
-        return list(self.prompts.keys())
+        return sorted(
+            filename[:-5] for filename in os.listdir(self.prompts_dir)
+            if filename.endswith('.json')
+        )
 
 # Exemplo de uso
 if __name__ == "__main__":
@@ -0,0 +1,284 @@
+"""
+Métricas do host lidas diretamente de /proc e statvfs
+
+Substitui chamadas a free, df e ps: nenhuma leitura cria processos. Cada
+grupo de métricas fica em cache por um TTL curto, e CPU, disco e rede são
+calculados como taxas a partir da diferença entre duas leituras, então o
+resumo pode ser gerado a cada turno com custo de microssegundos.
+"""
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Tamanho do setor em /proc/diskstats (fixo pelo kernel)
+SECTOR_SIZE = 512
+
+
+def _format_bytes(size: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+class SystemMetrics:
+    def __init__(self, ttl: float = 1.0, proc_root: str = "/proc", disk_path: str = "/"):
+        """
+        Leitor de métricas do host com cache e cálculo de taxas
+
+        Args:
+            ttl: Segundos em que cada grupo de métricas fica em cache
+            proc_root: Raiz do procfs
+            disk_path: Sistema de arquivos medido por disk()
+        """
+        self.ttl = ttl
+        self.proc_root = proc_root
+        self.disk_path = disk_path
+        self._cache: Dict[str, Tuple[float, Any]] = {}
+        # Última leitura bruta dos contadores, para as taxas
+        self._previous: Dict[str, Tuple[float, Any]] = {}
+        self._devices: Optional[set] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "SystemMetrics":
+        return cls(
+            ttl=float(os.getenv("SYSTEM_METRICS_TTL", "1.0")),
+            disk_path=os.getenv("SYSTEM_METRICS_DISK", "/"),
+        )
+
+    def _read(self, name: str) -> str:
+        with open(os.path.join(self.proc_root, name)) as f:
+            return f.read()
+
+    def _cached(self, key: str, func: Callable[[], Any]) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry and now - entry[0] < self.ttl:
+                return entry[1]
+        value = func()
+        with self._lock:
+            self._cache[key] = (now, value)
+        return value
+
+    def _delta(self, key: str, counters):
+        """Retorna (segundos, contadores anteriores) desde a leitura anterior"""
+        now = time.monotonic()
+        with self._lock:
+            previous = self._previous.get(key)
+            self._previous[key] = (now, counters)
+        if previous is None:
+            return None, None
+        return now - previous[0], previous[1]
+
+    def memory(self) -> Dict[str, int]:
+        """Memória e swap em bytes (/proc/meminfo)"""
+        def read():
+            info = {}
+            for line in self._read("meminfo").splitlines():
+                name, _, value = line.partition(":")
+                info[name] = int(value.split()[0]) * 1024
+            total = info.get("MemTotal", 0)
+            available = info.get("MemAvailable", info.get("MemFree", 0))
+            return {
+                "total": total, "available": available, "used": total - available,
+                "swap_total": info.get("SwapTotal", 0),
+                "swap_used": info.get("SwapTotal", 0) - info.get("SwapFree", 0),
+            }
+        return self._cached("memory", read)
+
+    def load(self) -> Dict[str, Any]:
+        """Carga média e processos (/proc/loadavg)"""
+        def read():
+            fields = self._read("loadavg").split()
+            running, _, total = fields[3].partition("/")
+            return {
+                "load": (float(fields[0]), float(fields[1]), float(fields[2])),
+                "running": int(running), "processes": int(total),
+            }
+        return self._cached("load", read)
+
+    def cpu(self) -> Dict[str, float]:
+        """
+        Uso de CPU em % desde a leitura anterior (/proc/stat)
+
+        Na primeira leitura a média é desde o boot.
+        """
+        def read():
+            fields = [int(v) for v in self._read("stat").split("\n", 1)[0].split()[1:]]
+            # user nice system idle iowait irq softirq steal (guest já está em user)
+            counters = fields[:8] + [0] * (8 - len(fields[:8]))
+            _, previous = self._delta("cpu", counters)
+            deltas = [c - p for c, p in zip(counters, previous)] if previous else counters
+            total = sum(deltas) or 1
+            idle = deltas[3] + deltas[4]
+            return {
+                "busy": 100.0 * (total - idle) / total,
+                "iowait": 100.0 * deltas[4] / total,
+                "cores": os.cpu_count() or 1,
+            }
+        return self._cached("cpu", read)
+
+    def disk(self, path: Optional[str] = None) -> Dict[str, int]:
+        """Espaço do sistema de arquivos (statvfs)"""
+        path = path or self.disk_path
+
+        def read():
+            stats = os.statvfs(path)
+            total = stats.f_blocks * stats.f_frsize
+            free = stats.f_bavail * stats.f_frsize
+            used = total - stats.f_bfree * stats.f_frsize
+            return {"path": path, "total": total, "free": free, "used": used}
+        return self._cached(f"disk:{path}", read)
+
+    def _block_devices(self) -> Optional[set]:
+        # Dispositivos inteiros (sem partições) listados em /sys/block, lidos uma vez
+        if self._devices is None:
+            try:
+                self._devices = {name for name in os.listdir("/sys/block")
+                                 if not name.startswith(("loop", "ram"))}
+            except OSError:
+                return None
+        return self._devices
+
+    def io(self) -> Dict[str, float]:
+        """Leitura e escrita em disco, em bytes/s desde a leitura anterior (/proc/diskstats)"""
+        def read():
+            devices = self._block_devices()
+            read_sectors = write_sectors = 0
+            for line in self._read("diskstats").splitlines():
+                fields = line.split()
+                if len(fields) < 10 or (devices is not None and fields[2] not in devices):
+                    continue
+                read_sectors += int(fields[5])
+                write_sectors += int(fields[9])
+            counters = (read_sectors * SECTOR_SIZE, write_sectors * SECTOR_SIZE)
+            return self._rates("io", counters, ("read", "write"))
+        return self._cached("io", read)
+
+    def net(self) -> Dict[str, float]:
+        """Tráfego de rede (sem loopback), em bytes/s desde a leitura anterior (/proc/net/dev)"""
+        def read():
+            received = sent = 0
+            for line in self._read("net/dev").splitlines()[2:]:
+                name, _, values = line.partition(":")
+                if name.strip() == "lo":
+                    continue
+                fields = values.split()
+                received += int(fields[0])
+                sent += int(fields[8])
+            return self._rates("net", (received, sent), ("rx", "tx"))
+        return self._cached("net", read)
+
+    def _rates(self, key: str, counters: Tuple[int, ...], names: Tuple[str, ...]) -> Dict[str, float]:
+        elapsed, previous = self._delta(key, counters)
+        if not previous or not elapsed:
+            return {name: 0.0 for name in names}
+        return {name: max(0, c - p) / elapsed for name, c, p in zip(names, counters, previous)}
+
+    def top_processes(self, n: int = 5) -> List[Dict[str, Any]]:
+        """
+        Processos com mais memória residente (/proc/<pid>/statm e comm)
+
+        Percorre todos os processos, então custa milissegundos: não entra
+        no resumo de cada turno.
+        """
+        page_size = os.sysconf("SC_PAGE_SIZE")
+        processes = []
+        for pid in os.listdir(self.proc_root):
+            if not pid.isdigit():
+                continue
+            try:
+                rss = int(self._read(f"{pid}/statm").split()[1]) * page_size
+                name = self._read(f"{pid}/comm").strip()
+            except (OSError, IndexError, ValueError):
+                continue  # Processo terminou durante a leitura
+            processes.append({"pid": int(pid), "name": name, "rss": rss})
+        processes.sort(key=lambda p: p["rss"], reverse=True)
+        return processes[:n]
+
+    def summary(self) -> str:
+        """Resumo de uma linha para o contexto do LLM"""
+        memory, load, cpu, disk, io = self.memory(), self.load(), self.cpu(), self.disk(), self.io()
+        return (
+            f"CPU {cpu['busy']:.0f}% ({cpu['cores']} núcleos, iowait {cpu['iowait']:.0f}%) | "
+            f"RAM {_format_bytes(memory['used'])}/{_format_bytes(memory['total'])} | "
+            f"Disco {disk['path']} {_format_bytes(disk['used'])}/{_format_bytes(disk['total'])} | "
+            f"load {load['load'][0]:.2f} {load['load'][1]:.2f} {load['load'][2]:.2f} | "
+            f"IO leitura {_format_bytes(io['read'])}/s escrita {_format_bytes(io['write'])}/s"
+        )
+
+    def report(self) -> str:
+        """Relatório completo para o comando !sys"""
+        memory, load, cpu, disk = self.memory(), self.load(), self.cpu(), self.disk()
+        io, net = self.io(), self.net()
+        lines = [
+            "Estado do sistema:",
+            f"  CPU: {cpu['busy']:.1f}% em uso, iowait {cpu['iowait']:.1f}% ({cpu['cores']} núcleos)",
+            f"  Carga: {load['load'][0]:.2f} {load['load'][1]:.2f} {load['load'][2]:.2f} "
+            f"({load['running']} executando, {load['processes']} processos)",
+            f"  Memória: {_format_bytes(memory['used'])} de {_format_bytes(memory['total'])} "
+            f"({_format_bytes(memory['available'])} disponível)",
+            f"  Swap: {_format_bytes(memory['swap_used'])} de {_format_bytes(memory['swap_total'])}",
+            f"  Disco {disk['path']}: {_format_bytes(disk['used'])} de {_format_bytes(disk['total'])} "
+            f"({_format_bytes(disk['free'])} livre)",
+            f"  IO: leitura {_format_bytes(io['read'])}/s, escrita {_format_bytes(io['write'])}/s",
+            f"  Rede: recebendo {_format_bytes(net['rx'])}/s, enviando {_format_bytes(net['tx'])}/s",
+        ]
+        return "\n".join(lines)
+
+    def processes_report(self, n: int = 5) -> str:
+        """Relatório dos processos para o comando !top"""
+        lines = [f"Processos com mais memória (de {self.load()['processes']}):"]
+        for process in self.top_processes(n):
+            lines.append(f"  {process['pid']:>7}  {_format_bytes(process['rss']):>10}  {process['name']}")
+        return "\n".join(lines)
+
+
+_default_metrics = None
+_default_lock = threading.Lock()
+
+
+def get_system_metrics() -> SystemMetrics:
+    """Instância compartilhada pelo processo (taxas calculadas entre chamadas)"""
+    global _default_metrics
+    with _default_lock:
+        if _default_metrics is None:
+            _default_metrics = SystemMetrics.from_env()
+        return _default_metrics
+
+
+if __name__ == "__main__":
+    # Benchmark: resumo com e sem cache, comparado a executar free/df/ps
+    import subprocess
+
+    metrics = SystemMetrics(ttl=0)
+    metrics.summary()
+    rounds = 200
+    start = time.perf_counter()
+    for _ in range(rounds):
+        metrics.summary()
+    uncached = (time.perf_counter() - start) / rounds
+
+    metrics.ttl = 1.0
+    metrics.summary()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        metrics.summary()
+    cached = (time.perf_counter() - start) / rounds
+
+    start = time.perf_counter()
+    for command in (["free", "-h"], ["df", "-h", "/"], ["ps", "aux"]):
+        try:
+            subprocess.run(command, capture_output=True)
+        except OSError:
+            pass
+    spawned = time.perf_counter() - start
+
+    print(metrics.report())
+    print(metrics.processes_report())
+    print(f"Resumo: {uncached * 1e6:.0f} µs sem cache, {cached * 1e6:.1f} µs com cache; "
+          f"free/df/ps: {spawned * 1000:.1f} ms")
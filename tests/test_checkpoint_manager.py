@@ -0,0 +1,131 @@
+import os
+import threading
+
+import numpy as np
+
+from memory.checkpoint_manager import CheckpointManager
+from memory.numpy_store import NumpyVectorMemory
+
+
+def wait_gc():
+    for thread in threading.enumerate():
+        if thread.name in ("checkpoint-gc", "checkpoint-fork"):
+            thread.join()
+
+
+class FakeConfigStore:
+    def __init__(self, config=None):
+        self.config = config or {}
+
+    def load_lazily(self, loader):
+        self.config = loader()
+
+    def load_pending(self):
+        pass
+
+
+class FakeMessageCache:
+    def __init__(self, messages=None):
+        self.messages = messages or []
+
+    def load_lazily(self, loader):
+        self.messages = loader()
+
+    def load_pending(self):
+        pass
+
+
+def attached_manager(tmp_path, archive=False):
+    manager = CheckpointManager(str(tmp_path / "checkpoints"), archive=archive)
+    live = tmp_path / "chroma_db"
+    live.mkdir()
+    (live / "data.bin").write_bytes(b"vetores")
+    manager.attach_live_directory(str(live))
+    wait_gc()
+    return manager, str(live)
+
+
+def test_gc_keeps_reserved_generation(tmp_path):
+    manager, live = attached_manager(tmp_path)
+    stale = os.path.join(manager.live_directory, "antiga")
+    os.makedirs(stale)
+
+    generation = manager._new_generation()
+    os.makedirs(generation + ".tmp")
+    manager._collect_garbage()
+    wait_gc()
+    assert os.path.isdir(generation + ".tmp")
+    assert not os.path.exists(stale)
+
+    # Entre o rename e a troca do link a geração ainda está reservada
+    os.rename(generation + ".tmp", generation)
+    manager._collect_garbage()
+    wait_gc()
+    assert os.path.isdir(generation)
+
+    previous = os.path.realpath(live)
+    manager._point_live_to(generation)
+    manager._collect_garbage()
+    wait_gc()
+    assert os.path.realpath(live) == generation
+    assert os.path.isdir(generation)
+    assert not os.path.exists(previous)
+
+
+def test_gc_during_fork_keeps_fork_result(tmp_path):
+    manager, live = attached_manager(tmp_path)
+    checkpoint_id = manager.create_checkpoint("inicial", FakeConfigStore(), FakeMessageCache())
+
+    assert manager.restore_checkpoint(checkpoint_id, FakeConfigStore(), FakeMessageCache())
+    # Coletas disparadas enquanto a cópia termina não podem removê-la
+    for _ in range(5):
+        manager._collect_garbage()
+    wait_gc()
+    assert manager._fork_result and os.path.isdir(manager._fork_result)
+
+    manager.ensure_writable()
+    wait_gc()
+    assert os.path.isfile(os.path.join(live, "data.bin"))
+    assert os.path.realpath(live).startswith(os.path.realpath(manager.live_directory))
+
+
+def embed(texts):
+    # Embedding determinístico: histograma de letras
+    vectors = np.zeros((len(texts), 26), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for char in text.lower():
+            if "a" <= char <= "z":
+                vectors[row, ord(char) - ord("a")] += 1
+    return vectors + 1e-3
+
+
+def test_archive_restore_roundtrip_search(tmp_path):
+    manager = CheckpointManager(str(tmp_path / "checkpoints"), archive=True)
+    live = str(tmp_path / "chroma_db")
+    store = {}
+    manager.attach_live_directory(
+        live, on_switch=lambda: store.update(memory=NumpyVectorMemory(live, embedding_function=embed))
+    )
+    store["memory"] = NumpyVectorMemory(live, embedding_function=embed)
+    store["memory"].add_messages([("user", "zebra zebra zoologico"), ("assistant", "banana abacaxi")])
+
+    cache = FakeMessageCache([("user", "zebra zebra zoologico")])
+    cache.vector_memory = store["memory"]
+    checkpoint_id = manager.create_checkpoint("arquivo", FakeConfigStore({"tema": "escuro"}), cache)
+    assert os.path.isfile(manager._archive_path(checkpoint_id))
+
+    store["memory"].clear()
+    assert store["memory"].search_context("zebra") == []
+
+    config, messages = FakeConfigStore(), FakeMessageCache()
+    assert manager.restore_checkpoint(checkpoint_id, config, messages)
+    # Coletas pendentes de trocas anteriores não removem a geração restaurada
+    for _ in range(5):
+        manager._collect_garbage()
+    wait_gc()
+
+    assert config.config == {"tema": "escuro"}
+    assert messages.messages == [("user", "zebra zebra zoologico")]
+    assert os.path.realpath(live).startswith(os.path.realpath(manager.live_directory))
+    results = store["memory"].search_context("zebra", n_results=1)
+    assert results == ["Usuário: zebra zebra zoologico"]
@@ -0,0 +1,57 @@
+import os
+
+import numpy as np
+import pytest
+
+from memory.compact_store import CompactVectorMemory
+
+
+def embed(texts):
+    # Embedding determinístico: histograma de letras
+    vectors = np.zeros((len(texts), 26), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for char in text.lower():
+            if "a" <= char <= "z":
+                vectors[row, ord(char) - ord("a")] += 1
+    return vectors + 1e-3
+
+
+@pytest.mark.parametrize("created_with, reopened_with", [("0", "1"), ("1", "0")])
+def test_reopen_with_flag_changed_keeps_created_mode(tmp_path, monkeypatch, created_with, reopened_with):
+    monkeypatch.chdir(tmp_path)  # vector_errors.log
+    directory = str(tmp_path / "compact")
+    monkeypatch.setenv("COMPACT_FULL_VECTORS", created_with)
+    store = CompactVectorMemory(directory, embedding_function=embed)
+    store.add_message("user", "zebra zebra zoologico")
+    has_vectors = os.path.exists(os.path.join(directory, "vectors.f32"))
+    assert has_vectors == (created_with == "1")
+
+    monkeypatch.setenv("COMPACT_FULL_VECTORS", reopened_with)
+    reopened = CompactVectorMemory(directory, embedding_function=embed)
+    assert reopened.keep_full_vectors == has_vectors
+    reopened.add_message("assistant", "banana abacaxi")
+    assert reopened.search_context("zebra", n_results=1) == ["Usuário: zebra zebra zoologico"]
+    assert "ignorado" in (tmp_path / "vector_errors.log").read_text()
+
+
+def test_empty_index_follows_flag(tmp_path, monkeypatch):
+    directory = str(tmp_path / "compact")
+    CompactVectorMemory(directory, embedding_function=embed, keep_full_vectors=False)
+    monkeypatch.setenv("COMPACT_FULL_VECTORS", "1")
+    store = CompactVectorMemory(directory, embedding_function=embed)
+    assert store.keep_full_vectors
+    store.add_message("user", "zebra")
+    assert os.path.exists(os.path.join(directory, "vectors.f32"))
+
+
+def test_codes_only_search_returns_scan_order(tmp_path):
+    store = CompactVectorMemory(str(tmp_path / "compact"), embedding_function=embed,
+                                keep_full_vectors=False)
+    rng = np.random.default_rng(0)
+    data = rng.normal(size=(500, 26)).astype(np.float32)
+    store._append(data, [""] * len(data), [{"role": "user"}] * len(data),
+                  [f"v{i}" for i in range(len(data))])
+
+    query = rng.normal(size=26).astype(np.float32)
+    scores = (store._codes[:500].astype(np.float32) @ (query / np.linalg.norm(query))) * store._scales[:500]
+    assert store._search_indices(query, 5).tolist() == np.argsort(-scores)[:5].tolist()
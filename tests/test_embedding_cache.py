@@ -0,0 +1,31 @@
+from memory.embedding_cache import SQLiteEmbeddingCache
+
+
+class CountingProvider:
+    model_id = "teste"
+
+    def __init__(self):
+        self.calls = 0
+
+    def embed(self, texts):
+        self.calls += len(texts)
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+def table_count(cache):
+    return cache._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+
+def test_count_tracks_inserts_and_evictions(tmp_path):
+    cache = SQLiteEmbeddingCache(CountingProvider(), str(tmp_path / "cache.db"), max_entries=100)
+    for i in range(250):
+        cache.embed([f"texto {i}", f"texto {i}"])
+        assert cache._count == table_count(cache)
+    assert table_count(cache) <= 100
+    assert cache.stats["evictions"] > 0
+
+    # Reabrir inicializa a contagem a partir do banco
+    reopened = SQLiteEmbeddingCache(CountingProvider(), str(tmp_path / "cache.db"), max_entries=100)
+    assert reopened._count == table_count(reopened)
+    reopened.clear()
+    assert reopened._count == 0
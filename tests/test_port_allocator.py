@@ -0,0 +1,36 @@
+import os
+
+from memory.port_allocator import PortAllocator
+
+
+def test_lookups_do_not_rewrite_state(tmp_path):
+    allocator = PortAllocator(str(tmp_path / "ports.state"), ranges=[(5000, 5010)])
+    lease = allocator.lease("web")
+    before = os.stat(allocator.state_file)
+    for _ in range(3):
+        assert allocator.get_lease(lease["port"])["token"] == lease["token"]
+    after = os.stat(allocator.state_file)
+    assert (before.st_ino, before.st_mtime_ns) == (after.st_ino, after.st_mtime_ns)
+
+
+def test_confirm_requires_lease_token(tmp_path):
+    allocator = PortAllocator(str(tmp_path / "ports.state"), ranges=[(5000, 5010)])
+    lease = allocator.lease("pending")
+
+    ok, _ = allocator.confirm(lease["port"], "pending")
+    assert not ok
+    ok, _ = allocator.confirm(lease["port"], "outro", token="errado")
+    assert not ok
+    assert allocator.get_lease(lease["port"]) is not None
+
+    ok, _ = allocator.confirm(lease["port"], "api", token=lease["token"])
+    assert ok
+    assert allocator.get_lease(lease["port"]) is None
+
+
+def test_forced_confirm_consumes_foreign_lease(tmp_path):
+    allocator = PortAllocator(str(tmp_path / "ports.state"), ranges=[(5000, 5010)])
+    lease = allocator.lease("web")
+    ok, _ = allocator.confirm(lease["port"], "api", force=True)
+    assert ok
+    assert allocator.get_lease(lease["port"]) is None
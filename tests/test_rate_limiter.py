@@ -0,0 +1,61 @@
+import threading
+import time
+
+import pytest
+
+from llm.fake_backend import FakeConfig, FakeLLMClient
+from llm.hedging import ChatStream, GenerationCancelled, HedgedRequester
+from llm.rate_limiter import CHARS_PER_TOKEN, RateLimiter, estimate_tokens
+
+
+def test_settle_returns_unused_reservation():
+    limiter = RateLimiter(rpm=0, tpm=5000)
+    client = FakeLLMClient(FakeConfig(ttft=0, tokens_per_sec=0, mode="canned", reply="ok " * 50))
+    messages = [{"role": "user", "content": "x" * 400}]
+    tokens, prompt_tokens = estimate_tokens(messages, 1000), estimate_tokens(messages, 0)
+
+    start = time.monotonic()
+    # Sem o acerto, dez reservas de 1100 tokens esperariam o bucket encher
+    for _ in range(10):
+        stream = limiter.call(lambda: ChatStream(
+            client, "modelo", messages, max_tokens=1000,
+            on_done=lambda chars: limiter.settle(tokens, prompt_tokens + chars // CHARS_PER_TOKEN)
+        ), tokens)
+        assert "".join(stream).startswith("ok")
+    assert time.monotonic() - start < 1.0
+    assert limiter.stats["waited"] == 0
+
+
+def test_settle_on_close_runs_once():
+    limiter = RateLimiter(rpm=0, tpm=5000)
+    limiter.acquire(3000)
+    level = limiter._token_level
+    calls = []
+    client = FakeLLMClient(FakeConfig(ttft=0, tokens_per_sec=0, mode="canned", reply="abc"))
+    stream = ChatStream(client, "modelo", [{"role": "user", "content": "oi"}],
+                        on_done=lambda chars: (calls.append(chars), limiter.settle(3000, 1000)))
+    stream.close()
+    stream.close()
+    assert len(calls) == 1
+    assert limiter._token_level >= level + 2000
+
+
+def test_cancelled_attempt_leaves_limiter_queue():
+    limiter = RateLimiter(rpm=1, tpm=0)
+    limiter.acquire(1)  # Esgota o bucket: a próxima espera ~60s
+    opened = []
+
+    def open_stream(model, attempt_cancel):
+        return limiter.call(lambda: opened.append(model) or iter(["x"]), 1, cancel=attempt_cancel)
+
+    requester = HedgedRequester(deadline=30)
+    cancel = threading.Event()
+    threading.Timer(0.2, cancel.set).start()
+    start = time.monotonic()
+    with pytest.raises(GenerationCancelled):
+        requester.call(open_stream, "modelo", cancel=cancel)
+    time.sleep(0.2)
+    assert time.monotonic() - start < 2.0
+    assert opened == []
+    assert limiter._queue == []
+    assert limiter.stats["acquired"] == 1
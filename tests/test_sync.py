@@ -0,0 +1,158 @@
+import os
+import random
+import sqlite3
+
+import pytest
+
+from memory import sync
+from memory.checkpoint_manager import CheckpointManager
+from memory.sync import (LocalTransport, SyncNode, SyncServer, UnixSocketTransport,
+                         chunk_boundaries, iter_chunks)
+
+
+def make_node(root, name):
+    directory = root / name
+    directory.mkdir()
+    conn = sqlite3.connect(directory / "chat_history.db")
+    conn.execute('''CREATE TABLE chat_history
+                    (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                     role TEXT NOT NULL,
+                     content TEXT NOT NULL,
+                     timestamp DATETIME DEFAULT CURRENT_TIMESTAMP)''')
+    conn.commit()
+    conn.close()
+    return SyncNode(CheckpointManager(str(directory / "checkpoints")), str(directory / "chat_history.db"))
+
+
+def add_checkpoint(node, checkpoint_id, payload, timestamp="2026-10-19T10:00:00"):
+    directory = os.path.join(node.data_directory, checkpoint_id)
+    os.makedirs(directory)
+    with open(os.path.join(directory, "config.json"), "wb") as f:
+        f.write(payload)
+    node.checkpoints.merge_registry([{"id": checkpoint_id, "message": checkpoint_id,
+                                      "timestamp": timestamp, "files": {"config": "config.json"}}])
+
+
+def add_messages(node, rows):
+    conn = sqlite3.connect(node.db_path)
+    conn.executemany("INSERT INTO chat_history (role, content, timestamp) VALUES (?, ?, ?)", rows)
+    conn.commit()
+    conn.close()
+
+
+def history(node):
+    conn = sqlite3.connect(node.db_path)
+    rows = sorted(conn.execute("SELECT role, content, timestamp FROM chat_history"))
+    conn.close()
+    return rows
+
+
+def random_bytes(size, seed):
+    return random.Random(seed).randbytes(size)
+
+
+def test_pull_reuses_chunks_of_checkpoints_fetched_earlier(tmp_path):
+    remote, local = make_node(tmp_path, "remoto"), make_node(tmp_path, "local")
+    prefix = random_bytes(200 * 1024, 1)
+    for i in range(3):
+        add_checkpoint(remote, f"cp{i}", prefix + random_bytes(2048, 10 + i), f"2026-10-19T10:0{i}:00")
+
+    ok, message = local.pull(LocalTransport(remote))
+    assert ok, message
+    chunks_per_file = len(remote.checkpoint_manifest(["cp0"])["cp0/config.json"])
+    # O prefixo comum só atravessa o transporte uma vez
+    assert f"{chunks_per_file + 2} chunks recebidos" in message
+    for i in range(3):
+        with open(os.path.join(local.data_directory, f"cp{i}", "config.json"), "rb") as f:
+            assert f.read() == prefix + random_bytes(2048, 10 + i)
+
+
+@pytest.mark.parametrize("read_size", [1000, 4096, 65536 + 7, 300_000])
+def test_iter_chunks_matches_whole_buffer_across_reads(tmp_path, monkeypatch, read_size):
+    # Trechos repetidos e aleatórios: cortes por conteúdo e por MAX_CHUNK
+    data = random_bytes(180_000, 3) + bytes(150_000) + random_bytes(90_000, 4)
+    path = tmp_path / "arquivo"
+    path.write_bytes(data)
+    monkeypatch.setattr(sync, "READ_SIZE", read_size)
+
+    cuts = chunk_boundaries(data)
+    expected = [data[start:end] for start, end in zip([0] + cuts, cuts)]
+    chunks = list(iter_chunks(str(path)))
+    assert chunks == expected
+    assert b"".join(chunks) == data
+    assert all(len(chunk) <= sync.MAX_CHUNK for chunk in chunks)
+
+
+def test_iter_chunks_small_and_empty_files(tmp_path):
+    (tmp_path / "vazio").write_bytes(b"")
+    (tmp_path / "pequeno").write_bytes(b"abc")
+    assert list(iter_chunks(str(tmp_path / "vazio"))) == []
+    assert list(iter_chunks(str(tmp_path / "pequeno"))) == [b"abc"]
+
+
+def test_pull_is_idempotent(tmp_path):
+    remote, local = make_node(tmp_path, "remoto"), make_node(tmp_path, "local")
+    add_checkpoint(remote, "cp1", random_bytes(30_000, 5), "2026-10-18T09:00:00")
+    add_checkpoint(local, "cp0", random_bytes(30_000, 6), "2026-10-17T09:00:00")
+    shared = [("user", "oi", "2026-10-18 09:00:00"), ("assistant", "olá", "2026-10-18 09:00:01")]
+    add_messages(remote, shared + [("user", "só no remoto", "2026-10-19 08:00:00")])
+    add_messages(local, shared + [("user", "só no local", "2026-10-19 08:30:00")])
+
+    for _ in range(3):
+        ok, message = local.pull(LocalTransport(remote))
+        assert ok, message
+
+    ids = [cp["id"] for cp in local.checkpoints.checkpoints["checkpoints"]]
+    assert sorted(ids) == ["cp0", "cp1"]
+    # O registro gravado em disco também não tem duplicatas
+    reloaded = CheckpointManager(local.checkpoints.base_directory)
+    assert sorted(cp["id"] for cp in reloaded.checkpoints["checkpoints"]) == ["cp0", "cp1"]
+    assert history(local) == sorted(shared + [("user", "só no remoto", "2026-10-19 08:00:00"),
+                                              ("user", "só no local", "2026-10-19 08:30:00")])
+    assert "0 checkpoints no registro, 0 arquivos" in message and "0 mensagens" in message
+
+
+def test_pull_over_unix_socket(tmp_path):
+    remote, local = make_node(tmp_path, "remoto"), make_node(tmp_path, "local")
+    add_checkpoint(remote, "cp1", random_bytes(50_000, 7))
+    add_messages(remote, [("user", "pelo socket", "2026-10-19 10:00:00")])
+    server = SyncServer(remote, str(tmp_path / "sync.sock")).start()
+    try:
+        transport = UnixSocketTransport(str(tmp_path / "sync.sock"))
+        ok, message = local.pull(transport)
+        assert ok, message
+        ok, message = local.pull(transport)
+        assert ok and "0 arquivos" in message
+        transport.close()
+    finally:
+        server.stop()
+    assert history(local) == [("user", "pelo socket", "2026-10-19 10:00:00")]
+    assert local.summary()["checkpoints"] == remote.summary()["checkpoints"]
+
+
+class TamperedTransport(LocalTransport):
+    """Outro nó que devolve caminhos forjados no manifesto"""
+
+    def __init__(self, node, path):
+        super().__init__(node)
+        self.path = path
+
+    def call(self, method, *args):
+        result = super().call(method, *args)
+        if method == "checkpoint_manifest":
+            return {self.path: chunks for chunks in result.values()}
+        return result
+
+
+@pytest.mark.parametrize("path", ["../fora.json", "cp1/../../fora.json", "/tmp/fora.json"])
+def test_pull_rejects_paths_outside_data_directory(tmp_path, monkeypatch, path):
+    monkeypatch.chdir(tmp_path)  # sync_errors.log
+    remote, local = make_node(tmp_path, "remoto"), make_node(tmp_path, "local")
+    add_checkpoint(remote, "cp1", b"conteudo")
+
+    ok, message = local.pull(TamperedTransport(remote, path))
+    assert not ok
+    assert "Caminho inválido" in message
+    assert not os.path.exists(tmp_path / "local" / "checkpoints" / "fora.json")
+    assert not os.path.exists(tmp_path / "local" / "fora.json")
+    assert local.checkpoints.checkpoints["checkpoints"] == []
@@ -0,0 +1,49 @@
+import sqlite3
+
+from memory.transfer import export_history, import_history
+
+
+def rows(db_path):
+    conn = sqlite3.connect(db_path)
+    result = conn.execute("SELECT role, content, timestamp FROM chat_history ORDER BY id").fetchall()
+    conn.close()
+    return result
+
+
+def test_export_import_roundtrip_and_reimport_duplicates(tmp_path):
+    source = str(tmp_path / "origem.db")
+    conn = sqlite3.connect(source)
+    conn.execute('''CREATE TABLE chat_history
+                    (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                     role TEXT NOT NULL,
+                     content TEXT NOT NULL,
+                     timestamp DATETIME DEFAULT CURRENT_TIMESTAMP)''')
+    conn.executemany("INSERT INTO chat_history (role, content, timestamp) VALUES (?, ?, ?)",
+                     [("user", "oi", "2026-10-19 10:00:00"), ("assistant", "olá", "2026-10-19 10:00:01")])
+    conn.commit()
+    conn.close()
+
+    exported = str(tmp_path / "historico.jsonl.gz")
+    ok, message = export_history(source, exported, batch_size=1)
+    assert ok, message
+
+    target = str(tmp_path / "destino.db")
+    ok, message = import_history(target, exported, batch_size=1)
+    assert ok, message
+    assert rows(target) == rows(source)
+
+    # Novos ids a cada importação: o mesmo arquivo duas vezes duplica as linhas
+    ok, message = import_history(target, exported)
+    assert ok, message
+    assert rows(target) == rows(source) * 2
+
+
+def test_import_rejects_file_without_header(tmp_path):
+    bogus = tmp_path / "invalido.jsonl"
+    bogus.write_text('{"type": "message", "role": "user", "content": "x", "timestamp": ""}\n')
+    target = str(tmp_path / "destino.db")
+
+    ok, message = import_history(target, str(bogus))
+    assert not ok
+    assert "cabeçalho ausente" in message
+    assert rows(target) == []